@@ -1,12 +1,93 @@
+import asyncio
 import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import List
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from routes import chat_routes
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from config import PROFILER_ENABLED, PROFILER_INTERVAL_MS, PROFILER_DIR
 from routes.audio_routes import router as audio_router
 from routes.image_routes import router as image_router
+from services import registry
+from utils.metrics import HTTP_REQUEST_SECONDS, begin_request, end_request, metrics, server_timing
+from utils.profiler import SamplingProfiler
+from utils.single_flight import single_flight
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm services in the background so the server accepts requests immediately;
+    # requests that arrive first build what they need on demand.
+    warm_up = asyncio.create_task(registry.warm_up())
+    yield
+    warm_up.cancel()
+    await registry.aclose()
+
+
+class InstrumentationMiddleware:
+    """
+    Per-request latency histogram (by route template), a Server-Timing header with the
+    stage spans recorded so far, and the opt-in sampling profiler (`X-Profile: 1`).
+    Plain ASGI rather than BaseHTTPMiddleware so streaming responses pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        token, spans = begin_request()
+        profiler = None
+        profile_id = ""
+        if PROFILER_ENABLED and Headers(scope=scope).get("x-profile") == "1":
+            profile_id = uuid.uuid4().hex[:12]
+            profiler = SamplingProfiler(interval=PROFILER_INTERVAL_MS / 1000.0).start()
+
+        def finish_profile() -> None:
+            nonlocal profiler
+            if profiler is None:
+                return
+            path = profiler.stop().dump(PROFILER_DIR, profile_id)
+            logging.info("Profile %s for %s: %d samples in %.3fs -> %s",
+                         profile_id, scope["path"], sum(profiler.samples.values()), profiler.elapsed, path)
+            profiler = None
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - started, method=scope["method"],
+                    route=getattr(route, "path", "unmatched"), status=str(message["status"]))
+                headers = MutableHeaders(scope=message)
+                timing = server_timing(spans)
+                if timing:
+                    headers.append("Server-Timing", timing)
+                if profile_id:
+                    headers.append("X-Profile-Id", profile_id)
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finish_profile()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_request(token)
+            finish_profile()
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(InstrumentationMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],  # or set to ['*'] to allow all origins
@@ -27,4 +108,38 @@ def root():
 @app.get("/ping")
 def ping():
     print("[BACKEND] /ping a fost apelat")
-    return {"pong": True}
\ No newline at end of file
+    return {"pong": True}
+
+@app.get("/ready")
+def ready():
+    state = registry.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@metrics.collector
+def _cache_metrics() -> List[str]:
+    lines = ["# TYPE smart_librarian_cache_hits_total counter",
+             "# TYPE smart_librarian_cache_misses_total counter"]
+    embeddings = registry.embeddings_service.peek()
+    caches = {
+        "embedding": embeddings.query_cache if embeddings else None,
+        "response": registry.response_cache.peek(),
+        "tts": registry.tts_cache.peek(),
+        "image": registry.image_cache.peek(),
+    }
+    for name, cache in caches.items():
+        if cache is None:
+            continue
+        stats = cache.stats()
+        lines.append(f'smart_librarian_cache_hits_total{{cache="{name}"}} {stats.get("hits", 0)}')
+        lines.append(f'smart_librarian_cache_misses_total{{cache="{name}"}} {stats.get("misses", 0)}')
+    lines += ["# TYPE smart_librarian_single_flight_calls_total counter",
+              "# TYPE smart_librarian_single_flight_coalesced_total counter"]
+    for ns, stats in single_flight.stats()["by_namespace"].items():
+        lines.append(f'smart_librarian_single_flight_calls_total{{namespace="{ns}"}} {stats["calls"]}')
+        lines.append(f'smart_librarian_single_flight_coalesced_total{{namespace="{ns}"}} {stats["coalesced"]}')
+    return lines
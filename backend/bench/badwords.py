@@ -0,0 +1,153 @@
+"""
+Profanity filter cost as the lists grow: build time and per-query scan time of the
+Aho-Corasick filter against the regex alternation it replaced, at 10..10k terms.
+
+    python -m bench.badwords [--sizes 10,100,1000,10000] [-n 2000] [--seed 42]
+    python -m bench.badwords --check
+
+
+Synthetic terms are seeded pseudo-words (10% with a trailing '*', 2% with an inner one)
+split between "ro" and "en". The regex baseline is what the routes used to do: compile
+one alternation per language, then `contains` and `mask` on the detected language only,
+so it scans half the terms twice; the automaton scans all of them once.
+
+--check is the regression check for the shipped lists instead: every catalog title, every
+clean workload query and CLEAN_QUERIES (English words that start like a Romanian term)
+must pass the filter; every profanity query and PROFANE_VARIANTS must be caught. Exits 1
+otherwise.
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import string
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bench.workloads import Workload
+from utils.badwords import BadWordsLoader, read_list
+
+# Clean text that a too-broad term has blocked before: every list is matched against every query.
+CLEAN_QUERIES = [
+    "Recommend a Pulitzer prize winner", "A novel set in Puligny-Montrachet",
+    "A popular science book about the curvature of spacetime", "A road trip story full of curves",
+    "Something with a curve ball ending", "Narnia, where Edmund eats Turkish delight (rahat lokum)",
+    "Vreau o carte despre rahat și cafea la Istanbul", "Scunthorpe United: a history",
+    "Tell me about Dickens", "Un roman de Mircea Eliade despre Bucureștiul interbelic",
+]
+# Spellings the filter must still catch: diacritics dropped or added, leetspeak (see fold()).
+PROFANE_VARIANTS = ["pulă", "pula", "pul4", "sh1t", "Ce n4iba?", "c4cat"]
+
+
+def synthetic_terms(size: int, rng: random.Random) -> List[str]:
+    terms = set()
+    while len(terms) < size:
+        word = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+        roll = rng.random()
+        if roll < 0.02:
+            cut = rng.randint(1, len(word) - 2)
+            word = word[:cut] + "*" + word[cut + 1:]
+        elif roll < 0.12:
+            word += "*"
+        terms.add(word)
+    return sorted(terms)
+
+
+def regex_baseline(words: List[str]) -> Optional[re.Pattern]:
+    """The previous BadWordsLoader._compile."""
+    cleaned = []
+    for w in words:
+        if w.strip():
+            w = re.escape(w).replace(r"\*", r"\w*")
+            cleaned.append(rf"\b{w}\b")
+    return re.compile("|".join(cleaned), flags=re.IGNORECASE | re.UNICODE) if cleaned else None
+
+
+def _time_per_query(fn, queries: List[str]) -> float:
+    started = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - started) / len(queries) * 1e6
+
+
+def run_size(size: int, queries: List[str], seed: int, shipped: Dict[str, List[str]]) -> Dict[str, float]:
+    rng = random.Random(seed + size)
+    terms = synthetic_terms(size, rng)
+    lists = {"ro": terms[::2] + shipped.get("ro", []), "en": terms[1::2] + shipped.get("en", [])}
+
+    started = time.perf_counter()
+    patterns = {lang: regex_baseline(words) for lang, words in lists.items()}
+    regex_build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loader = BadWordsLoader(lists=lists)
+    automaton_build = time.perf_counter() - started
+
+    def regex_check(q: str) -> None:
+        pat = patterns["ro" if len(q) % 2 else "en"]  # stand-in for the detected language
+        if pat.search(q):
+            pat.sub(lambda m: m.group(0)[0] + "…", q)
+
+    def automaton_check(q: str) -> None:
+        matches = loader.find(q)
+        if matches:
+            loader.mask(q, matches)
+
+    return {
+        "terms": size,
+        "regex_build_ms": regex_build * 1000.0,
+        "automaton_build_ms": automaton_build * 1000.0,
+        "states": loader.stats()["states"],
+        "regex_us": _time_per_query(regex_check, queries),
+        "automaton_us": _time_per_query(automaton_check, queries),
+    }
+
+
+def check_lists(shipped: Dict[str, List[str]], seed: int) -> int:
+    """Prints false positives and misses of the shipped lists; returns how many there were."""
+    loader = BadWordsLoader(lists=shipped)
+    workload = Workload("chat", seed=seed)
+    pools = workload.pools
+    clean = [title for title, _ in workload.catalog] + CLEAN_QUERIES
+    clean += [q for category, pool in pools.items() if category != "profanity" for q in pool]
+    failures = 0
+    for text in clean:
+        for m in loader.find(text):
+            failures += 1
+            print(f"  false positive: {text!r} matches {m.term!r} ({m.lang}) at {text[m.start:m.end]!r}")
+    profane = pools["profanity"] + PROFANE_VARIANTS
+    for text in profane:
+        if not loader.contains(text):
+            failures += 1
+            print(f"  missed: {text!r}")
+    print(f"{len(clean)} clean texts, {len(profane)} profane ones: {failures} failures")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--check", action="store_true", help="check the shipped lists for false positives")
+    parser.add_argument("--sizes", default="10,100,1000,10000", type=lambda s: [int(x) for x in s.split(",") if x])
+    parser.add_argument("-n", type=int, default=2000, help="queries per size")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    shipped = {lang: read_list(f"data/badwords/{lang}.txt") for lang in ("ro", "en")}
+    if args.check:
+        sys.exit(1 if check_lists(shipped, args.seed) else 0)
+
+    workload = Workload("chat", seed=args.seed)
+    queries = [workload.next().json["query"] for _ in range(args.n)]
+
+    print(f"{len(queries)} workload queries, mean {sum(map(len, queries)) / len(queries):.0f} chars")
+    print(f"  {'terms':>6} {'states':>7} {'regex build':>12} {'ac build':>9} {'regex us/q':>11} {'ac us/q':>8}")
+    for size in args.sizes:
+        r = run_size(size, queries, args.seed, shipped)
+        print(f"  {r['terms']:>6} {r['states']:>7} {r['regex_build_ms']:>10.1f}ms {r['automaton_build_ms']:>7.1f}ms "
+              f"{r['regex_us']:>11.1f} {r['automaton_us']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Catalog startup time and memory: the memory-mapped catalog against the JSON path it
+replaces, at growing catalog sizes.
+
+    python -m bench.catalog_store [--sizes 10000,100000,1000000] [--lookups 2000] [--seed 42]
+
+For each size a synthetic book_summaries.json is written and converted with build_catalog.
+Each variant then loads in a fresh process (modules already imported), which reports load
+time and RSS growth (private heap and file-backed pages, from /proc/self/status), before
+and after looking up random titles:
+
+    json     what ToolsService and EmbeddingsService did before: json.load + the lowercase
+             title dict, plus the second dict EmbeddingsService read for itself
+    catalog  BookCatalog(path), one mapping for both services
+
+The title BM25 index is left out of both: ToolsService now reuses the hybrid retrieval
+index (or builds a title-only one on the first fuzzy lookup) instead of one at startup.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+from services.catalog_store import build_catalog
+from services.ingest_service import iter_books_json
+
+_CHILD = r"""
+import json, random, sys, time
+from services.catalog_store import BookCatalog
+from services.ingest_service import iter_books_json
+mode, path, lookups, seed = sys.argv[1], sys.argv[2], int(sys.argv[3]), int(sys.argv[4])
+
+def mem():
+    out = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, kb = line.split()[:2]
+                out[name[:-1]] = int(kb) / 1024.0
+    return out
+
+before = mem()
+started = time.perf_counter()
+if mode == "json":
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    lower = {k.strip().lower(): k for k in data}
+    second = dict(iter_books_json(path))
+    find = lambda t: t if t in data else lower.get(t.lower())
+else:
+    data = BookCatalog(path)
+    find = data.find
+loaded = time.perf_counter() - started
+after_load = mem()
+
+titles = json.loads(sys.stdin.read())
+rng = random.Random(seed)
+started = time.perf_counter()
+for _ in range(lookups):
+    title = rng.choice(titles)
+    data[find(title.upper() if rng.random() < 0.5 else title)]
+lookup_us = (time.perf_counter() - started) / lookups * 1e6
+after_lookups = mem()
+print(json.dumps({
+    "load_seconds": loaded,
+    "anon_mb": after_load["RssAnon"] - before["RssAnon"],
+    "file_mb": after_load["RssFile"] - before["RssFile"],
+    "anon_mb_after_lookups": after_lookups["RssAnon"] - before["RssAnon"],
+    "file_mb_after_lookups": after_lookups["RssFile"] - before["RssFile"],
+    "lookup_us": lookup_us,
+}))
+"""
+
+
+def write_catalog_json(path: str, size: int, rng: random.Random) -> None:
+    words = ["".join(rng.choice(string.ascii_lowercase + "ăâîșț") for _ in range(rng.randint(3, 9)))
+             for _ in range(5000)]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i in range(size):
+            title = " ".join(rng.choice(words).capitalize() for _ in range(rng.randint(1, 4))) + f" {i}"
+            summary = " ".join(rng.choice(words) for _ in range(rng.randint(40, 90))) + "."
+            f.write(("," if i else "") + json.dumps(title, ensure_ascii=False) + ":"
+                    + json.dumps(summary, ensure_ascii=False))
+        f.write("}")
+
+
+def measure(mode: str, path: str, titles_json: str, lookups: int, seed: int) -> Dict[str, float]:
+    out = subprocess.run([sys.executable, "-c", _CHILD, mode, path, str(lookups), str(seed)],
+                         input=titles_json, capture_output=True, text=True, check=True,
+                         env={**os.environ, "PYTHONPATH": os.getcwd()})
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10000,100000,1000000", type=lambda s: [int(x) for x in s.split(",") if x])
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"  {'books':>8} {'variant':<8} {'file MB':>8} {'build s':>8} {'load s':>8} {'heap MB':>8} "
+          f"{'mapped MB':>9} {'heap MB*':>8} {'mapped MB*':>10} {'lookup us':>9}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "book_summaries.json")
+            write_catalog_json(source, size, random.Random(args.seed + size))
+            started = time.perf_counter()
+            catalog = os.path.join(tmp, "book_catalog.bin")
+            build_catalog(iter_books_json(source), catalog)
+            build = time.perf_counter() - started
+            rng = random.Random(args.seed)
+            titles = [title for title, _ in iter_books_json(source)]
+            sample = json.dumps(rng.sample(titles, min(len(titles), 10000)), ensure_ascii=False)
+            del titles
+            for mode, path in (("json", source), ("catalog", catalog)):
+                r = measure(mode, path, sample, args.lookups, args.seed)
+                print(f"  {size:>8} {mode:<8} {os.path.getsize(path) / 2**20:>8.1f} "
+                      f"{(build if mode == 'catalog' else 0.0):>8.2f} {r['load_seconds']:>8.3f} "
+                      f"{r['anon_mb']:>8.1f} {r['file_mb']:>9.1f} {r['anon_mb_after_lookups']:>8.1f} "
+                      f"{r['file_mb_after_lookups']:>10.1f} {r['lookup_us']:>9.1f}")
+    print("  heap = private (RssAnon) growth per process, mapped = file-backed pages (RssFile),"
+          " shared by every process mapping the file; * = after the lookups")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Fire N /chat requests at a fixed concurrency and print p50/p95 latency.
+With --stream, hits /chat/stream and also reports time to first token.
+
+    python -m bench.chat_latency --url http://127.0.0.1:8000 -n 200 -c 32 [--stream]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+QUERIES = [
+    "Hello, how are you?",
+    "I want a book about friendship and magic.",
+    "What do you recommend for someone who loves war stories?",
+    "Salut! Ce faci?",
+    "Vreau o carte despre libertate si adevar.",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[idx]
+
+
+async def run(url: str, total: int, concurrency: int, stream: bool = False) -> None:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    first_tokens: List[float] = []
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=url, timeout=120.0) as http:
+        async def one(i: int) -> None:
+            nonlocal errors
+            async with sem:
+                t0 = time.perf_counter()
+                payload = {"query": QUERIES[i % len(QUERIES)]}
+                try:
+                    if stream:
+                        async with http.stream("POST", "/chat/stream", json=payload) as r:
+                            r.raise_for_status()
+                            first = None
+                            async for line in r.aiter_lines():
+                                if first is None and line.startswith("event: token"):
+                                    first = (time.perf_counter() - t0) * 1000.0
+                            if first is not None:
+                                first_tokens.append(first)
+                    else:
+                        r = await http.post("/chat", json=payload)
+                        r.raise_for_status()
+                    latencies.append((time.perf_counter() - t0) * 1000.0)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    print(f"requests={total} concurrency={concurrency} errors={errors} rps={total / elapsed:.1f}")
+    if latencies:
+        print(f"p50={percentile(latencies, 50):.0f}ms p95={percentile(latencies, 95):.0f}ms "
+              f"mean={statistics.mean(latencies):.0f}ms")
+    if first_tokens:
+        print(f"first-token p50={percentile(first_tokens, 50):.0f}ms p95={percentile(first_tokens, 95):.0f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("-n", "--requests", type=int, default=100)
+    parser.add_argument("-c", "--concurrency", type=int, default=16)
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream and measure first token")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.stream))
+
+
+if __name__ == "__main__":
+    main()
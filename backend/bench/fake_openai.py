@@ -0,0 +1,249 @@
+"""
+Minimal OpenAI-compatible server for local benchmarks (no API key, no spend).
+Covers chat (plain/stream/json intent), embeddings, audio speech/transcriptions and images.
+
+Run from backend/:
+    FAKE_OPENAI_LATENCY_MS=300 uvicorn bench.fake_openai:app --port 8100
+and point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1.
+
+Knobs can also be changed between runs without a restart:
+    curl -X POST localhost:8100/_fake/config -H 'content-type: application/json' -d '{"error_rate": 0.1}'
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import struct
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("FAKE_OPENAI_LATENCY_MS", "250"))
+JITTER_MS = float(os.getenv("FAKE_OPENAI_JITTER_MS", "50"))
+# Per generated token, so non-streaming replies pay for the whole generation up front.
+TOKEN_MS = float(os.getenv("FAKE_OPENAI_TOKEN_MS", "15"))
+EMBEDDING_DIM = int(os.getenv("FAKE_OPENAI_EMBEDDING_DIM", "1536"))
+# Fraction of requests answered with 429 (rate limited), to exercise client backoff.
+ERROR_RATE = float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0"))
+# Fraction answered with a 500, and fraction that hang for HANG_SECONDS (client timeouts).
+SERVER_ERROR_RATE = float(os.getenv("FAKE_OPENAI_SERVER_ERROR_RATE", "0"))
+HANG_RATE = float(os.getenv("FAKE_OPENAI_HANG_RATE", "0"))
+HANG_SECONDS = float(os.getenv("FAKE_OPENAI_HANG_SECONDS", "60"))
+# Image generation is much slower than chat upstream; keep that shape.
+IMAGE_LATENCY_MS = float(os.getenv("FAKE_OPENAI_IMAGE_LATENCY_MS", "2000"))
+
+# Mutable copy of the knobs above, adjustable through POST /_fake/config.
+CONFIG: Dict[str, float] = {
+    "latency_ms": LATENCY_MS,
+    "jitter_ms": JITTER_MS,
+    "token_ms": TOKEN_MS,
+    "error_rate": ERROR_RATE,
+    "server_error_rate": SERVER_ERROR_RATE,
+    "hang_rate": HANG_RATE,
+    "hang_seconds": HANG_SECONDS,
+    "image_latency_ms": IMAGE_LATENCY_MS,
+}
+COUNTS: Dict[str, int] = {}
+
+_GREETING = re.compile(r"\b(hi|hello|hey|salut|bun[aă]|ceau|how are you|ce faci)\b", re.IGNORECASE)
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+app = FastAPI()
+
+
+async def _sleep(base_ms: Optional[float] = None) -> None:
+    base = CONFIG["latency_ms"] if base_ms is None else base_ms
+    delay = base + random.uniform(-CONFIG["jitter_ms"], CONFIG["jitter_ms"])
+    await asyncio.sleep(max(0.0, delay) / 1000.0)
+
+
+def _token_sleep_s() -> float:
+    return CONFIG["token_ms"] / 1000.0
+
+
+async def _fault(endpoint: str) -> Any:
+    """Injected failure for this request, if any: 429, 500, or a hang past the client timeout."""
+    COUNTS[endpoint] = COUNTS.get(endpoint, 0) + 1
+    roll = random.random()
+    if roll < CONFIG["error_rate"]:
+        COUNTS["fault_429"] = COUNTS.get("fault_429", 0) + 1
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after": "0.2"},
+            content={"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}},
+        )
+    roll -= CONFIG["error_rate"]
+    if roll < CONFIG["server_error_rate"]:
+        COUNTS["fault_500"] = COUNTS.get("fault_500", 0) + 1
+        return JSONResponse(status_code=500, content={"error": {"message": "Internal error (fake)", "type": "server_error"}})
+    roll -= CONFIG["server_error_rate"]
+    if roll < CONFIG["hang_rate"]:
+        COUNTS["fault_hang"] = COUNTS.get("fault_hang", 0) + 1
+        await asyncio.sleep(CONFIG["hang_seconds"])
+    return None
+
+
+def fake_embedding(text: str) -> List[float]:
+    """Hashed bag-of-words vector: deterministic and roughly similarity-preserving."""
+    vec = [0.0] * EMBEDDING_DIM
+    for word in _WORD.findall(text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % EMBEDDING_DIM] += 1.0 if (h >> 63) else -1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _reply_for(body: Dict[str, Any]) -> str:
+    messages = body.get("messages") or []
+    last = str(messages[-1].get("content", "")) if messages else ""
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        return '{"intent": "small_talk"}' if _GREETING.search(last) else '{"intent": "book_request"}'
+    return "You might enjoy The Hobbit: an adventurous, warm story about courage and friendship."
+
+
+def _tokens(content: str) -> List[str]:
+    return re.findall(r"\S+\s*", content)
+
+
+def _usage(body: Dict[str, Any], content: str) -> Dict[str, int]:
+    prompt = sum(len(str(m.get("content", ""))) for m in body.get("messages") or []) // 4
+    completion = len(_tokens(content))
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+async def _stream_chunks(body: Dict[str, Any], content: str) -> AsyncIterator[str]:
+    base = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini")}
+    for tok in _tokens(content):
+        await asyncio.sleep(_token_sleep_s())
+        chunk = dict(base, choices=[{"index": 0, "delta": {"content": tok}, "finish_reason": None}])
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n"
+    if (body.get("stream_options") or {}).get("include_usage"):
+        yield f"data: {json.dumps(dict(base, choices=[], usage=_usage(body, content)))}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request) -> Any:
+    body = await request.json()
+    await _sleep()
+    fault = await _fault("chat")
+    if fault is not None:
+        return fault
+    content = _reply_for(body)
+    if body.get("stream"):
+        return StreamingResponse(_stream_chunks(body, content), media_type="text/event-stream")
+    await asyncio.sleep(len(_tokens(content)) * _token_sleep_s())
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o-mini"),
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": _usage(body, content),
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request) -> Any:
+    body = await request.json()
+    inputs = body.get("input")
+    inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+    await _sleep()
+    fault = await _fault("embeddings")
+    if fault is not None:
+        return fault
+    return {
+        "object": "list",
+        "model": body.get("model", "text-embedding-3-small"),
+        "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(str(t))}
+                 for i, t in enumerate(inputs)],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.post("/v1/audio/speech")
+async def speech(request: Request) -> Any:
+    body = await request.json()
+    await _sleep()
+    fault = await _fault("speech")
+    if fault is not None:
+        return fault
+    # Deterministic pseudo-audio (~1 KB per 20 input chars), streamed in chunks like the real API.
+    seed = hashlib.sha256(str(body.get("input", "")).encode("utf-8")).digest()
+    size = max(1024, len(str(body.get("input", ""))) * 50)
+    payload = (seed * (size // len(seed) + 1))[:size]
+
+    async def chunks() -> AsyncIterator[bytes]:
+        for i in range(0, len(payload), 4096):
+            await asyncio.sleep(_token_sleep_s())
+            yield payload[i:i + 4096]
+
+    return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+
+@app.post("/v1/audio/transcriptions")
+async def transcriptions(request: Request) -> Any:
+    form = await request.form()
+    upload = form.get("file")
+    audio = await upload.read() if upload is not None and hasattr(upload, "read") else b""
+    # Whisper time grows with audio length: ~1 ms per KB on top of the base latency.
+    await _sleep(CONFIG["latency_ms"] + len(audio) / 1024.0)
+    fault = await _fault("transcriptions")
+    if fault is not None:
+        return fault
+    language = str(form.get("language") or "")
+    text = "Vreau o carte despre prietenie." if language == "ro" else "I want a book about friendship."
+    return {"text": text}
+
+
+def _png(seed: bytes, size: int = 64) -> bytes:
+    """Small valid RGB PNG whose colour depends on the prompt (so caches can be checked)."""
+    r, g, b = seed[0], seed[1], seed[2]
+    raw = b"".join(b"\x00" + bytes((r, g, b)) * size for _ in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+@app.post("/v1/images/generations")
+async def images(request: Request) -> Any:
+    body = await request.json()
+    await _sleep(CONFIG["image_latency_ms"])
+    fault = await _fault("images")
+    if fault is not None:
+        return fault
+    seed = hashlib.sha256(f"{body.get('prompt')}|{body.get('size')}".encode("utf-8")).digest()
+    return {"created": int(time.time()),
+            "data": [{"b64_json": base64.b64encode(_png(seed)).decode("ascii")}]}
+
+
+# -------- Control plane (not part of the OpenAI API) --------
+@app.get("/_fake/config")
+async def get_config() -> Dict[str, Any]:
+    return {"config": CONFIG, "counts": COUNTS}
+
+
+@app.post("/_fake/config")
+async def set_config(request: Request) -> Dict[str, Any]:
+    updates = await request.json()
+    for key, value in (updates or {}).items():
+        if key in CONFIG:
+            CONFIG[key] = float(value)
+    if updates.get("reset_counts"):
+        COUNTS.clear()
+    return {"config": CONFIG, "counts": COUNTS}
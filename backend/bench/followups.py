@@ -0,0 +1,56 @@
+"""
+Follow-up detection regression check: which of the last retrieval's books
+Session.referenced_books picks for a message, against the expected answer.
+
+    python -m bench.followups
+
+A follow-up skips classification and retrieval, so a fresh request mistaken for one gets
+answered about the wrong books; the opposite only costs a search. Each case below is a
+phrasing that went one way or the other before. Exits 1 on any mismatch.
+"""
+from __future__ import annotations
+
+import sys
+from typing import List, Tuple
+
+from services.session_store import Session
+
+LAST_RESULTS = ["The Hobbit", "1984", "It"]
+
+# (message, titles it refers back to; [] = a new search)
+CASES: List[Tuple[str, List[str]]] = [
+    # New requests that name or contain a title we just showed.
+    ("Recommend a dystopia published after 1984", []),
+    ("recommend a book with a twist", []),
+    ("Give me a thriller, I need it for a trip", []),
+    ("Recommend a war novel for my dad, he loves them", []),
+    ("Now I want a sci-fi book, is it possible?", []),
+    ("Is there one about the first world war?", []),
+    ("Something like The Hobbit", []),
+    # Real follow-ups.
+    ("Give me the full summary of The Hobbit", ["The Hobbit"]),
+    ("Tell me more about 1984", ["1984"]),
+    ("tell me more about it", LAST_RESULTS),
+    ("Which of them is the shortest?", LAST_RESULTS),
+    ("the second one", ["1984"]),
+    ("a doua carte", ["1984"]),
+    ("cartea a doua", ["1984"]),
+    ("spune-mi mai multe despre ea", LAST_RESULTS),
+]
+
+
+def main() -> None:
+    session = Session(id="check", books=[{"id": str(i), "title": t, "summary": ""}
+                                         for i, t in enumerate(LAST_RESULTS)])
+    failures = 0
+    for message, expected in CASES:
+        got = [b["title"] for b in session.referenced_books(message)]
+        if got != expected:
+            failures += 1
+            print(f"  {message!r}: expected {expected}, got {got}")
+    print(f"{len(CASES)} messages: {failures} failures")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Ingestion throughput (docs/sec) for a synthetic catalog against the fake embedding server.
+
+    FAKE_OPENAI_ERROR_RATE=0.05 uvicorn bench.fake_openai:app --port 8100 &
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=x python -m bench.ingest_throughput -n 20000 -c 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+
+import chromadb
+
+from services.ingest_service import IngestService, iter_books
+
+WORDS = ("dragon friendship war love truth freedom quest magic family city sea journey secret "
+         "king village detective murder ship island school memory winter empire").split()
+
+
+def write_catalog(path: str, n: int, words_per_summary: int = 80) -> None:
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("{\n")
+        for i in range(n):
+            summary = " ".join(rng.choice(WORDS) for _ in range(words_per_summary))
+            sep = "," if i < n - 1 else ""
+            f.write(f"  {json.dumps(f'Book {i}')}: {json.dumps(summary)}{sep}\n")
+        f.write("}\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--docs", type=int, default=5000)
+    parser.add_argument("-c", "--concurrency", type=int, default=4)
+    parser.add_argument("--batch-tokens", type=int, default=100_000)
+    parser.add_argument("--batch-items", type=int, default=512)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "catalog.json")
+        write_catalog(source, args.docs)
+        client = chromadb.PersistentClient(path=os.path.join(tmp, "chroma"))
+        collection = client.get_or_create_collection(name="bench", embedding_function=None)
+        service = IngestService(
+            collection,
+            concurrency=args.concurrency,
+            max_batch_tokens=args.batch_tokens,
+            max_batch_items=args.batch_items,
+            write_batch_size=client.get_max_batch_size(),
+            retry_backoff_seconds=0.2,
+        )
+        first = asyncio.run(service.run(iter_books(source)))
+        again = asyncio.run(service.run(iter_books(source)))
+    print(json.dumps({"cold": first, "unchanged_rerun": again}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
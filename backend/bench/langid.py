@@ -0,0 +1,76 @@
+"""
+Language detection cost per query: langdetect (what the routes used to call, twice per
+book request) against utils.langid, on the benchmark workload queries.
+
+    python -m bench.langid [-n 2000] [--seed 42]
+
+Reports the cold first call (profile loading), the per-call cost after that, and how
+often the two detectors agree. Needs `langdetect` installed for the "before" column.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable, Dict, List
+
+from bench.workloads import Workload
+from utils.langid import detect_language
+
+
+def _langdetect() -> Callable[[str], str]:
+    from langdetect import DetectorFactory, detect
+    from langdetect.lang_detect_exception import LangDetectException
+
+    DetectorFactory.seed = 0
+
+    def run(text: str) -> str:
+        try:
+            return "ro" if detect(text) == "ro" else "en"
+        except LangDetectException:
+            return "en"
+    return run
+
+
+def measure(fn: Callable[[str], str], queries: List[str]) -> Dict[str, float]:
+    started = time.perf_counter()
+    fn(queries[0])
+    cold = time.perf_counter() - started
+    per_call = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        per_call.append(time.perf_counter() - t0)
+    return {"cold_ms": cold * 1000.0, "mean_us": statistics.mean(per_call) * 1e6,
+            "p99_us": sorted(per_call)[int(0.99 * (len(per_call) - 1))] * 1e6}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", type=int, default=2000, help="queries to detect")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workload = Workload("chat", seed=args.seed)
+    queries = [workload.next().json["query"] for _ in range(args.n)]
+
+    detectors: Dict[str, Callable[[str], str]] = {"langid": detect_language}
+    try:
+        detectors = {"langdetect": _langdetect(), **detectors}
+    except ImportError:
+        print("langdetect not installed; measuring utils.langid only")
+
+    print(f"{len(queries)} queries ({len(set(queries))} distinct)")
+    print(f"  {'detector':12} {'cold ms':>9} {'mean us':>9} {'p99 us':>9}")
+    for name, fn in detectors.items():
+        m = measure(fn, queries)
+        print(f"  {name:12} {m['cold_ms']:>9.1f} {m['mean_us']:>9.1f} {m['p99_us']:>9.1f}")
+
+    if "langdetect" in detectors:
+        reference = detectors["langdetect"]
+        same = sum(1 for q in set(queries) if reference(q) == detect_language(q))
+        print(f"agreement with langdetect: {same}/{len(set(queries))} distinct queries")
+
+
+if __name__ == "__main__":
+    main()
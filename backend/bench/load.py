@@ -0,0 +1,240 @@
+"""
+Closed-loop load driver: RPS and p50/p95/p99 per endpoint at several concurrency levels.
+
+Start the fake upstream and the app (see bench/fake_openai.py), then:
+
+    python -m bench.load --workload mixed -c 1,8,32 -n 300 --out results/mixed.json \
+        --fake-url http://127.0.0.1:8100 [--fault error_rate=0.05] [--compare results/base.json]
+
+Each level runs `-n` requests (after `--warmup` unmeasured ones) with `c` workers. Caches
+stay warm between levels, as they would in production; --unique defeats them. With
+--fake-url the upstream call counts per level are recorded too (upstream calls per
+request is what the caches and single-flight are meant to reduce).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from bench.chat_latency import percentile
+from bench.workloads import MIXES, BenchRequest, Workload, load_queries_file
+
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    if not latencies:
+        return {}
+    return {
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "mean_ms": round(statistics.mean(latencies), 1),
+        "max_ms": round(max(latencies), 1),
+    }
+
+
+async def _send(http: httpx.AsyncClient, req: BenchRequest) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    first: Optional[float] = None
+    try:
+        if req.stream:
+            async with http.stream("POST", req.endpoint, json=req.json) as r:
+                async for line in r.aiter_lines():
+                    if first is None and line.startswith("event: token"):
+                        first = (time.perf_counter() - t0) * 1000.0
+                status = r.status_code
+        else:
+            r = await http.post(req.endpoint, json=req.json, data=req.data, files=req.files)
+            status = r.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return {"endpoint": req.endpoint.split("?", 1)[0], "status": status,
+            "ms": (time.perf_counter() - t0) * 1000.0, "first_ms": first}
+
+
+async def run_level(http: httpx.AsyncClient, workload: Workload, concurrency: int,
+                    total: int, warmup: int) -> Dict[str, Any]:
+    for _ in range(warmup):
+        await _send(http, workload.next())
+
+    requests = [workload.next() for _ in range(total)]
+    queue: asyncio.Queue = asyncio.Queue()
+    for req in requests:
+        queue.put_nowait(req)
+    results: List[Dict[str, Any]] = []
+
+    async def worker() -> None:
+        while True:
+            try:
+                req = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            results.append(await _send(http, req))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    endpoints: Dict[str, Any] = {}
+    for endpoint in sorted({r["endpoint"] for r in results}):
+        rows = [r for r in results if r["endpoint"] == endpoint]
+        ok = [r["ms"] for r in rows if r["status"] == 200]
+        statuses: Dict[str, int] = {}
+        for r in rows:
+            statuses[str(r["status"])] = statuses.get(str(r["status"]), 0) + 1
+        entry: Dict[str, Any] = {"requests": len(rows), "rps": round(len(rows) / elapsed, 2),
+                                 "errors": len(rows) - len(ok), "statuses": statuses, **_summary(ok)}
+        first = [r["first_ms"] for r in rows if r["first_ms"] is not None]
+        if first:
+            entry["first_token"] = _summary(first)
+        endpoints[endpoint] = entry
+
+    ok_all = [r["ms"] for r in results if r["status"] == 200]
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "duration_s": round(elapsed, 3),
+        "rps": round(len(results) / elapsed, 2),
+        "errors": len(results) - len(ok_all),
+        "overall": _summary(ok_all),
+        "endpoints": endpoints,
+    }
+
+
+async def _fake(http: httpx.AsyncClient, fake_url: Optional[str], updates: Dict[str, Any]) -> Dict[str, Any]:
+    if not fake_url:
+        return {}
+    try:
+        r = await http.post(f"{fake_url.rstrip('/')}/_fake/config", json=updates)
+        return r.json()
+    except httpx.HTTPError:
+        return {}
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _print_level(level: Dict[str, Any]) -> None:
+    print(f"\nconcurrency={level['concurrency']} requests={level['requests']} "
+          f"rps={level['rps']} errors={level['errors']} duration={level['duration_s']}s")
+    print(f"  {'endpoint':18} {'n':>5} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>5}")
+    for endpoint, e in level["endpoints"].items():
+        print(f"  {endpoint:18} {e['requests']:>5} {e['rps']:>7} {e.get('p50_ms', '-'):>8} "
+              f"{e.get('p95_ms', '-'):>8} {e.get('p99_ms', '-'):>8} {e['errors']:>5}")
+        if "first_token" in e:
+            ft = e["first_token"]
+            print(f"  {'  first token':18} {'':>5} {'':>7} {ft['p50_ms']:>8} {ft['p95_ms']:>8} {ft['p99_ms']:>8}")
+    if "upstream_per_request" in level:
+        print(f"  upstream calls/request: {level['upstream_per_request']}")
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    base_levels = {lv["concurrency"]: lv for lv in baseline.get("levels", [])}
+    print(f"\nvs baseline {baseline.get('meta', {}).get('git_rev', '?')} (negative = faster):")
+    for level in current["levels"]:
+        base = base_levels.get(level["concurrency"])
+        if not base:
+            continue
+        for endpoint, e in level["endpoints"].items():
+            b = base["endpoints"].get(endpoint)
+            if not b or "p95_ms" not in e or "p95_ms" not in b:
+                continue
+            delta = (e["p95_ms"] - b["p95_ms"]) / b["p95_ms"] * 100.0 if b["p95_ms"] else 0.0
+            print(f"  c={level['concurrency']:<4} {endpoint:18} p95 {b['p95_ms']:>8} -> {e['p95_ms']:>8} "
+                  f"({delta:+.1f}%)  rps {b['rps']} -> {e['rps']}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    extra = load_queries_file(args.queries_file) if args.queries_file else []
+    faults = dict(kv.split("=", 1) for kv in args.fault)
+    levels = []
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout,
+                                 limits=httpx.Limits(max_connections=max(args.concurrency) * 2)) as http:
+        await _fake(http, args.fake_url, faults)
+        for concurrency in args.concurrency:
+            # Per-level seed: popular queries still repeat across levels (and hit warm caches),
+            # the long tail does not. Use --unique for a cold-cache run.
+            workload = Workload(args.workload, seed=args.seed + concurrency, unique=args.unique,
+                                extra_queries=extra)
+            before = await _fake(http, args.fake_url, {})
+            level = await run_level(http, workload, concurrency, args.requests, args.warmup)
+            after = await _fake(http, args.fake_url, {})
+            if before and after:
+                calls = {k: after["counts"].get(k, 0) - before["counts"].get(k, 0) for k in after["counts"]}
+                level["upstream"] = {k: v for k, v in calls.items() if v}
+                upstream = sum(v for k, v in calls.items() if not k.startswith("fault_"))
+                level["upstream_per_request"] = round(upstream / max(1, level["requests"]), 3)
+            _print_level(level)
+            levels.append(level)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_rev": _git_rev(),
+            "url": args.url,
+            "workload": args.workload,
+            "mix": MIXES[args.workload],
+            "seed": args.seed,
+            "unique": args.unique,
+            "requests_per_level": args.requests,
+            "warmup": args.warmup,
+            "faults": faults,
+            "fake_config": (await _fake_config(args.fake_url)),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+        },
+        "levels": levels,
+    }
+
+
+async def _fake_config(fake_url: Optional[str]) -> Dict[str, Any]:
+    async with httpx.AsyncClient(timeout=5.0) as http:
+        return (await _fake(http, fake_url, {})).get("config", {})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SmartLibrarian load benchmark.")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--workload", choices=sorted(MIXES), default="chat")
+    parser.add_argument("-c", "--concurrency", default="1,8,32",
+                        type=lambda s: [int(x) for x in s.split(",") if x])
+    parser.add_argument("-n", "--requests", type=int, default=200, help="measured requests per level")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--unique", action="store_true", help="make every query unique (no cache hits)")
+    parser.add_argument("--queries-file", help="JSONL with extra `query` (or `title`) lines for book requests")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--fake-url", help="fake OpenAI server, to record upstream call counts")
+    parser.add_argument("--fault", action="append", default=[],
+                        help="fake server knob for the run, e.g. error_rate=0.05 (repeatable)")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to diff p95/RPS against")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    result = asyncio.run(run(args))
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"\nwrote {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
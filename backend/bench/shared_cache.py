@@ -0,0 +1,110 @@
+"""
+Query-embedding cache across uvicorn-style worker processes: hit rate, upstream calls and
+cache memory per worker, with every worker keeping its own in-process cache ("local", what
+a multi-worker deployment used to get) against the shared SQLite tier ("shared": a small
+per-worker hot tier in front of one WAL file, SHARED_CACHE_PATH).
+
+    python -m bench.shared_cache [--workers 1,4,8] [--requests 24000] [--keys 8000]
+                                 [--cache-size 1024] [--local-size 256] [--dim 1536]
+
+The same Zipf-distributed query stream is dealt round-robin to the workers, which start
+together. A miss stands in for an embedding call: a seeded random vector is "fetched" and
+cached. Memory is the growth of each worker's RSS over the run (what the cache holds).
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import statistics
+import tempfile
+import time
+import zlib
+from typing import Dict, List
+
+from utils.cache import make_cache
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def zipf_stream(n: int, keys: int, s: float, seed: int) -> List[int]:
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** s) for rank in range(1, keys + 1)]
+    return rng.choices(range(keys), weights=weights, k=n)
+
+
+def _worker(worker: int, stream: List[int], args: argparse.Namespace, path: str, barrier, out) -> None:
+    before = _rss_mb()
+    cache = (make_cache(args.cache_size, 3600.0) if args.mode == "local" else
+             make_cache(args.cache_size, 3600.0, path, table="query_vectors", codec="vector",
+                        local_size=args.local_size))
+    barrier.wait()
+    started = time.perf_counter()
+    misses = 0
+    for key_id in stream:
+        key = f"q{key_id}"
+        if cache.get(key) is None:
+            misses += 1
+            rng = random.Random(zlib.crc32(key.encode()))
+            cache.set(key, [rng.uniform(-1.0, 1.0) for _ in range(args.dim)])
+    elapsed = time.perf_counter() - started
+    out.put({"worker": worker, "requests": len(stream), "misses": misses,
+             "us_per_request": elapsed / max(len(stream), 1) * 1e6, "rss_growth_mb": _rss_mb() - before})
+
+
+def run(workers: int, args: argparse.Namespace, stream: List[int]) -> Dict[str, float]:
+    ctx = mp.get_context("fork")
+    barrier, out = ctx.Barrier(workers), ctx.Queue()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared_cache.sqlite3")
+        procs = [ctx.Process(target=_worker, args=(w, stream[w::workers], args, path, barrier, out))
+                 for w in range(workers)]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+    requests = sum(r["requests"] for r in results)
+    misses = sum(r["misses"] for r in results)
+    return {
+        "workers": workers,
+        "hit_rate": 1.0 - misses / requests,
+        "upstream_calls": misses,
+        "rss_mb_per_worker": statistics.mean(r["rss_growth_mb"] for r in results),
+        "us_per_request": statistics.mean(r["us_per_request"] for r in results),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", default="1,4,8", type=lambda s: [int(x) for x in s.split(",") if x])
+    parser.add_argument("--requests", type=int, default=24000, help="total, split across the workers")
+    parser.add_argument("--keys", type=int, default=8000, help="distinct queries")
+    parser.add_argument("--zipf", type=float, default=1.0)
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--local-size", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    stream = zipf_stream(args.requests, args.keys, args.zipf, args.seed)
+    print(f"{args.requests} requests over {args.keys} keys (zipf {args.zipf}), cache {args.cache_size} entries, "
+          f"local tier {args.local_size}, dim {args.dim}")
+    print(f"  {'mode':<7} {'workers':>7} {'hit rate':>9} {'upstream':>9} {'MB/worker':>10} {'us/req':>8}")
+    for mode in ("local", "shared"):
+        args.mode = mode
+        for workers in args.workers:
+            r = run(workers, args, stream)
+            print(f"  {mode:<7} {r['workers']:>7} {r['hit_rate']:>9.3f} {r['upstream_calls']:>9} "
+                  f"{r['rss_mb_per_worker']:>10.1f} {r['us_per_request']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Cold-start timings: `import app`, process spawn -> first /ping, and -> /ready.
+
+    python -m bench.startup_time [--runs 3]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_seconds() -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", "import time; t=time.perf_counter(); import app; print(time.perf_counter()-t)"],
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def serve_timings(timeout: float = 120.0) -> dict:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=dict(os.environ),
+    )
+    first_request = ready = None
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=2.0) as http:
+            while time.perf_counter() - started < timeout and ready is None:
+                try:
+                    if first_request is None and http.get("/ping").status_code == 200:
+                        first_request = time.perf_counter() - started
+                    if first_request is not None and http.get("/ready").status_code == 200:
+                        ready = time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.02)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    return {"first_request_seconds": first_request, "ready_seconds": ready}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    serves = [serve_timings() for _ in range(args.runs)]
+    firsts = [s["first_request_seconds"] for s in serves if s["first_request_seconds"] is not None]
+    readies = [s["ready_seconds"] for s in serves if s["ready_seconds"] is not None]
+    print(json.dumps({
+        "import_app_seconds": round(statistics.median(imports), 3),
+        "spawn_to_first_request_seconds": round(statistics.median(firsts), 3) if firsts else None,
+        "spawn_to_ready_seconds": round(statistics.median(readies), 3) if readies else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
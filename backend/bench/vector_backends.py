@@ -0,0 +1,99 @@
+"""
+Query latency and memory: Chroma vs the NumPy backend, on random unit vectors.
+
+    python -m bench.vector_backends --sizes 1000 10000 100000 --dim 1536 --queries 200
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import chromadb
+import numpy as np
+
+from services.vector_backends import ChromaBackend, NumpyBackend
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def timed(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    samples: List[float] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {"p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[int(0.95 * (len(samples) - 1))], 3)}
+
+
+def run_size(n: int, dim: int, queries: int, top_k: int, tmp: str) -> Dict[str, object]:
+    rng = np.random.default_rng(n)
+    data = rng.standard_normal((n, dim), dtype=np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    qs = rng.standard_normal((queries, dim), dtype=np.float32)
+    qs /= np.linalg.norm(qs, axis=1, keepdims=True)
+
+    client = chromadb.PersistentClient(path=os.path.join(tmp, f"chroma-{n}"))
+    collection = client.get_or_create_collection(name="bench", embedding_function=None)
+    step = client.get_max_batch_size()
+    for s in range(0, n, step):
+        collection.add(ids=[f"doc-{i}" for i in range(s, min(n, s + step))],
+                       embeddings=data[s:s + step].tolist(),
+                       documents=[f"summary {i}" for i in range(s, min(n, s + step))],
+                       metadatas=[{"title": f"Book {i}"} for i in range(s, min(n, s + step))])
+    del data
+    gc.collect()
+
+    result: Dict[str, object] = {"docs": n, "dim": dim}
+    chroma = ChromaBackend(collection)
+    before = rss_mb()
+    chroma.query([qs[0].tolist()], top_k)  # load HNSW segment
+    result["chroma"] = {**timed(lambda: chroma.query([qs[0].tolist()], top_k), queries),
+                        "rss_delta_mb": round(rss_mb() - before, 1)}
+
+    for dtype in ("float32", "float16"):
+        backend = NumpyBackend(collection, os.path.join(tmp, f"np-{n}-{dtype}"), dtype)
+        backend.build("bench")
+        backend = NumpyBackend(collection, backend.path, dtype)
+        before = rss_mb()
+        backend.refresh("bench")  # mmap load only
+        backend.query([qs[0]], top_k)
+        single = timed(lambda: backend.query([qs[0]], top_k), queries)
+        batch = timed(lambda: backend.query(qs[:32], top_k), max(5, queries // 10))
+        result[f"numpy_{dtype}"] = {**single, "batch32_p50_ms": batch["p50_ms"],
+                                    "rss_delta_mb": round(rss_mb() - before, 1)}
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = [run_size(n, args.dim, args.queries, args.top_k, tmp) for n in args.sizes]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Scripted, seeded workloads for bench.load.
+
+Queries are generated from data/book_summaries.json (titles and summary keywords) and
+mix small talk, book requests, full-summary requests and profanity, in Romanian and
+English. Popularity is Zipf-like, so repeated queries exercise the caches and
+single-flight the way real traffic does; pass unique=True to measure the cold path.
+
+    python -m bench.workloads --workload mixed -n 20      # print a sample
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import math
+import random
+import wave
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from config import BOOKS_FILE_JSON
+from services.ingest_service import iter_books_json
+from services.lexical_index import tokenize
+
+
+@dataclass
+class BenchRequest:
+    endpoint: str                    # "/chat", "/chat/stream", "/audio/tts", ...
+    category: str                    # small_talk, book_request, full_summary, profanity, tts, stt, image
+    json: Optional[Dict[str, Any]] = None
+    data: Optional[Dict[str, str]] = None
+    files: Optional[Dict[str, Tuple[str, bytes, str]]] = None
+    stream: bool = False
+
+
+SMALL_TALK = [
+    "Salut! Ce faci?", "Bună ziua!", "Hello, how are you?", "Hi there!", "Hey, what's up?",
+    "Mulțumesc, o zi bună!", "Thanks, have a nice day!", "Ce mai faci azi?",
+]
+BOOK_TEMPLATES_RO = [
+    "Vreau o carte ca {title}.", "Ce-mi recomanzi dacă mi-a plăcut {title}?",
+    "Recomandă-mi o carte despre {keyword}.", "Caut un roman despre {keyword} și {keyword2}.",
+]
+BOOK_TEMPLATES_EN = [
+    "I want a book like {title}.", "What should I read if I loved {title}?",
+    "Recommend a book about {keyword}.", "Any novel about {keyword} and {keyword2}?",
+]
+FULL_SUMMARY_TEMPLATES = [
+    "Dă-mi rezumatul complet pentru {title}.", "Vreau rezumatul complet al cărții {title}.",
+    "Give me the full summary of {title}.", "Full summary for {title}, please.",
+]
+PROFANITY = [
+    "Ce naiba să citesc?", "Recomandă-mi o carte, dracu!", "What the fuck should I read?",
+    "This shit is boring, give me a book.",
+]
+IMAGE_TEMPLATES = [
+    "Copertă de carte minimalistă pentru {title}", "Minimalist book cover for {title}",
+    "Ilustrație în acuarelă inspirată de {title}",
+]
+
+# Default mixes: category -> weight.
+MIXES: Dict[str, Dict[str, float]] = {
+    "chat": {"small_talk": 0.2, "book_request": 0.55, "full_summary": 0.15, "profanity": 0.1},
+    "stream": {"small_talk": 0.2, "book_request": 0.6, "full_summary": 0.2},
+    "mixed": {"small_talk": 0.1, "book_request": 0.35, "full_summary": 0.1, "profanity": 0.05,
+              "stream": 0.15, "tts": 0.15, "stt": 0.05, "image": 0.05},
+}
+
+
+def load_catalog(path: str = BOOKS_FILE_JSON) -> List[Tuple[str, List[str]]]:
+    """(title, distinctive summary keywords) per book."""
+    books = list(iter_books_json(path))
+    df: Counter = Counter()
+    tokens_by_title = {}
+    for book in books:
+        tokens = [t for t in tokenize(book.summary) if len(t) > 4]
+        tokens_by_title[book.title] = tokens
+        df.update(set(tokens))
+    catalog = []
+    for book in books:
+        counts = Counter(tokens_by_title[book.title])
+        ranked = sorted(counts, key=lambda t: -counts[t] * math.log(1 + len(books) / df[t]))
+        catalog.append((book.title, ranked[:8] or [book.title.lower()]))
+    return catalog
+
+
+def load_queries_file(path: str) -> List[str]:
+    """Extra queries from a JSONL file (`query`, else `title` per line), e.g. a support log export."""
+    out = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            text = row.get("query") or row.get("title")
+            if text:
+                out.append(str(text))
+    return out
+
+
+def wav_bytes(seconds: float = 1.0, rate: int = 16000, freq: float = 440.0) -> bytes:
+    """Mono 16-bit tone, good enough as an STT upload."""
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        frames = bytearray()
+        for i in range(int(seconds * rate)):
+            sample = int(8000 * math.sin(2 * math.pi * freq * i / rate))
+            frames += sample.to_bytes(2, "little", signed=True)
+        w.writeframes(bytes(frames))
+    return buf.getvalue()
+
+
+@dataclass
+class Workload:
+    name: str = "chat"
+    seed: int = 42
+    unique: bool = False
+    pool_size: int = 200          # distinct requests per category before Zipf sampling
+    zipf_s: float = 1.1
+    extra_queries: List[str] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        if self.name not in MIXES:
+            raise ValueError(f"Unknown workload {self.name!r}; choose from {sorted(MIXES)}")
+        self.rng = random.Random(self.seed)
+        self.catalog = load_catalog()
+        self.mix = MIXES[self.name]
+        self.pools = {cat: self._pool(cat) for cat in self.mix}
+        self.weights = {cat: self._zipf_weights(len(pool)) for cat, pool in self.pools.items()}
+        self._audio = wav_bytes()
+        self._counter = 0
+
+    def _zipf_weights(self, n: int) -> List[float]:
+        return [1.0 / (rank ** self.zipf_s) for rank in range(1, n + 1)]
+
+    def _book_query(self) -> str:
+        title, keywords = self.rng.choice(self.catalog)
+        template = self.rng.choice(BOOK_TEMPLATES_RO + BOOK_TEMPLATES_EN)
+        keyword, keyword2 = self.rng.sample(keywords, 2) if len(keywords) > 1 else (keywords[0], keywords[0])
+        return template.format(title=title, keyword=keyword, keyword2=keyword2)
+
+    def _pool(self, category: str) -> List[str]:
+        rng = self.rng
+        if category == "small_talk":
+            return list(SMALL_TALK)
+        if category == "profanity":
+            return list(PROFANITY)
+        if category in ("book_request", "stream"):
+            pool = {self._book_query() for _ in range(self.pool_size * 3)}
+            pool = sorted(pool)[: self.pool_size] + list(self.extra_queries)
+            rng.shuffle(pool)
+            return pool
+        if category == "full_summary":
+            return [t.format(title=title) for title, _ in self.catalog for t in FULL_SUMMARY_TEMPLATES]
+        if category == "tts":
+            return [f"{title}. " + " ".join(keywords) for title, keywords in self.catalog]
+        if category == "image":
+            return [t.format(title=title) for title, _ in self.catalog for t in IMAGE_TEMPLATES]
+        if category == "stt":
+            return ["ro", "en"]
+        raise ValueError(category)
+
+    def next(self) -> BenchRequest:
+        cats = list(self.mix)
+        category = self.rng.choices(cats, weights=[self.mix[c] for c in cats])[0]
+        pool = self.pools[category]
+        text = self.rng.choices(pool, weights=self.weights[category])[0]
+        self._counter += 1
+        if self.unique and category != "stt":
+            text = f"{text} #{self._counter}"
+
+        if category == "tts":
+            return BenchRequest("/audio/tts", category, data={"text": text, "voice": "alloy", "format": "mp3"})
+        if category == "stt":
+            return BenchRequest(f"/audio/stt?language={text}", category,
+                                files={"file": ("speech.wav", self._audio, "audio/wav")})
+        if category == "image":
+            return BenchRequest("/images/generate", category, data={"prompt": text, "size": "1024x1024"})
+        if category == "stream" or self.name == "stream":
+            return BenchRequest("/chat/stream", category, json={"query": text}, stream=True)
+        return BenchRequest("/chat", category, json={"query": text})
+
+    def __iter__(self) -> Iterator[BenchRequest]:
+        while True:
+            yield self.next()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print a sample of a benchmark workload.")
+    parser.add_argument("--workload", choices=sorted(MIXES), default="chat")
+    parser.add_argument("-n", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--unique", action="store_true")
+    args = parser.parse_args()
+    workload = Workload(args.workload, seed=args.seed, unique=args.unique)
+    for _ in range(args.n):
+        req = workload.next()
+        payload = req.json or {k: v for k, v in (req.data or {}).items()}
+        print(f"{req.endpoint:18} {req.category:13} {json.dumps(payload, ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
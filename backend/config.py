@@ -4,6 +4,120 @@ from dotenv import load_dotenv
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-CHROMA_DB_PATH = "./data/embeddings"
+# Optional override, e.g. http://127.0.0.1:8100/v1 for the fake server in bench/
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+CHROMA_DB_PATH = os.getenv("CHROMA_DB_PATH", "./data/embeddings")
 BOOKS_FILE_TXT = "./book_summaries.txt"
-BOOKS_FILE_JSON = "./data/book_summaries.json"
+BOOKS_FILE_JSON = os.getenv("BOOKS_FILE_JSON", "./data/book_summaries.json")
+# Memory-mapped catalog built from BOOKS_FILE_JSON (`python -m services.catalog_store build`);
+# until it exists, the services parse the JSON file instead
+CATALOG_PATH = os.getenv("CATALOG_PATH", "./data/book_catalog.bin")
+
+# Cache tier shared by all workers on a host (utils/cache.py): one SQLite file in WAL mode that
+# the embedding, response and session caches and the TTS/image file indexes default to when set.
+# Embeddings and answers also keep SHARED_CACHE_LOCAL_SIZE hot entries in each worker's memory.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH") or None
+SHARED_CACHE_LOCAL_SIZE = int(os.getenv("SHARED_CACHE_LOCAL_SIZE", "256"))
+
+# Query-embedding cache (in-process LRU+TTL; set the path to persist it in SQLite)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", "86400"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH") or SHARED_CACHE_PATH
+
+# Full /chat answer cache, keyed on (corpus version, lang, intent, retrieved ids, normalized query)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "21600"))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH") or SHARED_CACHE_PATH
+
+# Incremental (content-hashed) re-index of BOOKS_FILE_JSON when EmbeddingsService starts
+REINDEX_ON_STARTUP = os.getenv("REINDEX_ON_STARTUP", "1") not in ("0", "false", "False")
+
+# Bulk embedding / ingestion pipeline (services/ingest_service.py)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "4"))
+INGEST_BATCH_TOKENS = int(os.getenv("INGEST_BATCH_TOKENS", "100000"))
+INGEST_BATCH_ITEMS = int(os.getenv("INGEST_BATCH_ITEMS", "1024"))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "6"))
+
+# Shared, pooled HTTP connections to the OpenAI API (services/registry.py)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+
+# Local intent tier: answers with confidence >= threshold skip the LLM classifier
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.75"))
+
+# Retrieval backend behind EmbeddingsService: "chroma" (default) or "numpy" (in-memory, mmap-ed snapshot)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+NUMPY_INDEX_PATH = os.getenv("NUMPY_INDEX_PATH", "./data/numpy_index")
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")  # or float16 to halve memory
+
+# Hybrid retrieval: BM25 over titles/summaries fused with vector hits (reciprocal rank fusion)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "1") not in ("0", "false", "False")
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# TTS audio cache: content-addressed by (text hash, voice, format, model), LRU under a size cap
+TTS_MODEL = os.getenv("TTS_MODEL", "gpt-4o-mini-tts")
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./data/tts_cache")
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Speech-to-text uploads: rejected past STT_MAX_BYTES while still streaming in (Whisper's own limit
+# is 25 MB), spooled to disk. With STT_SPLIT_SECONDS > 0, longer WAV recordings are cut at pauses
+# into pieces of about that length and transcribed concurrently (utils/audio_split.py), at most
+# STT_SPLIT_CONCURRENCY at a time per upload (capped at the "stt" limit in UPSTREAM_LIMITS).
+STT_MODEL = os.getenv("STT_MODEL", "whisper-1")
+STT_MAX_BYTES = int(os.getenv("STT_MAX_BYTES", str(25 * 1024 * 1024)))
+STT_SPLIT_SECONDS = float(os.getenv("STT_SPLIT_SECONDS", "0"))
+STT_SPLIT_CONCURRENCY = int(os.getenv("STT_SPLIT_CONCURRENCY", "2"))
+
+# Generated images, cached on disk by (model, size, prompt); LRU under a size cap
+IMAGE_MODEL = os.getenv("IMAGE_MODEL", "gpt-image-1")
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./data/image_cache")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+# Observability: per-request sampling profiler, switched on with the `X-Profile: 1` request header
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") in ("1", "true", "True")
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILER_DIR = os.getenv("PROFILER_DIR", "./data/profiles")
+
+# Conversation sessions (services/session_store.py): recent turns and the last retrieved books per
+# session id; LRU + sliding TTL in memory, or in SQLite when SESSION_PATH is set
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "3600"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_PATH = os.getenv("SESSION_PATH") or SHARED_CACHE_PATH
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))
+# Estimated-token budget for the retrieved summaries + history GPTService packs into a prompt
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "1500"))
+# Retrieved summaries are cut down to their most query-relevant sentences within this many
+# estimated tokens (services/context_packer.py); 0 sends them whole
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "450"))
+
+# Profanity filter (utils/badwords.py): `<lang>.txt` term lists, re-read when they change
+BADWORDS_DIR = os.getenv("BADWORDS_DIR", "./data/badwords")
+BADWORDS_RELOAD_SECONDS = float(os.getenv("BADWORDS_RELOAD_SECONDS", "5"))
+
+# Upstream governor (services/governor.py): per-endpoint "name:concurrency:queue_depth",
+# async retries with backoff, and a circuit breaker that serves the localized fallbacks
+UPSTREAM_LIMITS = os.getenv("UPSTREAM_LIMITS", "chat:32:64,embeddings:16:64,tts:8:16,stt:4:8,images:2:4")
+UPSTREAM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT_SECONDS", "10"))
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_SECONDS", "0.5"))
+UPSTREAM_BACKOFF_CAP_SECONDS = float(os.getenv("UPSTREAM_BACKOFF_CAP_SECONDS", "8"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "30"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "15"))
+
+# Per-request deadline for /chat and /chat/stream (clients may tighten it with X-Deadline-Ms);
+# every stage gets only what is left. Streams are bounded up to their first token.
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", "12"))
+INTENT_TIMEOUT_SECONDS = float(os.getenv("INTENT_TIMEOUT_SECONDS", "3"))
+# Hedged completions: start a second attempt when the first is slower than the observed p95
+# (or HEDGE_AFTER_SECONDS if set), for at most HEDGE_MAX_RATIO of calls
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0") in ("1", "true", "True")
+HEDGE_AFTER_SECONDS = float(os.getenv("HEDGE_AFTER_SECONDS", "0"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+
+# POST /chat/batch: queries per request, and completions in flight at once per batch
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "256"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
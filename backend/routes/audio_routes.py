@@ -1,22 +1,28 @@
 from __future__ import annotations
 
-import io
+import asyncio
+import hashlib
 import logging
+import os
+import tempfile
 import traceback
-from typing import Iterator, Any, Optional, Dict
-
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import StreamingResponse
-from openai import OpenAI
+from typing import AsyncIterator, Any, BinaryIO, List, Optional, Dict
+
+from fastapi import APIRouter, Form, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+from config import STT_MAX_BYTES, STT_MODEL, STT_SPLIT_CONCURRENCY, STT_SPLIT_SECONDS, TTS_MODEL
+from services import registry
+from services.governor import governor
+from utils.audio_split import split_on_silence
+from utils.disk_cache import CacheWriter, DiskCache, tee_to_cache
+from utils.metrics import span
+from utils.single_flight import single_flight
 
 router = APIRouter()
-client = OpenAI()
-
-
-def stream_chunks(stream_ctx: Any) -> Iterator[bytes]:
-    with stream_ctx as response:
-        for chunk in response.iter_bytes():
-            yield chunk
 
 
 @router.get("/ping")
@@ -24,56 +30,162 @@ def ping():
     return {"ok": True, "scope": "audio"}
 
 
+@router.get("/tts/stats")
+def tts_stats() -> Dict[str, Any]:
+    cache = registry.tts_cache.peek()
+    return {"tts_cache": cache.stats() if cache else None,
+            "single_flight": single_flight.stats()["by_namespace"].get("tts")}
+
+
 # ---------- STT (Whisper) ----------
+_WAV_TYPES = ("audio/wav", "audio/x-wav", "audio/wave")  # what browsers and curl send for .wav
+STT_TYPES = ("audio/webm", *_WAV_TYPES, "audio/mpeg")
+_FORM_OVERHEAD = 16 * 1024  # multipart boundaries, part headers and the small fields
+
+
+async def _bounded(stream: AsyncIterator[bytes], limit: int) -> AsyncIterator[bytes]:
+    """The request body, aborted with a 413 as soon as it grows past `limit`."""
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > limit:
+            raise HTTPException(status_code=413, detail=f"Audio upload is larger than {STT_MAX_BYTES} bytes.")
+        yield chunk
+
+
+async def _transcribe(name: str, fileobj: BinaryIO, content_type: str, language: Optional[str]) -> str:
+    kwargs = {"language": language} if language else {}
+    # httpx rewinds and reads the file in chunks for every attempt.
+    resp = await governor.call("stt", lambda: registry.openai_client.get().audio.transcriptions.create(
+        model=STT_MODEL,
+        file=(name, fileobj, content_type),
+        **kwargs
+    ))
+    return getattr(resp, "text", "") or (resp.get("text", "") if isinstance(resp, dict) else "")
+
+
+async def _transcribe_pieces(paths: List[str], language: Optional[str]) -> str:
+    # The "stt" bulkhead rejects callers once its queue is full rather than making them wait,
+    # so one long upload must not put all its pieces in it at once.
+    sem = asyncio.Semaphore(max(1, min(STT_SPLIT_CONCURRENCY, governor.endpoint("stt").bulkhead.limit)))
+
+    async def one(path: str) -> str:
+        async with sem:
+            with open(path, "rb") as f:
+                return (await _transcribe(os.path.basename(path), f, "audio/wav", language)).strip()
+
+    texts = await asyncio.gather(*(one(p) for p in paths))
+    return " ".join(t for t in texts if t)
+
+
 @router.post("/stt")
-async def stt(file: UploadFile = File(...),  language: Optional[str] = None) -> Dict[str, str]:
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Invalid file upload: no filename provided.")
-    if file.content_type not in ["audio/webm", "audio/wav", "audio/mpeg"]:
-        raise HTTPException(status_code=400, detail="Unsupported file type.")
+async def stt(request: Request, language: Optional[str] = None) -> Dict[str, str]:
+    """
+    Whisper transcription of the uploaded `file` (multipart form, optional `language` field or
+    query parameter). The body is read as a stream and rejected with a 413 once it passes
+    STT_MAX_BYTES (straight away when Content-Length already says so); the file part is
+    spooled to disk past 1 MB rather than held in memory.
+    """
+    limit = STT_MAX_BYTES + _FORM_OVERHEAD
+    length = request.headers.get("content-length", "")
+    if length.isdigit() and int(length) > limit:
+        raise HTTPException(status_code=413, detail=f"Audio upload is larger than {STT_MAX_BYTES} bytes.")
 
     try:
-        raw: bytes = await file.read()
-        if not raw:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
-
-        buf = io.BytesIO(raw)
-        buf.name = file.filename or "speech.webm"
+        with span("stt_upload"):
+            form = await MultiPartParser(request.headers, _bounded(request.stream(), limit),
+                                         max_files=1, max_fields=4).parse()
+    except MultiPartException as e:
+        raise HTTPException(status_code=400, detail=f"Invalid file upload: {e.message}")
 
-        resp = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=buf,
-            language=language
-        )
-        text = getattr(resp, "text", "") or (resp.get("text", "") if isinstance(resp, dict) else "")
+    try:
+        file = form.get("file")
+        if not isinstance(file, UploadFile) or not file.filename:
+            raise HTTPException(status_code=400, detail="Invalid file upload: no filename provided.")
+        if file.content_type not in STT_TYPES:
+            raise HTTPException(status_code=400, detail="Unsupported file type.")
+        if not file.size:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty.")
+        field = form.get("language")
+        language = language or (field if isinstance(field, str) and field else None)
+
+        with tempfile.TemporaryDirectory(prefix="stt-") as tmp:
+            pieces: List[str] = []
+            if STT_SPLIT_SECONDS > 0 and file.content_type in _WAV_TYPES:
+                with span("stt_split"):
+                    pieces = await run_in_threadpool(split_on_silence, file.file, STT_SPLIT_SECONDS, tmp)
+            with span("stt_transcription"):
+                if pieces:
+                    text = await _transcribe_pieces(pieces, language)
+                else:
+                    text = await _transcribe(file.filename, file.file, file.content_type, language)
         return {"text": text}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error("STT failed: %s\n%s", e, traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"STT failed: {e}")
+    finally:
+        await form.close()
+
+
+# ---------- TTS (streaming, cached on disk) ----------
+def _tts_key(text: str, voice: str, fmt: str) -> str:
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return DiskCache.make_key(TTS_MODEL, voice, fmt, text_hash)
 
 
-# ---------- TTS (streaming) ----------
 @router.post("/tts")
-async def tts(text: str = Form(...), voice: str = Form("alloy"), format: str = Form("mp3")) -> StreamingResponse:
+async def tts(text: str = Form(...), voice: str = Form("alloy"), format: str = Form("mp3")) -> Response:
 
     if not text.strip():
         raise HTTPException(status_code=400, detail="Text input is required.")
     if format not in ["mp3", "wav", "ogg"]:
         raise HTTPException(status_code=400, detail="Unsupported audio format.")
 
-    try:
-        stream_ctx = client.audio.speech.with_streaming_response.create(
-            model="gpt-4o-mini-tts",
+    media = f"audio/{'mpeg' if format == 'mp3' else format}"
+    key = _tts_key(text, voice, format)
+    cache = registry.tts_cache.get()
+
+    with span("tts_cache"):
+        cached = cache.get(key, format)
+    if cached is not None:
+        # FileResponse handles Range requests and uses sendfile/pathsend when the server offers it.
+        return FileResponse(cached, media_type=media, headers={"X-Cache": "HIT", "Cache-Control": "private, max-age=86400"})
+
+    async def synthesize() -> AsyncIterator[bytes]:
+        async with governor.guard("tts"), registry.openai_client.get().audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
             voice=voice,
             input=text,
             response_format=format
-        )
-
-        media = f"audio/{'mpeg' if format == 'mp3' else format}"
-        return StreamingResponse(stream_chunks(stream_ctx), media_type=media)
-
+        ) as response:
+            try:
+                writer: Optional[CacheWriter] = cache.open_writer(key, format)
+            except OSError as e:
+                logging.warning("TTS cache unavailable: %s", e)
+                writer = None
+            async for chunk in tee_to_cache(response.iter_bytes(), writer):
+                yield chunk
+
+    # Concurrent requests for the same audio share one upstream synthesis (and one cache write).
+    chunks = single_flight.stream("tts", key, synthesize)
+    try:
+        with span("tts_first_byte"):
+            first = await chunks.__anext__()  # surface upstream errors as a 500 before headers go out
+    except StopAsyncIteration:
+        first = b""
+    except HTTPException:
+        raise  # governor rejection: 429/503 with Retry-After
     except Exception as e:
         logging.error("TTS failed: %s\n%s", e, traceback.format_exc())
         if "api_key" in str(e).lower() or "authentication" in str(e).lower():
             logging.error("OPENAI_API_KEY invalid.")
         raise HTTPException(status_code=500, detail=f"TTS failed: {e}")
+
+    async def body() -> AsyncIterator[bytes]:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(body(), media_type=media, headers={"X-Cache": "MISS"})
@@ -1,55 +1,52 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
-import re
-from typing import Dict, List, Literal
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter, HTTPException
-from openai import OpenAI, OpenAIError
+from fastapi import APIRouter, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
-from services.embeddings_service import EmbeddingsService
+from config import BATCH_CONCURRENCY, BATCH_MAX_ITEMS, CHAT_DEADLINE_SECONDS, INTENT_TIMEOUT_SECONDS, SESSION_MAX_TURNS
+from services import registry
+from services.context_packer import pack_context
+from services.governor import CircuitOpen, governor
 from services.gpt_service import GPTService
-from services.tools_service import ToolsService
+from services.intent_service import intent_classifier
+from services.response_cache import ResponseCache
+from services.session_store import Session
 from utils.badwords import badwords
-
-try:
-    from langdetect import detect as _langdetect_detect  # type: ignore
-    from langdetect.lang_detect_exception import LangDetectException  # type: ignore
-except ImportError:  # pragma: no cover
-    _langdetect_detect = None  # type: ignore
-    LangDetectException = Exception
+from utils.deadline import DeadlineExceeded, budget, deadline_scope, within
+from utils.langid import Lang, detect_language
+from utils.metrics import record, record_usage, span
+from utils.single_flight import single_flight
+from utils.text import fingerprint, normalize_query
 
 logger = logging.getLogger("smart_librarian.chat")
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
 
-client = OpenAI()
 CHAT_MODEL = "gpt-4o-mini"
 router = APIRouter()
 
-embeddings_service = EmbeddingsService()
-gpt_service = GPTService()
-tools_service = ToolsService()
-
-Lang = Literal["ro", "en"]
 
+async def classify_intent(query: str, lang: Lang) -> Literal["small_talk", "book_request", "other"]:
+    intent, confidence = intent_classifier.classify(query)
+    if confidence >= intent_classifier.threshold:
+        intent_classifier.record_local(intent)
+        return intent
+    logger.info("Local intent %s (%.2f) below threshold; asking the LLM.", intent, confidence)
+    key = fingerprint(lang, normalize_query(query))
+    with span("intent_llm"):
+        return await single_flight.do("intent", key, lambda: _classify_intent_llm(query, lang))
 
-def detect_language(text: str) -> Lang:
-    if _langdetect_detect:
-        try:
-            code = _langdetect_detect(text)
-            return "ro" if code == "ro" else "en"
-        except LangDetectException as e:
-            logger.error("Language detection error: %s", e)
-    lowered = text.lower()
-    if any(tok in lowered for tok in [" ce ", " cum ", " carte", " rezumat", "autor", "buna", "salut"]):
-        return "ro"
-    return "en"
 
-
-def classify_intent(query: str, lang: Lang) -> Literal["small_talk", "book_request", "other"]:
+async def _classify_intent_llm(query: str, lang: Lang) -> Literal["small_talk", "book_request", "other"]:
     system = (
         "Return ONLY a JSON object with a single key `intent` whose value is one of: "
         "`small_talk`,`book_request`,`other`. "
@@ -57,30 +54,33 @@ def classify_intent(query: str, lang: Lang) -> Literal["small_talk", "book_reque
     )
     user_msg = f"Language={lang}. Query={query}"
     try:
-        resp = client.chat.completions.create(
+        # No retries: the local classifier is a good enough answer when the upstream struggles.
+        resp = await within("intent", governor.call("chat", lambda: registry.openai_client.get().chat.completions.create(
             model=CHAT_MODEL,
             messages=[{"role": "system", "content": system},
                       {"role": "user", "content": user_msg}],
             temperature=0.0,
             max_tokens=20,
             response_format={"type": "json_object"},
-        )
+            timeout=budget(INTENT_TIMEOUT_SECONDS),
+        ), retries=0), cap=INTENT_TIMEOUT_SECONDS)
+        record_usage(CHAT_MODEL, getattr(resp, "usage", None))
         content = resp.choices[0].message.content or ""
         data = json.loads(content)
         intent = (data.get("intent") or "").strip()
         if intent in {"small_talk", "book_request", "other"}:
+            intent_classifier.record_escalation()
             return intent  # type: ignore[return-value]
-    except OpenAIError as e:
+    except Exception as e:  # keep chat resilient; openai is imported lazily
         logger.warning("Intent classification error: %s", e)
 
-    greeting_regex = r"\b(bun[aă]|salut(are)?|hei|ceau|ce\s+faci|ce\s+mai\s+faci)\b" if lang == "ro" \
-        else r"\b(hi|hello|hey|how\s+are\s+you|what's\s+up)\b"
-    if re.search(greeting_regex, query.strip(), re.IGNORECASE):
+    intent_classifier.record_escalation(failed=True)
+    if intent_classifier.is_greeting(query, lang):
         return "small_talk"
     return "other"
 
 
-def get_friendly_reply(query: str, lang: Lang) -> str:
+def _friendly_messages(query: str, lang: Lang) -> List[Dict[str, str]]:
     system_prompt = (
         "Ești un bibliotecar prietenos. Răspunde foarte concis (max 2 propoziții), cald și natural. "
         "Încheie cu o întrebare legată de lectură (de ex.: ce gen cauți azi?)."
@@ -88,98 +88,511 @@ def get_friendly_reply(query: str, lang: Lang) -> str:
         "You are a friendly librarian. Reply briefly (max 2 sentences), warm and natural. "
         "End with a helpful reading-related question (e.g., what genre are you into today?)."
     )
+    return [{"role": "system", "content": system_prompt},
+            {"role": "user", "content": query}]
+
+
+def _friendly_fallback(lang: Lang) -> str:
+    return "Salut! Ce ți-ar plăcea să citești astăzi?" if lang == "ro" else "Hi! What would you like to read today?"
+
+
+async def get_friendly_reply(query: str, lang: Lang) -> str:
     try:
-        resp = client.chat.completions.create(
+        resp = await within("small_talk", governor.call("chat", lambda: registry.openai_client.get().chat.completions.create(
             model=CHAT_MODEL,
-            messages=[{"role": "system", "content": system_prompt},
-                      {"role": "user", "content": query}],
+            messages=_friendly_messages(query, lang),
             temperature=0.7,
             max_tokens=60,
-        )
+            timeout=budget(),
+        ), retries=0))
+        record_usage(CHAT_MODEL, getattr(resp, "usage", None))
         return (resp.choices[0].message.content or "").strip()
-    except OpenAIError as e:
+    except Exception as e:
         logger.error("Small-talk generation failed: %s", e)
-        return "Salut! Ce ți-ar plăcea să citești astăzi?" if lang == "ro" else "Hi! What would you like to read today?"
+        return _friendly_fallback(lang)
+
+
+async def stream_friendly_reply(query: str, lang: Lang) -> AsyncIterator[str]:
+    emitted = False
+    try:
+        async with governor.guard("chat"):
+            stream = await registry.openai_client.get().chat.completions.create(
+                model=CHAT_MODEL,
+                messages=_friendly_messages(query, lang),
+                temperature=0.7,
+                max_tokens=60,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                record_usage(CHAT_MODEL, getattr(chunk, "usage", None))
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    emitted = True
+                    yield delta
+    except Exception as e:
+        logger.error("Small-talk streaming failed: %s", e)
+    if not emitted:
+        yield _friendly_fallback(lang)
 
 
-def get_semantic_results(query: str) -> Dict[str, any]:
+async def get_semantic_results(query: str) -> Dict[str, any]:
     try:
-        results = embeddings_service.search_books(query)
+        # Chroma is sync (SQLite/HNSW + embedding HTTP call): keep it off the event loop.
+        embeddings_service = await registry.embeddings_service.aget()
+        with span("search"):
+            results = await single_flight.do("search", normalize_query(query), lambda: governor.call(
+                "embeddings", lambda: run_in_threadpool(embeddings_service.search_books, query), retries=0))
         logger.info("Embeddings results: %s", {k: v for k, v in results.items() if k != "documents"})
         return results
+    except HTTPException:
+        raise  # governor rejection: 429/503 with Retry-After
     except Exception as e:
         logger.exception("Embeddings search failed: %s", e)
         raise HTTPException(status_code=500, detail="Error searching for books.")
 
 
-def get_gpt_recommendation(context: str, query: str) -> str:
+async def get_semantic_results_many(queries: List[str]) -> List[Dict[str, Any]]:
+    """One embeddings request and one vector query for the whole list; errors propagate."""
+    embeddings_service = await registry.embeddings_service.aget()
+    with span("search"):
+        return await governor.call("embeddings", lambda: run_in_threadpool(
+            embeddings_service.search_books_many, queries), retries=0)
+
+
+async def get_gpt_recommendation(context: str, query: str, lang: Lang,
+                                 history: Optional[List[Dict[str, str]]] = None) -> str:
     try:
-        return gpt_service.get_recommendation(context, query)
-    except OpenAIError as e:
+        gpt_service = await registry.gpt_service.aget()
+        return await gpt_service.get_recommendation(context, query, lang, history)
+    except HTTPException:
+        raise
+    except Exception as e:
         logger.exception("LLM recommendation failed: %s", e)
         raise HTTPException(status_code=500, detail="Error generating recommendation.")
 
 
-def get_full_summary(query: str, titles: List[str], lang: Lang) -> str:
+async def get_full_summary(query: str, titles: List[str], lang: Lang) -> str:
     qlow = query.lower()
     wants_full = any(k in qlow for k in ["rezumat complet", "rezumatul complet", "full summary", "complete summary"])
     full_summary = ""
     if wants_full and titles:
         try:
+            tools_service = await registry.tools_service.aget()
             full_summary = tools_service.get_summary_by_title(titles[0])
         except Exception as e:
             logger.warning("Full summary not available for %s: %s", titles[0], e)
     return full_summary
 
 
+async def get_corpus_version() -> str:
+    try:
+        return (await registry.embeddings_service.aget()).corpus_version
+    except Exception:
+        return ""  # index unavailable: answers are still cached, under an empty version
+
+
+def _discard(task: asyncio.Task) -> None:
+    """Drop a speculative task without leaking 'exception was never retrieved' warnings."""
+    if task.done():
+        if not task.cancelled():
+            task.exception()
+        return
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
 # -------- API routes --------
 @router.get("/ping")
 def ping() -> Dict[str, str]:
     return {"status": "ok"}
 
 
-class ChatRequest(BaseModel):
-    query: str
+@router.get("/chat/stats")
+def chat_stats() -> Dict[str, Any]:
+    embeddings_service = registry.embeddings_service.peek()
+    response_cache = registry.response_cache.peek()
+    gpt_service = registry.gpt_service.peek()
+    session_store = registry.session_store.peek()
+    return {
+        "intent": intent_classifier.stats(),
+        "embedding_cache": embeddings_service.query_cache.stats() if embeddings_service else None,
+        "response_cache": response_cache.stats() if response_cache else None,
+        "single_flight": single_flight.stats(),
+        "governor": governor.stats(),
+        "badwords": badwords.stats(),
+        "sessions": session_store.stats() if session_store else None,
+        "hedging": {"completion": gpt_service.hedger.stats(),
+                    "completion_stream": gpt_service.stream_hedger.stats()} if gpt_service else None,
+    }
 
 
-@router.post("/chat")
-def chat(request: ChatRequest) -> Dict[str, str]:
-    query = request.query
-    if not query.strip():
-        raise HTTPException(status_code=400, detail="Query cannot be empty.")
-
-    lang = detect_language(query)
+class ChatRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None  # from a previous answer; expired = new conversation
+    # Without a session_id nothing is stored unless the client asks to start a conversation
+    # (and will send the returned session_id back); one-off callers don't fill the store.
+    new_session: bool = False
+
+
+@dataclass
+class ChatPlan:
+    """Everything decided before generation starts; shared by /chat and /chat/stream."""
+    lang: Lang
+    intent: str = "other"
+    reply: Optional[str] = None  # canned answer, no LLM call needed
+    context: str = ""
+    titles: List[str] = field(default_factory=list)
+    ids: List[str] = field(default_factory=list)
+    books: List[Dict[str, str]] = field(default_factory=list)    # fresh search results, kept in the session
+    history: List[Dict[str, str]] = field(default_factory=list)  # earlier turns, for follow-ups only
+    blocked: bool = False
+
+    def cache_key(self, query: str) -> str:
+        history = fingerprint(*(t["content"] for t in self.history)) if self.history else ""
+        return ResponseCache.make_key(self.lang, self.intent, self.ids, query, history)
+
+
+def _followup_plan(query: str, lang: Lang, session: Session) -> Optional[ChatPlan]:
+    """Answer a follow-up about books the session already retrieved, without searching again."""
+    books = session.referenced_books(query)
+    if not books:
+        return None
+    titles = [b["title"] for b in books]
+    logger.info("Follow-up about %s; skipping retrieval.", titles)
+    context = pack_context(query, [(b["title"], b["summary"], None) for b in books])
+    return ChatPlan(lang=lang, intent="book_request", context=context, titles=titles,
+                    ids=[b["id"] for b in books], history=session.turns)
+
+
+def screen_query(query: str) -> Tuple[Lang, Optional[ChatPlan]]:
+    """The query's language, and the canned plan when the profanity filter blocks it."""
+    with span("language"):
+        lang = detect_language(query)
     logger.info("Received query (%s): %s", lang, query)
 
-    if badwords.contains(query, "ro" if lang == "ro" else "en"):
-        masked = badwords.mask(query, "ro" if lang == "ro" else "en")
+    with span("badwords"):
+        matches = badwords.find(query)  # every language, not just the detected one
+    if matches:
+        masked = badwords.mask(query, matches)
         logger.warning("Blocked query due to inappropriate language: %s", masked)
         recommendation = (
             "Mesajul tău conține termeni nepotriviți. Îl poți reformula, te rog?" if lang == "ro" else
             "Your message contains inappropriate terms. Please rephrase politely."
         )
-        return {"recommendation": recommendation, "full_summary": ""}
+        return lang, ChatPlan(lang=lang, reply=recommendation, blocked=True)
     logger.info("Query passed inappropriate language filter.")
+    return lang, None
 
-    intent = classify_intent(query, lang)
-    if intent == "small_talk":
-        return {"recommendation": get_friendly_reply(query, lang), "full_summary": ""}
 
-    results = get_semantic_results(query)
+def plan_from_results(lang: Lang, intent: str, results: Optional[Dict[str, Any]]) -> ChatPlan:
+    """A book-request plan from one search result (EmbeddingsService.search_books)."""
     if not results or not results.get("ids"):
         logger.info("No results from semantic search.")
         recommendation = (
             "Nu am găsit potriviri. Încearcă un autor, gen sau temă." if lang == "ro"
             else "I couldn't find a match. Try an author, genre, or theme."
         )
-        return {"recommendation": recommendation, "full_summary": ""}
+        return ChatPlan(lang=lang, intent=intent, reply=recommendation)
 
     context: str = results.get("context", "") or ""
     readable_titles: List[str] = results.get("titles") or []
+    ids = [str(i) for i in results.get("ids") or []]
+    books = [{"id": i, "title": t, "summary": d or ""}
+             for i, t, d in zip(ids, readable_titles, results.get("documents") or [])]
     logger.info("Selected titles: %s", readable_titles)
+    return ChatPlan(lang=lang, intent=intent, context=context, titles=readable_titles, ids=ids, books=books)
+
+
+async def plan_chat(query: str, session: Optional[Session] = None) -> ChatPlan:
+    lang, blocked = screen_query(query)
+    if blocked is not None:
+        return blocked
+
+    if session is not None:
+        with span("followup"):
+            followup = _followup_plan(query, lang, session)
+        if followup is not None:
+            return followup
+
+    # Retrieval does not depend on the intent, so start it speculatively alongside
+    # classification and throw it away if the query turns out to be small talk.
+    search_task = asyncio.create_task(get_semantic_results(query))
+    try:
+        with span("classify_intent"):
+            intent = await classify_intent(query, lang)
+    except BaseException:
+        _discard(search_task)
+        raise
+    if intent == "small_talk":
+        _discard(search_task)
+        return ChatPlan(lang=lang, intent=intent)
+
+    try:
+        with span("search_wait"):  # what retrieval adds on top of classification
+            results = await within("search", search_task)
+    except (CircuitOpen, DeadlineExceeded) as e:
+        logger.warning("Retrieval unavailable (%s); serving fallback.", e)
+        return ChatPlan(lang=lang, intent=intent, reply=GPTService.fallback(lang))
+    return plan_from_results(lang, intent, results)
+
+
+async def get_session(session_id: Optional[str], new_session: bool = False) -> Optional[Session]:
+    """The conversation to continue (or start); None for a stateless request."""
+    if not session_id and not new_session:
+        return None
+    return (await registry.session_store.aget()).get_or_create(session_id)
+
+
+async def remember(session: Session, plan: ChatPlan, query: str, answer: str) -> None:
+    """Record the turn (and a fresh search's books) so the next message can refer back to them."""
+    if plan.blocked:
+        return
+    if plan.books:
+        session.books = plan.books
+    session.add_turn(query, answer, SESSION_MAX_TURNS)
+    (await registry.session_store.aget()).save(session)
+
+
+def _is_fallback(answer: str, lang: Lang) -> bool:
+    return answer in (GPTService.fallback(lang), _friendly_fallback(lang))
+
+
+def request_deadline(x_deadline_ms: Optional[int]) -> float:
+    """Seconds this request may take: the configured budget, tightened by an X-Deadline-Ms header."""
+    if not x_deadline_ms or x_deadline_ms <= 0:
+        return CHAT_DEADLINE_SECONDS
+    requested = x_deadline_ms / 1000.0
+    return min(CHAT_DEADLINE_SECONDS, requested) if CHAT_DEADLINE_SECONDS > 0 else requested
+
+
+@router.post("/chat")
+async def chat(request: ChatRequest, response: Response,
+               x_deadline_ms: Optional[int] = Header(None)) -> Dict[str, str]:
+    query = request.query
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+
+    session = await get_session(request.session_id, request.new_session)
+    with deadline_scope(request_deadline(x_deadline_ms)):
+        plan = await plan_chat(query, session)
+        answer = await answer_chat(plan, query, response)
+    return await _finish(session, plan, query, answer)
+
+
+async def answer_chat(plan: ChatPlan, query: str, response: Response) -> Dict[str, str]:
+    if plan.reply is not None:
+        response.headers["X-Cache"] = "BYPASS"
+        return {"recommendation": plan.reply, "full_summary": ""}
+
+    key = plan.cache_key(query)
+    version = await get_corpus_version()
+    response_cache = await registry.response_cache.aget()
+    with span("response_cache"):
+        cached = response_cache.get(key, version)
+    if cached is not None:
+        response.headers["X-Cache"] = "HIT"
+        return cached
+    response.headers["X-Cache"] = "MISS"
+
+    async def generate() -> Dict[str, str]:
+        with span("completion"):
+            if plan.intent == "small_talk":
+                recommendation = await get_friendly_reply(query, plan.lang)
+            else:
+                recommendation = await get_gpt_recommendation(plan.context, query, plan.lang, plan.history)
+        with span("full_summary"):
+            full_summary = await get_full_summary(query, plan.titles, plan.lang) if plan.intent != "small_talk" else ""
+
+        answer = {"recommendation": recommendation, "full_summary": full_summary}
+        if not _is_fallback(recommendation, plan.lang):
+            response_cache.set(key, version, answer)
+        return answer
+
+    # Identical questions arriving together wait for one completion instead of N.
+    return await single_flight.do("chat", key, generate)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _finish(session: Optional[Session], plan: ChatPlan, query: str,
+                  answer: Dict[str, str]) -> Dict[str, str]:
+    if session is None:
+        return answer
+    await remember(session, plan, query, answer["recommendation"])
+    return {**answer, "session_id": session.id}
+
+
+async def chat_events(query: str, deadline_seconds: Optional[float] = None,
+                      session: Optional[Session] = None) -> AsyncIterator[str]:
+    """
+    SSE frames for /chat/stream: `token` events with `{"delta"}` while the model
+    generates, then one `done` event carrying the usual `recommendation` / `full_summary`
+    (and `session_id` when a session is given). The deadline covers planning and the wait for the first token.
+    """
+    with deadline_scope(deadline_seconds):
+        try:
+            plan = await plan_chat(query, session)
+            key = plan.cache_key(query)
+            version = await get_corpus_version()
+            response_cache = await registry.response_cache.aget()
+            cached = response_cache.get(key, version) if plan.reply is None else None
+            if cached is not None:
+                yield _sse("token", {"delta": cached["recommendation"]})
+                yield _sse("done", await _finish(session, plan, query, cached))
+                return
+
+            if plan.reply is not None:
+                deltas = _single(plan.reply)
+            elif plan.intent == "small_talk":
+                deltas = single_flight.stream("chat_stream", key, lambda: stream_friendly_reply(query, plan.lang))
+            else:
+                gpt_service = await registry.gpt_service.aget()
+                deltas = single_flight.stream(
+                    "chat_stream", key,
+                    lambda: gpt_service.stream_recommendation(plan.context, query, plan.lang, plan.history))
+
+            parts: List[str] = []
+            started = time.perf_counter()
+            async for delta in deltas:
+                if not parts:
+                    record("stream_first_token", time.perf_counter() - started)
+                parts.append(delta)
+                yield _sse("token", {"delta": delta})
+            record("stream_completion", time.perf_counter() - started)
+
+            full_summary = await get_full_summary(query, plan.titles, plan.lang) if plan.titles else ""
+            answer = {"recommendation": "".join(parts).strip(), "full_summary": full_summary}
+            if plan.reply is None and not _is_fallback(answer["recommendation"], plan.lang):
+                response_cache.set(key, version, answer)
+            yield _sse("done", await _finish(session, plan, query, answer))
+        except HTTPException as e:
+            yield _sse("error", {"status": e.status_code, "detail": e.detail})
+
+
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest, x_deadline_ms: Optional[int] = Header(None)) -> StreamingResponse:
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty.")
+    session = await get_session(request.session_id, request.new_session)
+    return StreamingResponse(
+        chat_events(request.query, request_deadline(x_deadline_ms), session),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# -------- Batch --------
+def _batch_item(index: int, query: str, **fields: Any) -> Dict[str, Any]:
+    return {"index": index, "query": query, **fields}
+
+
+def _batch_error(index: int, query: str, status: int, detail: Any) -> Dict[str, Any]:
+    return _batch_item(index, query, error={"status": status, "detail": detail})
+
+
+async def chat_batch(queries: List[str], concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Python API behind /chat/batch: one result per query, yielded as each one finishes
+    (`index` says which), e.g. `async for item in chat_batch(queries): ...`.
+
+    Every query needing retrieval is embedded in one request and searched in one vector
+    query; identical questions share one completion (same response-cache key); completions
+    run at most `concurrency` at a time. A failing item carries `error: {status, detail}`
+    instead of an answer and does not affect the others. No sessions, no deadline.
+    """
+    errors: Dict[int, Tuple[int, Any]] = {}
+    plans: Dict[int, ChatPlan] = {}
+    pending: List[Tuple[int, str, Lang]] = []
+    for i, query in enumerate(queries):
+        if not query.strip():
+            errors[i] = (400, "Query cannot be empty.")
+            continue
+        lang, blocked = screen_query(query)
+        if blocked is not None:
+            plans[i] = blocked
+        else:
+            pending.append((i, query, lang))
+
+    limit = asyncio.Semaphore(max(1, concurrency))
+    by_text: Dict[str, str] = {}  # normalized query -> the query searched for it
+    for _, query, _ in pending:
+        by_text.setdefault(normalize_query(query), query)
+
+    async def classify(query: str, lang: Lang) -> str:
+        async with limit:
+            return await classify_intent(query, lang)
+
+    # As in plan_chat, retrieval runs alongside classification; small talk just ignores it.
+    search_task = asyncio.create_task(get_semantic_results_many(list(by_text.values())))
+    try:
+        with span("classify_intent"):
+            intents = await asyncio.gather(*(classify(q, lang) for _, q, lang in pending), return_exceptions=True)
+        with span("search_wait"):
+            found = dict(zip(by_text, await search_task))
+        search_error: Optional[Tuple[int, Any]] = None
+    except HTTPException as e:
+        search_error = (e.status_code, e.detail)
+    except Exception as e:
+        logger.exception("Batch search failed: %s", e)
+        search_error = (500, "Error searching for books.")
+    finally:
+        _discard(search_task)
+
+    for (i, query, lang), intent in zip(pending, intents):
+        if isinstance(intent, BaseException):
+            intent = "other"  # classify_intent already degrades; only a governor rejection lands here
+        if intent == "small_talk":
+            plans[i] = ChatPlan(lang=lang, intent=intent)
+        elif search_error is not None:
+            errors[i] = search_error
+        else:
+            plans[i] = plan_from_results(lang, intent, found.get(normalize_query(query)))
+
+    async def answer(i: int) -> Dict[str, Any]:
+        query = queries[i]
+        async with limit:
+            response = Response()
+            try:
+                result = await answer_chat(plans[i], query, response)
+            except HTTPException as e:
+                return _batch_error(i, query, e.status_code, e.detail)
+            except Exception as e:
+                logger.exception("Batch item %d failed: %s", i, e)
+                return _batch_error(i, query, 500, "Error generating recommendation.")
+        return _batch_item(i, query, **result, cache=response.headers.get("X-Cache"))
+
+    for i, (status, detail) in sorted(errors.items()):
+        yield _batch_error(i, queries[i], status, detail)
+    tasks = [asyncio.create_task(answer(i)) for i in sorted(plans)]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for task in tasks:
+            _discard(task)  # the client went away: stop what is still queued
+
+
+class ChatBatchRequest(BaseModel):
+    queries: List[str]
+
 
-    recommendation = get_gpt_recommendation(context, query)
+@router.post("/chat/batch")
+async def chat_batch_route(request: ChatBatchRequest) -> StreamingResponse:
+    """Answers for many queries as NDJSON, one line per query in completion order (see chat_batch)."""
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="Queries cannot be empty.")
+    if len(request.queries) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} queries per batch.")
 
-    full_summary = get_full_summary(query, readable_titles, lang)
+    async def lines() -> AsyncIterator[str]:
+        async for item in chat_batch(request.queries):
+            yield json.dumps(item, ensure_ascii=False) + "\n"
 
-    return {"recommendation": recommendation, "full_summary": full_summary}
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
@@ -1,43 +1,129 @@
-from fastapi import APIRouter, Form, HTTPException
-from fastapi.responses import StreamingResponse
-from openai import OpenAI
-import base64, io, logging, httpx
+from fastapi import APIRouter, Form, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+import base64, logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from config import IMAGE_MODEL
+from services import registry
+from services.governor import governor
+from utils.disk_cache import CacheWriter, DiskCache, tee_to_cache
+from utils.metrics import span
+from utils.single_flight import single_flight
 
 router = APIRouter()
-client = OpenAI()
 
-@router.post("/generate")
-async def generate_image(prompt: str = Form(...), size: str = Form("1024x1024")):
-    """
-    Generează PNG dintr-un prompt text folosind gpt-image-1.
-    Fără 'response_format' (serverul îl respinge); folosim b64_json implicit.
-    """
-    try:
-        resp = client.images.generate(
-            model="gpt-image-1",
+CACHE_CONTROL = "private, max-age=86400"
+# Multiple of 4, so every slice of the base64 payload decodes on its own.
+_B64_SLICE = 64 * 1024
+
+
+def _image_key(prompt: str, size: str) -> str:
+    return DiskCache.make_key(IMAGE_MODEL, size, " ".join(prompt.split()))
+
+
+def iter_b64(b64: str) -> Iterator[bytes]:
+    """Decode base64 slice by slice instead of materializing the whole image at once."""
+    if "\n" in b64 or " " in b64:
+        b64 = "".join(b64.split())
+    for start in range(0, len(b64), _B64_SLICE):
+        yield base64.b64decode(b64[start:start + _B64_SLICE])
+
+
+async def _payload(data: Any) -> AsyncIterator[bytes]:
+    # Varianta standard: b64_json (implicit)
+    b64 = getattr(data, "b64_json", None)
+    if b64:
+        for chunk in iter_b64(b64):
+            yield chunk
+        return
+
+    # Fallback (dacă API-ul ți-a returnat doar URL): descărcare în flux, pe clientul comun
+    url = getattr(data, "url", None)
+    if url:
+        async with registry.http_client.get().stream("GET", url) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes():
+                yield chunk
+        return
+
+    raise ValueError("No image payload (neither b64_json nor url) in response.")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+@router.get("/stats")
+def image_stats() -> Dict[str, Any]:
+    cache = registry.image_cache.peek()
+    return {"image_cache": cache.stats() if cache else None,
+            "single_flight": single_flight.stats()["by_namespace"].get("image")}
+
+
+async def serve_image(prompt: str, size: str, request: Request) -> Response:
+    if not prompt.strip():
+        raise HTTPException(status_code=400, detail="Prompt is required.")
+
+    key = _image_key(prompt, size)
+    cache = registry.image_cache.get()
+    with span("image_cache"):
+        cached = cache.get(key, "png")
+    if cached is not None:
+        headers = {"ETag": cache.etag(cached), "Cache-Control": CACHE_CONTROL, "X-Cache": "HIT"}
+        if _etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(cached, media_type="image/png", headers=headers)
+
+    async def generate() -> AsyncIterator[bytes]:
+        resp = await governor.call("images", lambda: registry.openai_client.get().images.generate(
+            model=IMAGE_MODEL,
             prompt=prompt,
             size=size,
             n=1,
-        )
-        data = resp.data[0]
-
-        # Varianta standard: b64_json (implicit)
-        b64 = getattr(data, "b64_json", None)
-        if b64:
-            img_bytes = base64.b64decode(b64)
-            return StreamingResponse(io.BytesIO(img_bytes), media_type="image/png")
-
-        # Fallback (dacă API-ul ți-a returnat doar URL)
-        url = getattr(data, "url", None)
-        if url:
-            with httpx.stream("GET", url, timeout=60.0) as r:
-                r.raise_for_status()
-                def gen():
-                    for chunk in r.iter_bytes():
-                        yield chunk
-                return StreamingResponse(gen(), media_type="image/png")
-
-        raise ValueError("No image payload (neither b64_json nor url) in response.")
+        ), retries=1)
+        try:
+            writer: Optional[CacheWriter] = cache.open_writer(key, "png")
+        except OSError as e:
+            logging.warning("Image cache unavailable: %s", e)
+            writer = None
+        async for chunk in tee_to_cache(_payload(resp.data[0]), writer):
+            yield chunk
+
+    # Cereri identice simultane (prompt, size) împart o singură generare (și o singură scriere în cache).
+    chunks = single_flight.stream("image", key, generate)
+    try:
+        with span("image_generation"):
+            first = await chunks.__anext__()  # upstream errors become a 500 before headers go out
+    except StopAsyncIteration:
+        first = b""
+    except HTTPException:
+        raise  # governor rejection: 429/503 with Retry-After
     except Exception as e:
         logging.exception("Image generation failed: %s", e)
         raise HTTPException(status_code=500, detail=f"Image generation failed: {e}")
+
+    async def body() -> AsyncIterator[bytes]:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(body(), media_type="image/png", headers={"X-Cache": "MISS", "Cache-Control": CACHE_CONTROL})
+
+
+@router.post("/generate")
+async def generate_image(request: Request, prompt: str = Form(...), size: str = Form("1024x1024")) -> Response:
+    """
+    Generează PNG dintr-un prompt text folosind IMAGE_MODEL (gpt-image-1).
+    Fără 'response_format' (serverul îl respinge); folosim b64_json implicit, decodat în flux.
+    Imaginile rămân în cache pe disc după (model, size, prompt).
+    """
+    return await serve_image(prompt, size, request)
+
+
+@router.get("/generate")
+async def get_image(request: Request, prompt: str = Query(...), size: str = Query("1024x1024")) -> Response:
+    """Ca POST /generate, dar cache-uibil de browser: ETag + If-None-Match (304) pentru imaginile din cache."""
+    return await serve_image(prompt, size, request)
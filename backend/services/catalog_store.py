@@ -0,0 +1,244 @@
+"""
+Compact, memory-mapped book catalog: what ToolsService and EmbeddingsService read instead
+of parsing BOOKS_FILE_JSON into a dict of Python strings in every worker.
+
+One file, built once from the JSON (or TXT) source:
+
+    python -m services.catalog_store build [--source json|txt] [--out data/book_catalog.bin]
+
+    header   magic, count, slots, section offsets                      (HEADER)
+    entries  count x 4 uint64: title offset/length, summary offset/length into the blob,
+             sorted by title key (native byte order, as the reader maps them)
+    slots    open-addressing hash table (uint32 entry index + 1, 0 = empty) on title key
+    blob     UTF-8 summaries, then titles
+
+The file is mapped read-only, so every worker on the host shares the same page-cache pages;
+titles and summaries are decoded only when asked for. Lookups by title are one hash probe.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+from abc import abstractmethod
+from array import array
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+from config import BOOKS_FILE_JSON, BOOKS_FILE_TXT, CATALOG_PATH
+from services.ingest_service import iter_books_json, iter_books_txt
+
+logger = logging.getLogger("smart_librarian.catalog")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+MAGIC = b"SLCATv01"
+HEADER = struct.Struct("<8sQQQQQ")  # magic, count, slots, entries_off, slots_off, blob_off
+_ENTRY_FIELDS = 4
+
+
+def title_key(title: str) -> str:
+    """What title lookups compare: typographic quotes folded, case-insensitive."""
+    return title.replace("’", "'").replace("“", '"').replace("”", '"').strip().lower()
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _slot_count(count: int) -> int:
+    slots = 8
+    while slots < 2 * count:  # load factor <= 0.5
+        slots *= 2
+    return slots
+
+
+def build_catalog(books: Iterable[Tuple[str, str]], path: str) -> int:
+    """
+    Writes the catalog for (title, summary) pairs; a repeated title keeps its last summary,
+    as json.load would. Summaries are streamed to disk; only titles are held in memory.
+    The new file replaces `path` atomically. Returns the number of books.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    summaries: Dict[str, Tuple[int, int]] = {}  # title -> (offset, length) in the blob
+    with tempfile.TemporaryFile(dir=directory) as blob:
+        offset = 0
+        for title, summary in books:
+            data = summary.encode("utf-8")
+            blob.write(data)
+            summaries[title] = (offset, len(data))
+            offset += len(data)
+
+        titles = sorted(summaries, key=lambda t: (title_key(t), t))
+        entries = array("Q")
+        for title in titles:
+            data = title.encode("utf-8")
+            blob.write(data)
+            entries.extend((offset, len(data), *summaries[title]))
+            offset += len(data)
+
+        slots = array("I", [0]) * _slot_count(len(titles))
+        mask = len(slots) - 1
+        for index, title in enumerate(titles):
+            slot = _hash(title_key(title)) & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = index + 1
+
+        entries_off = HEADER.size
+        slots_off = entries_off + entries.itemsize * len(entries)
+        blob_off = slots_off + slots.itemsize * len(slots)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                out.write(HEADER.pack(MAGIC, len(titles), len(slots), entries_off, slots_off, blob_off))
+                out.write(entries.tobytes())
+                out.write(slots.tobytes())
+                blob.seek(0)
+                shutil.copyfileobj(blob, out, 1 << 20)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    logger.info("Catalog written to %s: %d books, %d bytes.", path, len(titles), os.path.getsize(path))
+    return len(titles)
+
+
+class Catalog(Mapping[str, str]):
+    """Title -> summary mapping plus find(); what ToolsService and EmbeddingsService take."""
+
+    @abstractmethod
+    def find(self, title: str) -> Optional[str]:
+        """The catalog's own spelling of `title`: exact match first, then case/quote-insensitive."""
+
+
+class BookCatalog(Catalog):
+    """Read-only title -> summary mapping over a catalog file built by build_catalog()."""
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, slots, entries_off, slots_off, blob_off = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path}: not a book catalog (or an unsupported version)")
+        self._view = memoryview(self._mm)
+        self._entries = self._view[entries_off:entries_off + 8 * _ENTRY_FIELDS * count].cast("Q")
+        self._slots = self._view[slots_off:slots_off + 4 * slots].cast("I")
+        self._count = count
+        self._blob_off = blob_off
+
+    def _text(self, offset: int, length: int) -> str:
+        start = self._blob_off + offset
+        return self._mm[start:start + length].decode("utf-8")
+
+    def title(self, index: int) -> str:
+        base = _ENTRY_FIELDS * index
+        return self._text(self._entries[base], self._entries[base + 1])
+
+    def summary(self, index: int) -> str:
+        base = _ENTRY_FIELDS * index
+        return self._text(self._entries[base + 2], self._entries[base + 3])
+
+    def _candidates(self, title: str) -> Iterator[Tuple[int, str]]:
+        """(index, title) of every entry whose title key equals that of `title`."""
+        key = title_key(title)
+        mask = len(self._slots) - 1
+        slot = _hash(key) & mask
+        while self._slots[slot]:
+            index = self._slots[slot] - 1
+            candidate = self.title(index)
+            if title_key(candidate) == key:
+                yield index, candidate
+            slot = (slot + 1) & mask
+
+    def _index_of(self, title: str) -> Optional[int]:
+        for index, candidate in self._candidates(title):
+            if candidate == title:
+                return index
+        return None
+
+    def find(self, title: str) -> Optional[str]:
+        fallback = None
+        for _, candidate in self._candidates(title):
+            if candidate == title:
+                return candidate
+            fallback = fallback or candidate
+        return fallback
+
+    def __getitem__(self, title: str) -> str:
+        index = self._index_of(title)
+        if index is None:
+            raise KeyError(title)
+        return self.summary(index)
+
+    def __contains__(self, title: object) -> bool:
+        return isinstance(title, str) and self._index_of(title) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self._count):
+            yield self.title(index)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def close(self) -> None:
+        self._entries.release()
+        self._slots.release()
+        self._view.release()
+        self._mm.close()
+
+
+class DictCatalog(Dict[str, str], Catalog):
+    """The JSON source parsed into a dict, with BookCatalog's find(); used until a catalog is built."""
+
+    _keys: Optional[Dict[str, str]] = None
+
+    def find(self, title: str) -> Optional[str]:
+        if title in self:
+            return title
+        if self._keys is None:
+            self._keys = {}
+            for t in self:
+                self._keys.setdefault(title_key(t), t)
+        return self._keys.get(title_key(title))
+
+
+def load_catalog(path: Optional[str] = CATALOG_PATH, source: str = BOOKS_FILE_JSON) -> Catalog:
+    """
+    The memory-mapped catalog when it has been built and is current, else the JSON source
+    read into memory: a re-index must see edits to the JSON, not the catalog built before them.
+    """
+    if path and os.path.exists(path):
+        if not (os.path.exists(source) and os.path.getmtime(source) > os.path.getmtime(path)):
+            return BookCatalog(path)
+        logger.warning("%s is newer than %s; reading the JSON instead. Rebuild the catalog with "
+                       "`python -m services.catalog_store build`.", source, path)
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"JSON file not found: {source}")
+    return DictCatalog(iter_books_json(source))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SmartLibrarian book catalog maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("build", help="convert the book summaries into the memory-mapped catalog")
+    cmd.add_argument("--source", choices=["json", "txt"], default="json")
+    cmd.add_argument("--out", default=CATALOG_PATH)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        books = iter_books_txt(BOOKS_FILE_TXT) if args.source == "txt" else iter_books_json(BOOKS_FILE_JSON)
+        count = build_catalog(books, args.out)
+        print(json.dumps({"books": count, "path": args.out, "bytes": os.path.getsize(args.out)}))
+
+
+if __name__ == "__main__":
+    main()
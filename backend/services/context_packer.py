@@ -0,0 +1,148 @@
+"""
+Query-aware context packing for the recommendation prompt.
+
+Instead of sending every retrieved summary whole, keep the sentences that share the most
+terms with the question, up to CONTEXT_TOKEN_BUDGET estimated tokens:
+
+    1. every retrieved book (best match first) gets its most relevant sentence, while it fits;
+    2. the remaining sentences fill what is left, most relevant first;
+    3. each book's kept sentences are emitted in their original order ("Title: s1 s3").
+
+Sentence boundaries and per-sentence token estimates are computed when a book is indexed
+and stored in its metadata (`sentence_ends`, `sentence_tokens`); summaries indexed before
+that are split on first use.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from config import CONTEXT_TOKEN_BUDGET
+from services.lexical_index import tokenize
+from utils.metrics import metrics
+from utils.text import estimate_tokens
+
+logger = logging.getLogger("smart_librarian.context")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+CONTEXT_TOKENS = metrics.histogram(
+    "smart_librarian_context_tokens", "Estimated prompt tokens of the retrieved context, before and after packing.",
+    ["stage"], buckets=(50, 100, 200, 400, 800, 1600, 3200, 6400, 12800))
+
+SEPARATOR = "\n---\n"  # between books, as EmbeddingsService has always joined them
+
+# Sentence end: terminal punctuation (plus closing quotes), whitespace, then something that
+# starts a sentence. "Dr. Watson" splits too; harmless for packing.
+_END = re.compile(r"[.!?…]+[\"'”»)]*\s+")
+_OPENERS = "\"„“«(—-"
+
+Sentences = Tuple[Tuple[str, int], ...]  # (text, estimated tokens)
+
+
+def sentence_ends(text: str) -> List[int]:
+    ends = []
+    for m in _END.finditer(text):
+        nxt = text[m.end():m.end() + 1]
+        if nxt and (nxt.isupper() or nxt.isdigit() or nxt in _OPENERS):
+            ends.append(m.end())
+    if text and (not ends or ends[-1] != len(text)):
+        ends.append(len(text))
+    return ends
+
+
+def _from_ends(text: str, ends: Sequence[int], tokens: Optional[Sequence[int]] = None) -> Sentences:
+    out, start = [], 0
+    for i, end in enumerate(ends):
+        sentence = text[start:end].strip()
+        if sentence:
+            out.append((sentence, tokens[i] if tokens else estimate_tokens(sentence)))
+        start = end
+    return tuple(out)
+
+
+def sentence_metadata(summary: str) -> Dict[str, str]:
+    """What ingestion stores next to a summary (Chroma metadata values must be scalars)."""
+    ends = sentence_ends(summary)
+    start, tokens = 0, []
+    for end in ends:
+        tokens.append(estimate_tokens(summary[start:end].strip()))
+        start = end
+    return {"sentence_ends": ",".join(map(str, ends)), "sentence_tokens": ",".join(map(str, tokens))}
+
+
+@lru_cache(maxsize=4096)
+def _split(text: str) -> Sentences:
+    return _from_ends(text, sentence_ends(text))
+
+
+def sentences_of(document: str, metadata: Optional[Mapping[str, Any]] = None) -> Sentences:
+    """Sentences of an indexed summary: from its metadata when present and consistent."""
+    ends_raw = (metadata or {}).get("sentence_ends")
+    tokens_raw = (metadata or {}).get("sentence_tokens")
+    if ends_raw and tokens_raw:
+        try:
+            ends = [int(x) for x in str(ends_raw).split(",")]
+            tokens = [int(x) for x in str(tokens_raw).split(",")]
+            if len(ends) == len(tokens) and ends[-1] == len(document):
+                return _from_ends(document, ends, tokens)
+        except ValueError:
+            pass
+    return _split(document)
+
+
+def _score(query_terms: frozenset, sentence: str, tokens: int, position: int) -> float:
+    overlap = len(query_terms.intersection(tokenize(sentence)))
+    lead = 0.05 if position == 0 else 0.0  # summaries open with the premise
+    return overlap / math.sqrt(max(tokens, 1)) + lead
+
+
+def pack_context(query: str, books: Sequence[Tuple[str, str, Optional[Mapping[str, Any]]]],
+                 budget: int = CONTEXT_TOKEN_BUDGET) -> str:
+    """
+    `books` are (title, summary, metadata) in rank order. Returns the usual
+    "Title: summary" blocks, trimmed to the sentences that matter for `query`.
+    A budget <= 0 turns packing off.
+    """
+    full = SEPARATOR.join(f"{title}: {summary}" for title, summary, _ in books)
+    full_tokens = estimate_tokens(full) if full else 0
+    CONTEXT_TOKENS.observe(full_tokens, stage="full")
+    if budget <= 0 or full_tokens <= budget:
+        CONTEXT_TOKENS.observe(full_tokens, stage="packed")
+        return full
+
+    query_terms = frozenset(tokenize(query))
+    per_book: List[Sentences] = [sentences_of(summary, meta) for _, summary, meta in books]
+    scores = [[_score(query_terms, s, t, pos) for pos, (s, t) in enumerate(sents)] for sents in per_book]
+    chosen: List[set] = [set() for _ in books]
+    left = budget
+
+    def take(rank: int, pos: int) -> bool:
+        nonlocal left
+        cost = per_book[rank][pos][1] + 1
+        if not chosen[rank]:
+            cost += estimate_tokens(books[rank][0]) + 2  # "Title: " and the separator
+        if cost > left:
+            return False
+        chosen[rank].add(pos)
+        left -= cost
+        return True
+
+    for rank, book_scores in enumerate(scores):
+        if book_scores:
+            take(rank, max(range(len(book_scores)), key=lambda p: (book_scores[p], -p)))
+    rest = sorted(((-scores[r][p], r, p) for r in range(len(books)) for p in range(len(per_book[r]))
+                   if p not in chosen[r] and chosen[r]))
+    for _, rank, pos in rest:
+        take(rank, pos)
+
+    blocks = [f"{books[r][0]}: " + " ".join(per_book[r][p][0] for p in sorted(chosen[r]))
+              for r in range(len(books)) if chosen[r]]
+    packed = SEPARATOR.join(blocks)
+    packed_tokens = estimate_tokens(packed) if packed else 0
+    CONTEXT_TOKENS.observe(packed_tokens, stage="packed")
+    logger.info("Context packed for %d books: %d -> %d estimated tokens.", len(books), full_tokens, packed_tokens)
+    return packed
@@ -1,11 +1,28 @@
+import argparse
+import asyncio
 import json
 import logging
-import os
+from typing import Dict, List, Mapping, Optional, Tuple
 
 import chromadb
 from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
+from openai import AsyncOpenAI
 
-from config import CHROMA_DB_PATH, BOOKS_FILE_TXT, BOOKS_FILE_JSON, OPENAI_API_KEY
+from config import (
+    CHROMA_DB_PATH, BOOKS_FILE_TXT, OPENAI_API_KEY, OPENAI_BASE_URL,
+    EMBEDDING_MODEL, EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_PATH, REINDEX_ON_STARTUP,
+    VECTOR_BACKEND, NUMPY_INDEX_PATH, NUMPY_INDEX_DTYPE, HYBRID_SEARCH, RRF_K, SHARED_CACHE_LOCAL_SIZE,
+)
+from services.context_packer import pack_context
+from services.catalog_store import Catalog, load_catalog
+from services.ingest_service import (
+    ORIGIN_CATALOG, ORIGIN_INGEST, Book, IngestService, book_id, content_hash, iter_books_txt,
+)
+from services.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from services.vector_backends import Hit, VectorBackend, make_backend
+from utils.cache import make_cache
+from utils.metrics import span
+from utils.text import fingerprint, normalize_query
 
 
 logger = logging.getLogger("smart_librarian.embeddings")
@@ -13,67 +30,238 @@ if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
 
 
+def read_books_txt(path: str = BOOKS_FILE_TXT) -> Dict[str, str]:
+    """Parses the "Title: ..." block format of book_summaries.txt."""
+    return dict(iter_books_txt(path))
+
+
 class EmbeddingsService:
-    def __init__(self):
+    def __init__(self, reindex: Optional[bool] = None, backend: str = VECTOR_BACKEND,
+                 hybrid: bool = HYBRID_SEARCH, catalog: Optional[Catalog] = None,
+                 openai_client: Optional[AsyncOpenAI] = None):
+        self._catalog = catalog  # the book source for reindex(); loaded on first use otherwise
+        # The app's pooled client, bound to its event loop: with one, a startup re-index is left
+        # for the app to await (pending_reindex) instead of run on a loop of our own.
+        self.openai_client = openai_client
+        self.pending_reindex = False
         self.client = chromadb.PersistentClient(path=CHROMA_DB_PATH)
         self.embedding_fn = OpenAIEmbeddingFunction(
-            model_name="text-embedding-3-small",
+            model_name=EMBEDDING_MODEL,
             api_key=OPENAI_API_KEY,
+            api_base=OPENAI_BASE_URL,
         )
         self.collection = self.client.get_or_create_collection(
             name="books", embedding_function=self.embedding_fn
         )
-        if self.collection.count() == 0:
-            logger.info("No embeds loaded. Starting indexing from JSON...")
-            self._index_books()
-            logger.info("Embeddings generated and saved.")
+        # float32 rows ("vector" codec) in their own table: older JSON-encoded rows are left alone.
+        self.query_cache = make_cache(
+            EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_TTL, EMBEDDING_CACHE_PATH, table="query_vectors",
+            codec="vector", local_size=SHARED_CACHE_LOCAL_SIZE,
+        )
+        self.backend: VectorBackend = make_backend(backend, self.collection, NUMPY_INDEX_PATH, NUMPY_INDEX_DTYPE)
+        self.lexical: Optional[LexicalIndex] = None
+        # None: REINDEX_ON_STARTUP, or an empty collection. False never re-indexes (the CLIs,
+        # which index explicitly).
+        count = self.collection.count()
+        if reindex is None:
+            reindex = REINDEX_ON_STARTUP or count == 0
+        if reindex and openai_client is None:
+            self.reindex()
         else:
-            logger.info("Already existing embeddings (%s documents).", self.collection.count())
-
-    def _index_books(self):
-        if not os.path.exists(BOOKS_FILE_JSON):
-            raise FileNotFoundError(f"JSON file not found: {BOOKS_FILE_JSON}")
-        with open(BOOKS_FILE_JSON, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        ids, docs, metadatas = [], [], []
-        for idx, (title, summary) in enumerate(data.items()):
-            if not summary:
+            if reindex:
+                self.pending_reindex = True
+                logger.info("Re-index pending (%s documents indexed so far); the app runs it on warm-up.", count)
+            else:
+                logger.info("Already existing embeddings (%s documents).", count)
+            self.corpus_version = self._compute_corpus_version()
+            self.backend.refresh(self.corpus_version)
+        if hybrid:
+            self.lexical = self._build_lexical()
+
+    def _build_lexical(self) -> LexicalIndex:
+        index = LexicalIndex()
+        got = self.collection.get(include=["documents", "metadatas"])
+        for doc_id, doc, meta in zip(got.get("ids") or [], got.get("documents") or [], got.get("metadatas") or []):
+            index.add(doc_id, str((meta or {}).get("title", "")), doc or "")
+        logger.info("Lexical index built (%d documents).", len(index))
+        return index
+
+    def _compute_corpus_version(self) -> str:
+        """Fingerprint of what is indexed; downstream caches are invalidated when it changes."""
+        got = self.collection.get(include=["metadatas"])
+        pairs = sorted(
+            (i, str((m or {}).get("content_hash", ""))) for i, m in zip(got.get("ids") or [], got.get("metadatas") or [])
+        )
+        return fingerprint(*(f"{i}={h}" for i, h in pairs))[:12]
+
+    def _diff(self, books: Optional[Mapping[str, str]]) -> Tuple[List[Book], List[str], Dict[str, int]]:
+        """(books to embed, ids to delete, stats) bringing the collection in line with `books`."""
+        if books is None:
+            if self._catalog is None:
+                self._catalog = load_catalog()
+            books = self._catalog
+        wanted = {book_id(title): title for title in books}
+
+        existing = self.collection.get(include=["metadatas"])
+        indexed: Dict[str, str] = {}
+        ingested = set()  # added by the ingest CLI: not ours to delete
+        for i, m in zip(existing.get("ids") or [], existing.get("metadatas") or []):
+            indexed[i] = str((m or {}).get("content_hash", ""))
+            if (m or {}).get("origin") == ORIGIN_INGEST:
+                ingested.add(i)
+
+        changed: List[Book] = []
+        added = updated = 0
+        for bid, title in wanted.items():
+            summary = books[title]
+            if indexed.get(bid) == content_hash(title, summary):
                 continue
-            ids.append(str(idx))
-            docs.append(summary)
-            metadatas.append({"title": title})
+            if bid in indexed:
+                updated += 1
+            else:
+                added += 1
+            changed.append(Book(title, summary))
+        stale = [i for i in indexed if i not in wanted and i not in ingested]
+        stats = {"added": added, "updated": updated, "deleted": len(stale),
+                 "unchanged": len(wanted) - added - updated}
+        return changed, stale, stats
 
-        self.collection.add(documents=docs, ids=ids, metadatas=metadatas)
+    async def _embed_books(self, books: List[Book]) -> None:
+        # Batched, rate-limit-aware embedding on the pooled client; a private one (CLI) is closed after.
+        client = self.openai_client or AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+        try:
+            ingest = IngestService(self.collection, client=client, write_batch_size=self.client.get_max_batch_size(),
+                                   origin=ORIGIN_CATALOG)
+            await ingest.run(books, skip_unchanged=False)
+        finally:
+            if self.openai_client is None:
+                await client.close()
 
-    def search_books(self, query: str, top_k: int = 3) -> dict:
-        results = self.collection.query(query_texts=[query], n_results=top_k)
-        ids = (results.get("ids") or [[]])[0] or []
-        docs = (results.get("documents") or [[]])[0] or []
-        metas = (results.get("metadatas") or [[]])[0] or []
+    def _apply(self, changed: List[Book], stale: List[str], stats: Dict[str, int]) -> Dict[str, int]:
+        if stale:
+            self.collection.delete(ids=stale)
+        if self.lexical is not None:
+            for book in changed:
+                self.lexical.add(book_id(book.title), book.title, book.summary)
+            for doc_id in stale:
+                self.lexical.remove(doc_id)
+        self.corpus_version = self._compute_corpus_version()
+        self.backend.refresh(self.corpus_version)
+        self.pending_reindex = False
+        logger.info("Re-index done (%s); corpus version %s.", stats, self.corpus_version)
+        return stats
+
+    async def reindex_async(self, books: Optional[Mapping[str, str]] = None) -> Dict[str, int]:
+        """
+        Brings the collection in line with `books` (default: the catalog, see
+        services/catalog_store.py) by content hash: only new or changed summaries are embedded,
+        removed ones (and legacy positional ids) are deleted; books added by the ingest CLI are
+        kept. Summaries are read one at a time.
+        Chroma and catalog work runs in a thread; embedding runs on the caller's loop.
+        """
+        changed, stale, stats = await asyncio.to_thread(self._diff, books)
+        if changed:
+            await self._embed_books(changed)
+        return await asyncio.to_thread(self._apply, changed, stale, stats)
+
+    def reindex(self, books: Optional[Mapping[str, str]] = None) -> Dict[str, int]:
+        """Blocking reindex_async() for the CLI and a service built without the app's client."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.reindex_async(books))
+        raise RuntimeError("reindex() cannot run inside an event loop; await reindex_async() instead.")
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeddings for search queries, served from the normalized-query cache when possible;
+        all misses go out in a single embedding request.
+        """
+        keys = [normalize_query(q) for q in queries]
+        vectors: Dict[str, List[float]] = {}
+        missing: Dict[str, None] = {}  # ordered set
+        for key in keys:
+            if key in vectors or key in missing:
+                continue
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                missing[key] = None
+        if missing:
+            for key, vector in zip(missing, self.embedding_fn([k or " " for k in missing])):
+                vectors[key] = [float(x) for x in vector]
+                self.query_cache.set(key, vectors[key])
+        return [vectors[k] for k in keys]
+
+    def embed_query(self, query: str) -> List[float]:
+        """Embedding for a search query, served from the normalized-query cache when possible."""
+        return self.embed_queries([query])[0]
+
+    @staticmethod
+    def _format(hits: List[Hit], query: str) -> dict:
         titles = []
-        context_parts = []
-        for i in range(min(len(ids), len(docs))):
-            meta = metas[i] if i < len(metas) else None
-            title = str(meta["title"]) if isinstance(meta, dict) and meta.get("title") else str(ids[i]) or f"Result {i + 1}"
+        for i, hit in enumerate(hits):
+            title = str(hit.metadata["title"]) if hit.metadata.get("title") else hit.id or f"Result {i + 1}"
             titles.append(title)
-            context_parts.append(f"{title}: {docs[i]}")
-        context = "\n---\n".join(context_parts)
-        return {"ids": ids, "documents": docs, "metadatas": metas, "titles": titles, "context": context}
+        with span("pack_context"):
+            context = pack_context(query, [(t, h.document, h.metadata) for t, h in zip(titles, hits)])
+        return {
+            "ids": [h.id for h in hits],
+            "documents": [h.document for h in hits],
+            "metadatas": [h.metadata for h in hits],
+            "distances": [h.distance for h in hits],
+            "titles": titles,
+            "context": context,
+        }
+
+    def search_books(self, query: str, top_k: int = 3) -> dict:
+        return self.search_books_many([query], top_k)[0]
+
+    def search_books_many(self, queries: List[str], top_k: int = 3) -> List[dict]:
+        """Batched search: one embedding request for the cache misses and one backend query."""
+        if not queries:
+            return []
+        with span("embed_query"):
+            vectors = self.embed_queries(queries)
+        depth = top_k if self.lexical is None else max(top_k * 3, 10)
+        with span("vector_query"):
+            vector_hits = self.backend.query(vectors, depth)
+        if self.lexical is None:
+            return [self._format(h, q) for q, h in zip(queries, vector_hits)]
+        with span("lexical_fuse"):
+            return [self._format(self._fuse(q, hits, top_k, depth), q) for q, hits in zip(queries, vector_hits)]
+
+    def _fuse(self, query: str, vector_hits: List[Hit], top_k: int, depth: int) -> List[Hit]:
+        """Reciprocal rank fusion of vector and BM25 rankings (exact title/author mentions win)."""
+        lexical = [doc_id for doc_id, _ in self.lexical.search(query, depth)]
+        fused = reciprocal_rank_fusion([[h.id for h in vector_hits], lexical], RRF_K)[:top_k]
+        by_id = {h.id: h for h in vector_hits}
+        missing = [doc_id for doc_id in fused if doc_id not in by_id]
+        if missing:
+            got = self.collection.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, doc, meta in zip(got.get("ids") or [], got.get("documents") or [], got.get("metadatas") or []):
+                by_id[doc_id] = Hit(doc_id, doc or "", meta or {}, 1.0)  # lexical-only: no vector distance
+        return [by_id[doc_id] for doc_id in fused if doc_id in by_id]
 
     # Optional: load from TXT file with "Title:" and summary blocks
-    def load_and_index_books(self):
-        """Încarcă cărțile din book_summaries.txt și creează embeddings."""
-        with open(BOOKS_FILE_TXT, "r", encoding="utf-8") as f:
-            data = f.read().split("Title:")
-            docs, ids = [], []
-            for idx, block in enumerate(data):
-                block = block.strip()
-                if not block:
-                    continue
-                lines = block.split("\n", 1)
-                title = lines[0].strip()
-                summary = lines[1].strip() if len(lines) > 1 else ""
-                docs.append(summary)
-                ids.append(title)
-
-        self.collection.add(documents=docs, ids=ids)
+    def load_and_index_books(self) -> Dict[str, int]:
+        """Încarcă cărțile din book_summaries.txt și creează embeddings (incremental)."""
+        return self.reindex(read_books_txt())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SmartLibrarian embeddings index maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("reindex", help="embed new/changed books, delete removed ones")
+    cmd.add_argument("--source", choices=["json", "txt"], default="json")
+    args = parser.parse_args()
+
+    if args.command == "reindex":
+        service = EmbeddingsService(reindex=False)
+        stats = service.load_and_index_books() if args.source == "txt" else service.reindex()
+        print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
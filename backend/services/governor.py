@@ -0,0 +1,334 @@
+"""
+Upstream-call governor shared by every OpenAI call site (chat, embeddings, tts, stt, images).
+
+Per endpoint:
+- a bulkhead: at most N calls in flight and at most Q waiting; beyond that callers are
+  rejected immediately with 429 instead of piling up behind a slow upstream;
+- async retries with exponential backoff + jitter (honouring Retry-After) that sleep on
+  the event loop, never in a worker thread;
+- a circuit breaker over a rolling window: when the failure rate crosses the threshold,
+  calls fail fast with CircuitOpen (callers serve their localized fallback, or 503) until
+  a half-open probe succeeds.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+
+from config import (
+    UPSTREAM_LIMITS, UPSTREAM_QUEUE_TIMEOUT_SECONDS, UPSTREAM_MAX_RETRIES, UPSTREAM_BACKOFF_SECONDS,
+    UPSTREAM_BACKOFF_CAP_SECONDS, BREAKER_FAILURE_RATE, BREAKER_MIN_CALLS, BREAKER_WINDOW_SECONDS,
+    BREAKER_OPEN_SECONDS,
+)
+from utils.deadline import budget
+from utils.metrics import OPENAI_RETRIES, metrics
+
+logger = logging.getLogger("smart_librarian.governor")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+T = TypeVar("T")
+
+UPSTREAM_REJECTIONS = metrics.counter(
+    "smart_librarian_upstream_rejections_total", "Calls rejected before reaching the upstream.", ["endpoint", "reason"])
+UPSTREAM_FAILURES = metrics.counter(
+    "smart_librarian_upstream_failures_total", "Upstream attempts that failed with a retryable error.", ["endpoint"])
+
+
+# -------- Errors --------
+class UpstreamRejected(HTTPException):
+    """Raised instead of calling the upstream; carries the HTTP status and Retry-After for the client."""
+
+    def __init__(self, endpoint: str, status_code: int, reason: str, retry_after: float):
+        super().__init__(status_code=status_code, detail=f"{endpoint} is {reason}; please retry shortly.",
+                         headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+        self.endpoint = endpoint
+        self.reason = reason
+
+
+class Overloaded(UpstreamRejected):
+    def __init__(self, endpoint: str, retry_after: float = 1.0):
+        super().__init__(endpoint, 429, "busy", retry_after)
+
+
+class CircuitOpen(UpstreamRejected):
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(endpoint, 503, "temporarily unavailable", retry_after)
+
+
+class EmptyCompletion(Exception):
+    """The model answered with no content; worth another attempt."""
+    retryable = True
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Rate limits, timeouts, connection errors and 5xx; not 4xx request errors or our own rejections."""
+    if isinstance(exc, UpstreamRejected):
+        return False
+    flag = getattr(exc, "retryable", None)
+    if flag is not None:
+        return bool(flag)
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    # openai.APIConnectionError / APITimeoutError, httpx transport errors, asyncio timeouts
+    name = type(exc).__name__
+    return isinstance(exc, (asyncio.TimeoutError, ConnectionError)) or name in (
+        "APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "ConnectTimeout",
+        "RemoteProtocolError", "ReadError", "PoolTimeout")
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt: int, base: float = UPSTREAM_BACKOFF_SECONDS, cap: float = UPSTREAM_BACKOFF_CAP_SECONDS,
+                  retry_after: Optional[float] = None) -> float:
+    """Exponential backoff with jitter for the given 1-based attempt; never shorter than Retry-After."""
+    ceiling = min(cap, base * (2 ** (attempt - 1)))
+    delay = random.uniform(ceiling / 2, ceiling)  # jitter to spread out a thundering herd
+    return max(delay, retry_after or 0.0)
+
+
+# -------- Bulkhead --------
+class Bulkhead:
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    @asynccontextmanager
+    async def slot(self, endpoint: str) -> AsyncIterator[None]:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        if self._sem.locked():
+            if self.waiting >= self.max_queue:
+                UPSTREAM_REJECTIONS.inc(endpoint=endpoint, reason="queue_full")
+                raise Overloaded(endpoint)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                UPSTREAM_REJECTIONS.inc(endpoint=endpoint, reason="queue_timeout")
+                raise Overloaded(endpoint) from None
+            finally:
+                self.waiting -= 1
+        else:
+            await self._sem.acquire()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._sem.release()
+
+
+# -------- Circuit breaker --------
+class CircuitBreaker:
+    def __init__(self, failure_rate: float, min_calls: int, window_seconds: float, open_seconds: float):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._window: Deque[Tuple[float, bool]] = deque()
+        self._probing = False
+
+    def _trim(self, now: float) -> None:
+        while self._window and now - self._window[0][0] > self.window_seconds:
+            self._window.popleft()
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self.state == "half_open":
+            if self._probing:
+                return False  # one probe at a time; everyone else keeps getting the fallback
+            self._probing = True
+        return True
+
+    def record(self, ok: Optional[bool]) -> None:
+        """Outcome of an allowed call: True/False, or None when it says nothing about upstream health."""
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._probing = False
+            if ok is True:
+                self.state = "closed"
+                self._window.clear()
+                logger.info("Circuit closed again after a successful probe.")
+            elif ok is False:
+                self._open(now)
+            return
+        if ok is None:
+            return
+        self._window.append((now, ok))
+        self._trim(now)
+        if self.state == "closed" and len(self._window) >= self.min_calls:
+            failures = sum(1 for _, good in self._window if not good)
+            if failures / len(self._window) >= self.failure_rate:
+                self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = "open"
+        self.opened_at = now
+        self.times_opened += 1
+        self._window.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        failures = sum(1 for _, good in self._window if not good)
+        return {"state": self.state, "times_opened": self.times_opened, "window_calls": len(self._window),
+                "window_failures": failures}
+
+
+# -------- Governor --------
+class _Endpoint:
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.bulkhead = Bulkhead(limit, max_queue, UPSTREAM_QUEUE_TIMEOUT_SECONDS)
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_RATE, BREAKER_MIN_CALLS, BREAKER_WINDOW_SECONDS,
+                                      BREAKER_OPEN_SECONDS)
+
+    def admit(self) -> None:
+        if not self.breaker.allow():
+            UPSTREAM_REJECTIONS.inc(endpoint=self.name, reason="circuit_open")
+            raise CircuitOpen(self.name, self.breaker.retry_after() or 1.0)
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[int, int]]:
+    """"chat:32:64,tts:8:16" -> {"chat": (32, 64), "tts": (8, 16)} (concurrency, queue depth)."""
+    limits = {}
+    for part in spec.split(","):
+        fields = part.strip().split(":")
+        if len(fields) == 3:
+            limits[fields[0]] = (int(fields[1]), int(fields[2]))
+    return limits
+
+
+class Governor:
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.limits = limits if limits is not None else parse_limits(UPSTREAM_LIMITS)
+        self._endpoints: Dict[str, _Endpoint] = {}
+
+    def endpoint(self, name: str) -> _Endpoint:
+        ep = self._endpoints.get(name)
+        if ep is None:
+            limit, max_queue = self.limits.get(name, (16, 32))
+            ep = self._endpoints[name] = _Endpoint(name, limit, max_queue)
+        return ep
+
+    async def call(self, endpoint: str, fn: Callable[[], Awaitable[T]], retries: int = UPSTREAM_MAX_RETRIES,
+                   backoff: float = UPSTREAM_BACKOFF_SECONDS) -> T:
+        """Run fn() under the endpoint's breaker and bulkhead, retrying retryable failures."""
+        ep = self.endpoint(endpoint)
+        ep.admit()
+        try:
+            async with ep.bulkhead.slot(endpoint):
+                return await self._attempts(ep, fn, retries, backoff)
+        except Overloaded:
+            ep.breaker.record(None)  # never reached upstream; frees a half-open probe
+            raise
+
+    async def _attempts(self, ep: _Endpoint, fn: Callable[[], Awaitable[T]], retries: int, backoff: float) -> T:
+        endpoint = ep.name
+        attempt = 1
+        while True:
+            try:
+                result = await fn()
+            except BaseException as e:
+                if not is_retryable(e):
+                    ep.breaker.record(None)
+                    raise
+                UPSTREAM_FAILURES.inc(endpoint=endpoint)
+                ep.breaker.record(False)
+                if attempt > retries:
+                    raise
+                if ep.breaker.state == "open":
+                    raise CircuitOpen(endpoint, ep.breaker.retry_after() or 1.0) from e
+                delay = backoff_delay(attempt, backoff, retry_after=retry_after_seconds(e))
+                left = budget()
+                if left is not None and left < delay + 0.25:
+                    raise  # the request deadline would expire before the retry could answer
+                logger.warning("%s call failed (attempt %d/%d, retry in %.2fs): %s",
+                               endpoint, attempt, retries + 1, delay, e)
+                OPENAI_RETRIES.inc(operation=endpoint)
+                await asyncio.sleep(delay)
+                attempt += 1
+                ep.admit()  # the breaker may have opened (or need a probe) while we slept
+                continue
+            ep.breaker.record(True)
+            return result
+
+    @asynccontextmanager
+    async def guard(self, endpoint: str) -> AsyncIterator[None]:
+        """Breaker + bulkhead around a block (e.g. consuming a stream); no retries."""
+        ep = self.endpoint(endpoint)
+        ep.admit()
+        try:
+            slot = ep.bulkhead.slot(endpoint)
+            await slot.__aenter__()
+        except Overloaded:
+            ep.breaker.record(None)
+            raise
+        try:
+            yield
+        except BaseException as e:
+            retryable = is_retryable(e)
+            if retryable:
+                UPSTREAM_FAILURES.inc(endpoint=endpoint)
+            ep.breaker.record(False if retryable else None)
+            raise
+        else:
+            ep.breaker.record(True)
+        finally:
+            await slot.__aexit__(None, None, None)
+
+    def is_open(self, endpoint: str) -> bool:
+        return self.endpoint(endpoint).breaker.state == "open"
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {"active": ep.bulkhead.active, "waiting": ep.bulkhead.waiting, "limit": ep.bulkhead.limit,
+                   "max_queue": ep.bulkhead.max_queue, **ep.breaker.stats()}
+            for name, ep in sorted(self._endpoints.items())
+        }
+
+
+governor = Governor()
+
+
+@metrics.collector
+def _governor_metrics() -> List[str]:
+    states = {"closed": 0, "half_open": 1, "open": 2}
+    lines = ["# TYPE smart_librarian_upstream_in_flight gauge",
+             "# TYPE smart_librarian_upstream_waiting gauge",
+             "# TYPE smart_librarian_circuit_state gauge"]
+    for name, s in governor.stats().items():
+        lines.append(f'smart_librarian_upstream_in_flight{{endpoint="{name}"}} {s["active"]}')
+        lines.append(f'smart_librarian_upstream_waiting{{endpoint="{name}"}} {s["waiting"]}')
+        lines.append(f'smart_librarian_circuit_state{{endpoint="{name}"}} {states[s["state"]]}')
+    return lines
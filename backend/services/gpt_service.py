@@ -1,67 +1,93 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-import time
-from typing import List, Literal, Optional
-
-from openai import OpenAI
-from config import OPENAI_API_KEY
-
-# Optional: langdetect is best-effort; we fallback to EN on errors
-try:
-    from langdetect import detect as _langdetect_detect  # type: ignore
-except Exception:  # pragma: no cover
-    _langdetect_detect = None  # type: ignore
+from typing import TYPE_CHECKING, Any, AsyncIterator, List, Optional, Tuple
+
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, HEDGE_ENABLED, HEDGE_AFTER_SECONDS, HEDGE_MAX_RATIO, PROMPT_TOKEN_BUDGET,
+)
+from services.governor import (
+    CircuitOpen, EmptyCompletion, Overloaded, backoff_delay, governor, retry_after_seconds,
+)
+from utils.deadline import DeadlineExceeded, budget, check, within
+from utils.hedge import Hedger
+from utils.langid import Lang, detect_language
+from utils.metrics import OPENAI_FALLBACKS, OPENAI_RETRIES, record_usage
+from utils.text import estimate_tokens
 
 logger = logging.getLogger("smart_librarian.gpt")
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
 
-Lang = Literal["ro", "en"]
+# System message + user-message framing, roughly, in either language.
+_PROMPT_OVERHEAD_TOKENS = 200
+
+if TYPE_CHECKING:  # the SDK import is slow; defer it to first construction
+    from openai import AsyncOpenAI
 
 
 class GPTService:
     """
     Small wrapper around OpenAI Chat Completions for book recommendations.
-    - Uses new SDK.
+    - Uses new SDK (AsyncOpenAI, so callers never block the event loop).
     - English logs.
-    - Retries on transient errors.
+    - Retries on transient errors via the shared upstream governor (bulkhead + circuit breaker).
     """
 
     def __init__(
         self,
         api_key: Optional[str] = None,
+        client: Optional[AsyncOpenAI] = None,
         model: str = "gpt-4o-mini",
         temperature: float = 0.3,
         max_tokens: int = 600,
         request_timeout: int = 30,  # seconds
         max_retries: int = 3,
         retry_backoff_seconds: float = 1.0,
+        prompt_token_budget: int = PROMPT_TOKEN_BUDGET,
     ) -> None:
-        self.client = OpenAI(api_key=api_key or OPENAI_API_KEY)
+        if client is None:
+            from openai import AsyncOpenAI
+            client = AsyncOpenAI(api_key=api_key or OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+        self.client = client
         self.model = model
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.request_timeout = request_timeout
         self.max_retries = max_retries
         self.retry_backoff_seconds = retry_backoff_seconds
-
-    # -------- Language helpers --------
-    @staticmethod
-    def _normalize_lang(code: str) -> Lang:
-        return "ro" if code.lower().startswith("ro") else "en"
-
-    def detect_language(self, text: str) -> Lang:
-        if _langdetect_detect:
-            try:
-                return self._normalize_lang(_langdetect_detect(text))
-            except Exception as e:  # keep service resilient
-                logger.warning("Language detection failed, falling back to EN: %s", e)
-        return "en"
+        self.prompt_token_budget = prompt_token_budget
+        # Completion latency (first token for streams) decides when a hedge fires.
+        self.hedger = Hedger("completion", HEDGE_ENABLED, HEDGE_AFTER_SECONDS, HEDGE_MAX_RATIO)
+        self.stream_hedger = Hedger("completion_stream", HEDGE_ENABLED, HEDGE_AFTER_SECONDS, HEDGE_MAX_RATIO)
 
     # -------- Prompting --------
-    def _build_messages(self, lang: Lang, context: str, query: str) -> List[dict]:
-        """Builds a compact, context-aware prompt that stays helpful and concise."""
+    def _build_messages(self, lang: Lang, context: str, query: str,
+                        history: Optional[List[dict]] = None) -> List[dict]:
+        """
+        Builds a compact, context-aware prompt that stays helpful and concise.
+        Instructions and the question always go in; the retrieved summaries (best match first)
+        and then the most recent turns of `history` fill what is left of prompt_token_budget.
+        """
+        budget = self.prompt_token_budget - estimate_tokens(query) - _PROMPT_OVERHEAD_TOKENS
+        snippets = []
+        for snippet in context.split("\n---\n") if context else []:
+            cost = estimate_tokens(snippet)
+            if cost <= budget:
+                snippets.append(snippet)
+                budget -= cost
+        context = "\n---\n".join(snippets)
+        turns: List[dict] = []
+        for turn in reversed(history or []):
+            cost = estimate_tokens(turn["content"]) + 4  # role/message framing
+            if cost > budget:
+                break
+            turns.insert(0, {"role": turn["role"], "content": turn["content"]})
+            budget -= cost
+        if turns and turns[0]["role"] == "assistant":
+            turns.pop(0)  # start the window on a user turn
+
         if lang == "ro":
             system = (
                 "Ești un bibliotecar asistent. Răspunzi întotdeauna în română, concis (1–3 propoziții). "
@@ -88,43 +114,139 @@ class GPTService:
             )
         return [
             {"role": "system", "content": system},
+            *turns,
             {"role": "user",   "content": user},
         ]
 
     # -------- Public API --------
-    def get_recommendation(self, context: str, query: str) -> str:
+    async def get_recommendation(self, context: str, query: str, lang: Optional[Lang] = None,
+                                 history: Optional[List[dict]] = None) -> str:
         """
         Generate a short, context-aware recommendation.
-        Retries on transient failures and returns a safe fallback on empty content.
+        Retries transient failures through the upstream governor and returns the localized
+        fallback when retries are exhausted or the circuit is open. A full queue (Overloaded)
+        propagates so the route can answer 429 right away.
+        `lang` is the language the route already detected; it is only worked out here when omitted.
+        `history` holds earlier turns of the conversation ({"role", "content"}, oldest first).
         """
-        lang = self.detect_language(query)
-        messages = self._build_messages(lang, context, query)
-
-        last_error: Optional[Exception] = None
+        lang = lang or detect_language(query)
+        messages = self._build_messages(lang, context, query, history)
+
+        async def attempt() -> str:
+            check("completion")
+            resp = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                timeout=budget(self.request_timeout),  # what is left of the request deadline
+            )
+            record_usage(self.model, getattr(resp, "usage", None))
+            content = (resp.choices[0].message.content or "").strip()
+            if not content:
+                raise EmptyCompletion("Empty content from model.")
+            return content
+
+        async def hedged() -> str:
+            return await self.hedger.run(attempt, can_hedge=lambda: not governor.is_open("chat"))
+
+        try:
+            return await within("completion", governor.call(
+                "chat", hedged, retries=self.max_retries - 1, backoff=self.retry_backoff_seconds))
+        except Overloaded:
+            raise
+        except CircuitOpen:
+            logger.warning("Chat circuit open; serving fallback.")
+        except DeadlineExceeded:
+            logger.warning("Request deadline reached before the completion; serving fallback.")
+        except Exception as e:
+            logger.error("Exhausted retries for chat completion. Returning fallback. Last error: %s", e)
+        OPENAI_FALLBACKS.inc(operation="completion")
+        return self.fallback(lang)
+
+    async def stream_recommendation(self, context: str, query: str, lang: Optional[Lang] = None,
+                                    history: Optional[List[dict]] = None) -> AsyncIterator[str]:
+        """
+        Same as get_recommendation, but yields content deltas as the model emits them.
+        Retries only while nothing has been yielded yet; a stream that breaks mid-way just ends.
+        """
+        lang = lang or detect_language(query)
+        messages = self._build_messages(lang, context, query, history)
+
+        async def open_stream() -> Tuple[Any, Optional[str]]:
+            """Open a stream and read up to its first content delta (what hedging races on)."""
+            check("first_token")
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                timeout=budget(self.request_timeout),
+                stream=True,
+                stream_options={"include_usage": True},  # final chunk carries usage, no choices
+            )
+            try:
+                async for chunk in stream:
+                    record_usage(self.model, getattr(chunk, "usage", None))
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        return stream, delta
+                return stream, None
+            except BaseException:
+                await stream.close()
+                raise
+
+        async def close_stream(opened: Tuple[Any, Optional[str]]) -> None:
+            await opened[0].close()
+
+        last_error: Optional[BaseException] = None
         for attempt in range(1, self.max_retries + 1):
+            emitted = False
             try:
-                resp = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                    timeout=self.request_timeout,  # SDK forwards to httpx timeout
-                )
-                content = (resp.choices[0].message.content or "").strip()
-                if content:
-                    return content
-
-                logger.warning("Empty content from model (attempt %d/%d).", attempt, self.max_retries)
+                async with governor.guard("chat"):
+                    # The deadline bounds the wait for the first token; after that the answer is flowing.
+                    stream, first = await within("first_token", self.stream_hedger.run(
+                        open_stream, discard=close_stream, can_hedge=lambda: not governor.is_open("chat")))
+                    try:
+                        if first:
+                            emitted = True
+                            yield first
+                        async for chunk in stream:
+                            record_usage(self.model, getattr(chunk, "usage", None))
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                emitted = True
+                                yield delta
+                    finally:
+                        # Also on GeneratorExit (client gone): hand the pooled connection back now.
+                        await stream.close()
+                if emitted:
+                    return
+
+                logger.warning("Empty stream from model (attempt %d/%d).", attempt, self.max_retries)
+            except Overloaded:
+                raise
+            except (CircuitOpen, DeadlineExceeded) as e:
+                last_error = e
+                break
             except Exception as e:
+                if emitted:
+                    logger.error("Chat completion stream broke after first token: %s", e)
+                    return
                 last_error = e
-                logger.warning("Chat completion failed (attempt %d/%d): %s", attempt, self.max_retries, e)
+                logger.warning("Chat completion stream failed (attempt %d/%d): %s", attempt, self.max_retries, e)
 
-            # backoff before next try (except after final attempt)
             if attempt < self.max_retries:
-                time.sleep(self.retry_backoff_seconds * attempt)
+                OPENAI_RETRIES.inc(operation="completion_stream")
+                await asyncio.sleep(backoff_delay(attempt, self.retry_backoff_seconds,
+                                                  retry_after=retry_after_seconds(last_error) if last_error else None))
 
-        # Fallback safe response if all retries failed or content empty
-        logger.error("Exhausted retries for chat completion. Returning fallback. Last error: %s", last_error)
+        logger.error("Chat completion stream gave up. Returning fallback. Last error: %s", last_error)
+        OPENAI_FALLBACKS.inc(operation="completion_stream")
+        yield self.fallback(lang)
+
+    @staticmethod
+    def fallback(lang: Lang) -> str:
         if lang == "ro":
             return "Nu am putut genera o recomandare în acest moment. Poți reformula întrebarea sau specifica un autor/gen?"
         return "I couldn’t generate a recommendation right now. Please rephrase your question or specify an author/genre."
@@ -0,0 +1,357 @@
+"""
+Streaming bulk-embedding pipeline for large catalogs.
+
+    source (JSON / "Title:" TXT, read lazily)
+      -> batches bounded by token budget and item count
+      -> N concurrent embedding requests (exponential backoff on 429/5xx)
+      -> Chroma upserts in chunks of at most the client's max batch size
+      -> checkpoint of the contiguous committed prefix, so an interrupted run resumes
+
+Run from backend/:
+    python -m services.ingest_service data/book_summaries.json --checkpoint /tmp/ingest.ckpt
+
+Every record carries an "origin" in its metadata: "catalog" for what EmbeddingsService's
+re-index writes from the catalog, "ingest" for this CLI. The re-index only ever deletes
+catalog records, so books ingested here survive the next app start.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from openai import (
+    APIConnectionError, AsyncOpenAI, InternalServerError, RateLimitError,
+)
+
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, EMBEDDING_MODEL, INGEST_CONCURRENCY,
+    INGEST_BATCH_TOKENS, INGEST_BATCH_ITEMS, INGEST_MAX_RETRIES,
+)
+from services.context_packer import sentence_metadata
+from services.governor import backoff_delay, retry_after_seconds
+from utils.text import estimate_tokens, normalize_query
+
+logger = logging.getLogger("smart_librarian.ingest")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+# OpenAI embeddings accept at most 8191 tokens per input; stay safely below.
+MAX_INPUT_TOKENS = 8000
+_RETRYABLE = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+class Book(NamedTuple):
+    title: str
+    summary: str
+
+
+def book_id(title: str) -> str:
+    """Stable id derived from the title, so edits update a document instead of duplicating it."""
+    return "book-" + hashlib.sha1(normalize_query(title).encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(title: str, summary: str) -> str:
+    return hashlib.sha256(f"{title}\x1f{summary}".encode("utf-8")).hexdigest()
+
+
+# -------- Readers (generators, never hold the whole catalog) --------
+def iter_books_json(path: str, chunk_size: int = 1 << 16) -> Iterator[Book]:
+    """
+    Incrementally parses either {"title": "summary", ...} or
+    [{"title": ..., "summary": ...}, ...] without json.load-ing the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buf, pos, eof = "", 0, False
+
+        def fill() -> bool:
+            nonlocal buf, pos, eof
+            if eof:
+                return False
+            more = f.read(chunk_size)
+            if not more:
+                eof = True
+                return False
+            buf, pos = buf[pos:] + more, 0
+            return True
+
+        def skip_ws() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buf) and buf[pos].isspace():
+                    pos += 1
+                if pos < len(buf) or not fill():
+                    return buf[pos] if pos < len(buf) else ""
+
+        def value() -> Any:
+            nonlocal pos
+            skip_ws()
+            while True:
+                try:
+                    obj, end = decoder.raw_decode(buf, pos)
+                    # A value ending exactly at the buffer edge may be truncated (e.g. a number).
+                    if end < len(buf) or eof:
+                        pos = end
+                        return obj
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                if not fill():
+                    obj, pos = decoder.raw_decode(buf, pos)
+                    return obj
+
+        def expect(char: str) -> None:
+            nonlocal pos
+            if skip_ws() != char:
+                raise ValueError(f"{path}: expected {char!r} at offset {pos}")
+            pos += 1
+
+        opening = skip_ws()
+        if opening not in ("{", "["):
+            raise ValueError(f"{path}: expected a JSON object or array")
+        closing = "}" if opening == "{" else "]"
+        pos += 1
+        while True:
+            c = skip_ws()
+            if c == closing:
+                return
+            if c == ",":
+                pos += 1
+                continue
+            if c == "":
+                raise ValueError(f"{path}: unexpected end of file")
+            if opening == "{":
+                title = value()
+                expect(":")
+                summary = value()
+            else:
+                item = value()
+                if not isinstance(item, dict):
+                    continue
+                title = item.get("title") or item.get("name") or item.get("book") or ""
+                summary = item.get("summary") or item.get("synopsis") or item.get("desc") or ""
+            if title and summary:
+                yield Book(str(title), str(summary))
+
+
+def iter_books_txt(path: str) -> Iterator[Book]:
+    """Streams the "Title: ..." block format of book_summaries.txt line by line."""
+    title: Optional[str] = None
+    lines: List[str] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("Title:"):
+                if title and "".join(lines).strip():
+                    yield Book(title, "".join(lines).strip())
+                title, lines = line[len("Title:"):].strip(), []
+            elif title is not None:
+                lines.append(line)
+    if title and "".join(lines).strip():
+        yield Book(title, "".join(lines).strip())
+
+
+def iter_books(path: str) -> Iterator[Book]:
+    return iter_books_txt(path) if path.endswith(".txt") else iter_books_json(path)
+
+
+def batch_by_tokens(books: Iterable[Book], max_tokens: int, max_items: int) -> Iterator[List[Book]]:
+    batch: List[Book] = []
+    tokens = 0
+    for book in books:
+        cost = min(estimate_tokens(book.summary), MAX_INPUT_TOKENS)
+        if batch and (tokens + cost > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(book)
+        tokens += cost
+    if batch:
+        yield batch
+
+
+ORIGIN_CATALOG = "catalog"
+ORIGIN_INGEST = "ingest"
+
+
+# -------- Pipeline --------
+class IngestService:
+    """Embeds and writes books into a Chroma collection with bounded concurrency."""
+
+    def __init__(
+        self,
+        collection: Any,
+        client: Optional[AsyncOpenAI] = None,
+        model: str = EMBEDDING_MODEL,
+        concurrency: int = INGEST_CONCURRENCY,
+        max_batch_tokens: int = INGEST_BATCH_TOKENS,
+        max_batch_items: int = INGEST_BATCH_ITEMS,
+        write_batch_size: Optional[int] = None,
+        max_retries: int = INGEST_MAX_RETRIES,
+        retry_backoff_seconds: float = 1.0,
+        checkpoint_path: Optional[str] = None,
+        origin: str = ORIGIN_INGEST,
+    ) -> None:
+        self.collection = collection
+        self.origin = origin
+        # Retries are ours (with Retry-After / jitter), not the SDK's.
+        self.client = client or AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.write_batch_size = write_batch_size or 1000
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        self.checkpoint_path = checkpoint_path
+        self.retries = 0
+
+    # -------- Checkpointing --------
+    def _load_checkpoint(self) -> int:
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("committed", 0))
+
+    def _save_checkpoint(self, committed: int) -> None:
+        if not self.checkpoint_path:
+            return
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"committed": committed, "updated_at": time.time()}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    # -------- Stages --------
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                resp = await self.client.embeddings.create(model=self.model, input=texts)
+                return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+            except _RETRYABLE as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                delay = backoff_delay(attempt, self.retry_backoff_seconds, cap=60.0,
+                                      retry_after=retry_after_seconds(e))
+                logger.warning("Embedding batch failed (attempt %d/%d, retry in %.1fs): %s",
+                               attempt, self.max_retries, delay, e)
+                await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def _filter_unchanged(self, books: List[Book]) -> List[Book]:
+        got = self.collection.get(ids=[book_id(b.title) for b in books], include=["metadatas"])
+        indexed = {i: (m or {}).get("content_hash") for i, m in zip(got.get("ids") or [], got.get("metadatas") or [])}
+        return [b for b in books if indexed.get(book_id(b.title)) != content_hash(b.title, b.summary)]
+
+    def _write(self, books: List[Book], vectors: List[List[float]]) -> None:
+        for start in range(0, len(books), self.write_batch_size):
+            chunk = books[start:start + self.write_batch_size]
+            self.collection.upsert(
+                ids=[book_id(b.title) for b in chunk],
+                embeddings=vectors[start:start + self.write_batch_size],
+                documents=[b.summary for b in chunk],
+                metadatas=[{"title": b.title, "content_hash": content_hash(b.title, b.summary), "origin": self.origin,
+                            **sentence_metadata(b.summary)} for b in chunk],
+            )
+
+    async def _process(self, books: List[Book], skip_unchanged: bool) -> Tuple[int, int]:
+        todo = await asyncio.to_thread(self._filter_unchanged, books) if skip_unchanged else books
+        if todo:
+            # Inputs beyond the per-input limit are truncated rather than failing the batch.
+            texts = [b.summary[: MAX_INPUT_TOKENS * 4] for b in todo]
+            vectors = await self._embed(texts)
+            await asyncio.to_thread(self._write, todo, vectors)
+        return len(todo), len(books) - len(todo)
+
+    # -------- Public API --------
+    async def run(self, books: Iterable[Book], skip_unchanged: bool = True) -> Dict[str, float]:
+        resume_from = self._load_checkpoint()
+        if resume_from:
+            logger.info("Resuming ingestion after %d already committed records.", resume_from)
+
+        def remaining() -> Iterator[Book]:
+            for n, book in enumerate(books):
+                if n >= resume_from:
+                    yield book
+
+        started = time.perf_counter()
+        embedded = skipped = batches = 0
+        committed = resume_from
+        next_seq, done_sizes = 0, {}  # seq -> batch size, to advance the contiguous prefix
+        pending: Dict[asyncio.Task, int] = {}
+
+        async def drain(return_when: str) -> None:
+            nonlocal embedded, skipped, committed, next_seq
+            finished, _ = await asyncio.wait(pending.keys(), return_when=return_when)
+            for task in finished:
+                seq = pending.pop(task)
+                n_embedded, n_skipped = task.result()
+                embedded += n_embedded
+                skipped += n_skipped
+                done_sizes[seq] = n_embedded + n_skipped
+            while next_seq in done_sizes:
+                committed += done_sizes.pop(next_seq)
+                next_seq += 1
+            self._save_checkpoint(committed)
+            elapsed = time.perf_counter() - started
+            logger.info("Ingested %d docs (%d embedded, %d unchanged) - %.1f docs/sec",
+                        embedded + skipped, embedded, skipped, (embedded + skipped) / elapsed if elapsed else 0.0)
+
+        try:
+            for seq, batch in enumerate(batch_by_tokens(remaining(), self.max_batch_tokens, self.max_batch_items)):
+                pending[asyncio.create_task(self._process(batch, skip_unchanged))] = seq
+                batches += 1
+                if len(pending) >= self.concurrency:
+                    await drain(asyncio.FIRST_COMPLETED)
+            while pending:
+                await drain(asyncio.ALL_COMPLETED)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            raise
+
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)  # finished: the next run starts from the top
+        elapsed = time.perf_counter() - started
+        return {
+            "docs": embedded + skipped,
+            "embedded": embedded,
+            "unchanged": skipped,
+            "batches": batches,
+            "retries": self.retries,
+            "seconds": round(elapsed, 3),
+            "docs_per_sec": round((embedded + skipped) / elapsed, 1) if elapsed else 0.0,
+        }
+
+
+def main() -> None:
+    from services.embeddings_service import EmbeddingsService
+
+    parser = argparse.ArgumentParser(description="Bulk-embed a book catalog into Chroma.")
+    parser.add_argument("source", help="JSON ({title: summary} or list) or 'Title:' TXT file")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY)
+    parser.add_argument("--batch-tokens", type=int, default=INGEST_BATCH_TOKENS)
+    parser.add_argument("--batch-items", type=int, default=INGEST_BATCH_ITEMS)
+    parser.add_argument("--checkpoint", default=None, help="resume file; removed once the run completes")
+    parser.add_argument("--no-skip-unchanged", action="store_true", help="re-embed even if the content hash matches")
+    args = parser.parse_args()
+
+    embeddings = EmbeddingsService(reindex=False)
+    service = IngestService(
+        embeddings.collection,
+        concurrency=args.concurrency,
+        max_batch_tokens=args.batch_tokens,
+        max_batch_items=args.batch_items,
+        write_batch_size=embeddings.client.get_max_batch_size(),
+        checkpoint_path=args.checkpoint,
+    )
+    stats = asyncio.run(service.run(iter_books(args.source), skip_unchanged=not args.no_skip_unchanged))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
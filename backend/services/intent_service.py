@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import re
+import threading
+from typing import Dict, List, Literal, Tuple
+
+from config import INTENT_CONFIDENCE_THRESHOLD
+from utils.text import strip_diacritics
+
+Intent = Literal["small_talk", "book_request", "other"]
+
+# Matched on casefolded, diacritic-free text, so "bună" / "buna" and "cărți" / "carti" are equal.
+GREETING_RO = r"\b(buna(\s+ziua|\s+seara|\s+dimineata)?|salut(are)?|hei|ceau|ce\s+faci|ce\s+mai\s+faci|multumesc|mersi|pa)\b"
+GREETING_EN = r"\b(hi|hello|hey|how\s+are\s+you|what'?s\s+up|good\s+(morning|evening|afternoon)|thanks?|thank\s+you|bye)\b"
+GENRES = r"\b(fantasy|sci-?fi|science\s+fiction|romance|thriller|mystery|dystopi\w*|classics?|poetry|fiction)\b"
+
+# (pattern, weight). Single words and a few bigrams that are strong signals on their own.
+_BOOK_TERMS: List[Tuple[str, float]] = [
+    (r"\b(books?|novels?|stor(y|ies)|authors?|writers?|genres?|chapters?|series|titles?)\b", 1.0),
+    (r"\b(recommend\w*|suggest\w*|read(ing)?|summar(y|ies|ize))\b", 1.0),
+    (GENRES, 1.0),
+    (r"\b(carti|carte|cartea|romane?|romanul|povest\w*|autor\w*|scriitor\w*|gen(ul)?|titlu\w*|capitol\w*)\b", 1.0),
+    (r"\b(recoman\w*|sugere\w*|citesc|citi|citit|lectur\w*|rezumat\w*)\b", 1.0),
+    (r"\b(something\s+like|similar\s+to|about\s+(a|an|the)|ceva\s+despre|ceva\s+ca)\b", 0.75),
+]
+_SMALL_TALK_TERMS: List[Tuple[str, float]] = [
+    (GREETING_RO, 1.0),
+    (GREETING_EN, 1.0),
+    (r"\b(who\s+are\s+you|what\s+can\s+you\s+do|nice\s+to\s+meet\s+you|cine\s+esti|ce\s+poti\s+face)\b", 1.0),
+]
+# Words that may surround a greeting without carrying a request of their own ("thanks, have a
+# nice day", "buna ziua tuturor"). Anything else left over makes the message more than small talk.
+_COURTESY = frozenset("""
+    a an the and so very much lot too all everyone again there you u your my dear friend friends
+    have nice great good lovely day night today doing well fine ok okay oh please i im i'm am is it
+    o zi azi si tu voi va iti mai tare mult multe foarte frumoasa placuta bine draga dragule
+    tuturor lumea toata la revedere curand data viitoare deci asa
+""".split())
+
+
+class IntentClassifier:
+    """
+    Fast local tier for classify_intent: greeting regexes plus a weighted keyword/bigram
+    lexicon. Returns (intent, confidence); callers escalate to the LLM below the threshold.
+    """
+
+    def __init__(self, threshold: float = INTENT_CONFIDENCE_THRESHOLD):
+        self.threshold = threshold
+        self._book = [(re.compile(p, re.IGNORECASE), w) for p, w in _BOOK_TERMS]
+        self._small = [(re.compile(p, re.IGNORECASE), w) for p, w in _SMALL_TALK_TERMS]
+        self._lock = threading.Lock()
+        self._local: Dict[str, int] = {"small_talk": 0, "book_request": 0, "other": 0}
+        self.escalations = 0
+        self.llm_failures = 0
+
+    @staticmethod
+    def _score(text: str, terms: List[Tuple[re.Pattern, float]]) -> float:
+        return sum(w * len(pat.findall(text)) for pat, w in terms)
+
+    def _leftover(self, text: str) -> List[str]:
+        """Words of `text` outside its greetings and courtesy phrases."""
+        for pat, _ in self._small:
+            text = pat.sub(" ", text)
+        return [w for w in re.findall(r"[\w']+", text) if w not in _COURTESY]
+
+    def classify(self, query: str) -> Tuple[Intent, float]:
+        text = strip_diacritics(query.casefold()).strip()
+        words = len(text.split())
+        book = self._score(text, self._book)
+        small = self._score(text, self._small)
+
+        if book and not small:
+            return "book_request", min(0.99, 0.7 + 0.15 * book)
+        if small and not book:
+            # "hi!" is small talk; "hi, who wrote The Hobbit?" carries a question the lexicon
+            # doesn't know, so it goes to the LLM tier.
+            return "small_talk", 0.95 if not self._leftover(text) else 0.5
+        if book and small:
+            # "Hi, can you recommend a fantasy book?" -> the request wins.
+            return "book_request", 0.85 if book >= small else 0.55
+        return "other", 0.3 if words > 2 else 0.5
+
+    def is_greeting(self, query: str, lang: str) -> bool:
+        """The old regex fallback, used when the LLM tier fails; the greeting must be the whole message."""
+        text = strip_diacritics(query.casefold()).strip()
+        return (bool(re.search(GREETING_RO if lang == "ro" else GREETING_EN, text, re.IGNORECASE))
+                and not self._leftover(text))
+
+    # -------- Stats --------
+    def record_local(self, intent: str) -> None:
+        with self._lock:
+            self._local[intent] = self._local.get(intent, 0) + 1
+
+    def record_escalation(self, failed: bool = False) -> None:
+        with self._lock:
+            self.escalations += 1
+            self.llm_failures += int(failed)
+
+    def stats(self) -> Dict[str, object]:
+        local = sum(self._local.values())
+        total = local + self.escalations
+        return {
+            "threshold": self.threshold,
+            "local": dict(self._local),
+            "escalations": self.escalations,
+            "llm_failures": self.llm_failures,
+            "escalation_rate": round(self.escalations / total, 4) if total else 0.0,
+        }
+
+
+intent_classifier = IntentClassifier()
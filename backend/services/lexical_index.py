@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.text import normalize_query, strip_diacritics
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from i in is it me my of on or something like the this that to "
+    "want with about book books recommend si sau de la cu in un o pe ce care despre este vreau carte".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(strip_diacritics(text.casefold())) if t not in STOPWORDS]
+
+
+class _Field:
+    """Postings and length statistics for one BM25 field."""
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+
+    def add(self, doc_id: str, tokens: List[str]) -> None:
+        for term, tf in Counter(tokens).items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.lengths[doc_id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id: str, tokens: List[str]) -> None:
+        for term in set(tokens):
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_length -= self.lengths.pop(doc_id, 0)
+
+    def score(self, terms: Iterable[str], k1: float, b: float, out: Dict[str, float], weight: float) -> None:
+        n = len(self.lengths)
+        if not n:
+            return
+        avg = self.total_length / n or 1.0
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1.0 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, tf in docs.items():
+                norm = tf + k1 * (1.0 - b + b * self.lengths[doc_id] / avg)
+                out[doc_id] = out.get(doc_id, 0.0) + weight * idf * tf * (k1 + 1.0) / norm
+
+
+class LexicalIndex:
+    """
+    In-memory inverted index with BM25 scoring over two fields (title, boosted; summary).
+    Built once at load and updated per document, so lookups never scan the catalog.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, title_boost: float = 3.0):
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self._title = _Field()
+        self._body = _Field()
+        self._tokens: Dict[str, Tuple[List[str], List[str]]] = {}
+        self._exact: Dict[str, str] = {}  # normalized title -> doc id
+        self.titles: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    def add(self, doc_id: str, title: str, text: str = "") -> None:
+        with self._lock:
+            if doc_id in self._tokens:
+                self._remove(doc_id)
+            title_tokens, body_tokens = tokenize(title), tokenize(text)
+            self._title.add(doc_id, title_tokens)
+            self._body.add(doc_id, body_tokens)
+            self._tokens[doc_id] = (title_tokens, body_tokens)
+            self._exact[self.title_key(title)] = doc_id
+            self.titles[doc_id] = title
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        tokens = self._tokens.pop(doc_id, None)
+        if tokens is None:
+            return
+        self._title.remove(doc_id, tokens[0])
+        self._body.remove(doc_id, tokens[1])
+        title = self.titles.pop(doc_id, "")
+        if self._exact.get(self.title_key(title)) == doc_id:
+            del self._exact[self.title_key(title)]
+
+    @staticmethod
+    def title_key(title: str) -> str:
+        return strip_diacritics(normalize_query(title.replace("’", "'")))
+
+    def search(self, query: str, top_k: int = 10, fields: str = "all") -> List[Tuple[str, float]]:
+        terms = tokenize(query)
+        scores: Dict[str, float] = {}
+        with self._lock:
+            self._title.score(terms, self.k1, self.b, scores, self.title_boost if fields == "all" else 1.0)
+            if fields == "all":
+                self._body.score(terms, self.k1, self.b, scores, 1.0)
+        return heapq.nlargest(top_k, scores.items(), key=lambda kv: kv[1])
+
+    def lookup_title(self, title: str) -> Optional[str]:
+        """
+        Exact (normalized) title match in O(1); otherwise the best title-field BM25 hit,
+        accepted only when one title contains the other token-wise ("Harry Potter" ->
+        "Harry Potter and the Sorcerer's Stone"), like the old substring scan did.
+        """
+        doc_id = self._exact.get(self.title_key(title))
+        if doc_id is not None:
+            return doc_id
+        wanted = set(tokenize(title))
+        if not wanted:
+            return None
+        for candidate, _ in self.search(title, top_k=5, fields="title"):
+            have = set(self._tokens[candidate][0])
+            if wanted <= have or (have and have <= wanted):
+                return candidate
+        return None
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Fuses several ranked id lists: score(d) = sum 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=lambda d: -scores[d])
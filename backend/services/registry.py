@@ -0,0 +1,214 @@
+"""
+Lazily-built, process-wide singletons (OpenAI clients, Chroma, catalog, caches).
+
+Nothing here runs at import time: importing the routes is cheap and a bad API key
+or a missing index no longer crashes the app on import. The FastAPI lifespan calls
+warm_up() in the background, and /ready reports the state of each singleton.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger("smart_librarian.registry")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """Thread-safe build-once holder. Failed builds are retried on the next access."""
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+        self.error: Optional[str] = None
+        self.build_seconds: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    def get(self) -> T:
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    started = time.perf_counter()
+                    try:
+                        self._value = self._factory()
+                        self.error = None
+                    except Exception as e:
+                        self.error = f"{type(e).__name__}: {e}"
+                        logger.exception("Failed to initialize %s: %s", self.name, e)
+                        raise
+                    self.build_seconds = round(time.perf_counter() - started, 3)
+                    logger.info("%s ready in %.3fs", self.name, self.build_seconds)
+        return self._value
+
+    async def aget(self) -> T:
+        """Like get(), but builds off the event loop (Chroma/JSON loading is blocking)."""
+        if self._value is not None:
+            return self._value
+        return await run_in_threadpool(self.get)
+
+    def peek(self) -> Optional[T]:
+        return self._value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = None
+
+    def state(self) -> Dict[str, Any]:
+        status = "ready" if self.ready else ("error" if self.error else "pending")
+        out: Dict[str, Any] = {"status": status}
+        if self.build_seconds is not None:
+            out["build_seconds"] = self.build_seconds
+        if self.error and not self.ready:
+            out["error"] = self.error
+        return out
+
+
+# -------- Shared HTTP pools --------
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+
+
+def _make_async_openai():
+    from openai import AsyncOpenAI
+    http = httpx.AsyncClient(limits=_limits(), timeout=HTTP_TIMEOUT_SECONDS)
+    # Retries belong to services/governor.py (async backoff, breaker-aware), not the SDK.
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, http_client=http, max_retries=0)
+
+
+def _make_http():
+    # Plain downloads (e.g. image URLs); the OpenAI clients keep their own pools.
+    return httpx.AsyncClient(limits=_limits(), timeout=HTTP_TIMEOUT_SECONDS, follow_redirects=True)
+
+
+# -------- Services --------
+def _make_catalog():
+    # One per process for both services below; memory-mapped, so shared by workers too.
+    from services.catalog_store import load_catalog
+    return load_catalog()
+
+
+def _make_embeddings():
+    from services.embeddings_service import EmbeddingsService
+    # A startup re-index is awaited by warm_up() on the app's loop, with the pooled client.
+    return EmbeddingsService(catalog=catalog.get(), openai_client=openai_client.get())
+
+
+def _make_gpt():
+    from services.gpt_service import GPTService
+    return GPTService(client=openai_client.get())
+
+
+def _make_tools():
+    from services.tools_service import ToolsService
+    # Fuzzy title lookups reuse the hybrid index instead of building a second one. peek(), not
+    # get(): a lookup must not build the embeddings service (or wait on it) on the event loop.
+    return ToolsService(catalog.get(), lexical=lambda: getattr(embeddings_service.peek(), "lexical", None))
+
+
+def _make_response_cache():
+    from services.response_cache import ResponseCache
+    return ResponseCache()
+
+
+def _make_image_cache():
+    from config import IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, SHARED_CACHE_PATH
+    from utils.disk_cache import DiskCache
+    return DiskCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, index_path=SHARED_CACHE_PATH, index_table="image_files")
+
+
+def _make_session_store():
+    from services.session_store import SessionStore
+    return SessionStore()
+
+
+def _make_tts_cache():
+    from config import TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, SHARED_CACHE_PATH
+    from utils.disk_cache import DiskCache
+    return DiskCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES, index_path=SHARED_CACHE_PATH, index_table="tts_files")
+
+
+openai_client: Lazy[Any] = Lazy("openai", _make_async_openai)
+http_client: Lazy[Any] = Lazy("http", _make_http)
+catalog: Lazy[Any] = Lazy("catalog", _make_catalog)
+embeddings_service: Lazy[Any] = Lazy("embeddings", _make_embeddings)
+gpt_service: Lazy[Any] = Lazy("gpt", _make_gpt)
+tools_service: Lazy[Any] = Lazy("tools", _make_tools)
+response_cache: Lazy[Any] = Lazy("response_cache", _make_response_cache)
+tts_cache: Lazy[Any] = Lazy("tts_cache", _make_tts_cache)
+image_cache: Lazy[Any] = Lazy("image_cache", _make_image_cache)
+session_store: Lazy[Any] = Lazy("sessions", _make_session_store)
+
+# Built by warm_up(); everything else is created on first use.
+WARM_UP = (openai_client, response_cache, tools_service, gpt_service, embeddings_service)
+
+_warm_up_started: Optional[float] = None
+_warm_up_seconds: Optional[float] = None
+_reindex_error: Optional[str] = None
+
+
+async def warm_up() -> None:
+    global _warm_up_started, _warm_up_seconds, _reindex_error
+    _warm_up_started = time.perf_counter()
+    for item in WARM_UP:
+        try:
+            await item.aget()
+        except Exception:
+            pass  # already logged; reported by readiness()
+    embeddings = embeddings_service.peek()
+    if embeddings is not None and embeddings.pending_reindex:
+        try:
+            await embeddings.reindex_async()
+            _reindex_error = None
+        except Exception as e:
+            _reindex_error = f"{type(e).__name__}: {e}"
+            logger.exception("Startup re-index failed: %s", e)
+    _warm_up_seconds = round(time.perf_counter() - _warm_up_started, 3)
+
+
+def readiness() -> Dict[str, Any]:
+    services = {item.name: item.state() for item in WARM_UP}
+    # Built is not enough for embeddings: until the startup re-index ran, searches would hit
+    # an empty or stale collection.
+    embeddings = embeddings_service.peek()
+    reindex_pending = embeddings is not None and embeddings.pending_reindex
+    if embeddings is not None:
+        services[embeddings_service.name]["reindex"] = (
+            ("error" if _reindex_error else "pending") if reindex_pending else "done")
+        if reindex_pending and _reindex_error:
+            services[embeddings_service.name]["reindex_error"] = _reindex_error
+    return {
+        "ready": all(item.ready for item in WARM_UP) and not reindex_pending,
+        "warm_up_seconds": _warm_up_seconds,
+        "services": services,
+    }
+
+
+async def aclose() -> None:
+    for holder in (openai_client, http_client):
+        client = holder.peek()
+        if client is None:
+            continue
+        try:
+            result = (getattr(client, "aclose", None) or client.close)()
+            if hasattr(result, "__await__"):
+                await result
+        except Exception as e:
+            logger.warning("Error closing %s client: %s", holder.name, e)
+        holder.reset()
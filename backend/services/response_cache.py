@@ -0,0 +1,50 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+from config import RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_PATH, SHARED_CACHE_LOCAL_SIZE
+from utils.cache import make_cache
+from utils.text import fingerprint, normalize_query
+
+logger = logging.getLogger("smart_librarian.response_cache")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+
+class ResponseCache:
+    """
+    Cache of complete /chat answers. An answer depends only on the language, the intent,
+    the retrieved books and the query, so those (plus the corpus version) form the key.
+    Re-indexing changes the corpus version, which drops every cached answer.
+    """
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl_seconds: float = RESPONSE_CACHE_TTL,
+                 path: Optional[str] = RESPONSE_CACHE_PATH):
+        self._cache = make_cache(max_size, ttl_seconds, path, table="responses", local_size=SHARED_CACHE_LOCAL_SIZE)
+        self._corpus_version: Optional[str] = None
+
+    @staticmethod
+    def make_key(lang: str, intent: str, ids: Iterable[str], query: str, history: str = "") -> str:
+        """`history` identifies the conversation a follow-up answer depends on (empty otherwise)."""
+        parts = [lang, intent, ",".join(sorted(str(i) for i in ids)), normalize_query(query)]
+        if history:
+            parts.append(history)
+        return fingerprint(*parts)
+
+    def _sync_version(self, corpus_version: str) -> None:
+        if corpus_version != self._corpus_version:
+            if self._corpus_version is not None:
+                logger.info("Book corpus changed (%s -> %s); clearing response cache.",
+                            self._corpus_version, corpus_version)
+                self._cache.clear()
+            self._corpus_version = corpus_version
+
+    def get(self, key: str, corpus_version: str) -> Optional[Dict[str, str]]:
+        self._sync_version(corpus_version)
+        return self._cache.get(f"{corpus_version}:{key}")
+
+    def set(self, key: str, corpus_version: str, answer: Dict[str, str]) -> None:
+        self._sync_version(corpus_version)
+        self._cache.set(f"{corpus_version}:{key}", answer)
+
+    def stats(self) -> Dict[str, object]:
+        return self._cache.stats()
@@ -0,0 +1,125 @@
+import logging
+import re
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from config import SESSION_MAX, SESSION_MAX_TURNS, SESSION_PATH, SESSION_TTL_SECONDS
+from services.intent_service import GENRES
+from services.lexical_index import tokenize
+from utils.cache import make_cache
+from utils.text import strip_diacritics
+
+logger = logging.getLogger("smart_librarian.sessions")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+# Matched on casefolded, diacritic-free text (as in intent_service).
+_ORDINALS = [
+    (r"first|1st|primul|prima|primei|primului", 0),
+    (r"second|2nd|(al|a|cel|cea)\s+do(ilea|ua)", 1),
+    (r"third|3rd|(al|a|cel|cea)\s+tre(ilea|ia)", 2),
+    (r"last|ultimul|ultima|ultimei|ultimului", -1),
+]
+# An ordinal only counts next to what it points at: "the second one", "a doua carte",
+# "cartea a doua" - not "one about the first world war".
+_ORDINAL_NOUN = r"one|book|option|title|novel|unu|una|carte|cartea|optiune|optiunea|varianta|titlu|titlul|romanul"
+_ORDINAL_REFS = [
+    (re.compile(rf"\b({ordinal})\s+({_ORDINAL_NOUN})\b|\b({_ORDINAL_NOUN})\s+({ordinal})\b"), index)
+    for ordinal, index in _ORDINALS
+]
+_ANAPHORA = re.compile(
+    r"\b(it|this one|that one|this book|that book|these|those|them|tell me more|more about|"
+    r"cartea asta|cartea aceasta|aceasta carte|cartea aia|despre ea|despre el|despre ele|mai multe despre|"
+    r"spune-mi mai mult\w*|povesteste-mi)\b"
+)
+# Asking for *other* books is a new search even if it names one we already showed.
+_NEW_SEARCH = re.compile(
+    r"\b(similar|like|another|other|else|asemanat\w*|in genul|alta|alte|altele|altceva|ceva ca)\b"
+)
+# A pronoun next to a fresh request ("give me a thriller, I need it for a trip") is not a
+# follow-up either: the request or the genre is what the message is about.
+_NEW_REQUEST = re.compile(
+    r"\b(recommend\w*|suggest\w*|looking for|search|find me|"
+    r"(i\s+)?(want|need|would like|give me|get me)\s+(a|an|some|something|books?|novels?)|"
+    r"recoman\w*|sugere\w*|caut\w*|(vreau|da-mi|dati-mi|am nevoie de)\s+(o|un|niste|ceva|carti?|roman\w*)|"
+    r"war|history|historical|horror|crime|adventure|biograph\w*|razboi|istoric\w*|politist\w*|aventur\w*|groaza)\b"
+    rf"|{GENRES}"
+)
+_MAX_ANAPHORA_WORDS = 12
+
+
+def _title_pattern(title: str) -> Optional[re.Pattern]:
+    """Whole-word pattern for a folded title; None for titles too generic to spot ("It")."""
+    folded = strip_diacritics(title.casefold()).strip()
+    if len(folded) < 3 or not tokenize(folded):
+        return None
+    return re.compile(r"\b" + r"\s+".join(re.escape(w) for w in folded.split()) + r"\b")
+
+
+@dataclass
+class Session:
+    id: str
+    turns: List[Dict[str, str]] = field(default_factory=list)  # {"role", "content"}, oldest first
+    books: List[Dict[str, str]] = field(default_factory=list)  # last retrieval: {"id", "title", "summary"}
+
+    def add_turn(self, query: str, answer: str, max_turns: int = SESSION_MAX_TURNS) -> None:
+        self.turns.append({"role": "user", "content": query})
+        self.turns.append({"role": "assistant", "content": answer})
+        if len(self.turns) > 2 * max_turns:
+            del self.turns[: len(self.turns) - 2 * max_turns]
+
+    def referenced_books(self, query: str) -> List[Dict[str, str]]:
+        """
+        Books from the last retrieval that `query` refers back to: by title, by position
+        ("the second one", "a doua carte") or by pronoun ("tell me more about it").
+        Empty when the query asks for something new, so it goes through the normal pipeline.
+        """
+        if not self.books:
+            return []
+        text = strip_diacritics(query.casefold())
+        if _NEW_SEARCH.search(text):
+            return []
+        new_request = _NEW_REQUEST.search(text) is not None
+        if not new_request:
+            named = [b for b in self.books
+                     if (pattern := _title_pattern(b["title"])) is not None and pattern.search(text)]
+            if named:
+                return named
+        for pattern, index in _ORDINAL_REFS:
+            if pattern.search(text) and -len(self.books) <= index < len(self.books):
+                return [self.books[index]]
+        if _ANAPHORA.search(text) and not new_request and len(text.split()) <= _MAX_ANAPHORA_WORDS:
+            return list(self.books)
+        return []
+
+
+class SessionStore:
+    """
+    Conversation state per session id: recent turns and the books the last search returned.
+    LRU + sliding TTL in memory, or in SQLite when SESSION_PATH is set (survives restarts
+    and is shared by workers on the same host).
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX, ttl_seconds: float = SESSION_TTL_SECONDS,
+                 path: Optional[str] = SESSION_PATH):
+        self._cache = make_cache(max_sessions, ttl_seconds, path, table="sessions")
+        self.created = 0
+        self.resumed = 0
+
+    def get_or_create(self, session_id: Optional[str]) -> Session:
+        """The stored session, or a new one (with a fresh id) when it is unknown or expired."""
+        data = self._cache.get(session_id) if session_id else None
+        if data is None:
+            self.created += 1
+            return Session(id=uuid.uuid4().hex)
+        self.resumed += 1
+        return Session(id=data["id"], turns=list(data["turns"]), books=list(data["books"]))
+
+    def save(self, session: Session) -> None:
+        self._cache.set(session.id, asdict(session))  # also pushes the TTL back
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.update({"created": self.created, "resumed": self.resumed})
+        return stats
@@ -1,31 +1,37 @@
 # backend/services/tools_service.py (sau unde ai clasa)
-import json
-import os
-from typing import Dict, List, Union
-from config import BOOKS_FILE_JSON
+from typing import Callable, List, Optional, Union
+from services.catalog_store import Catalog, load_catalog
+from services.ingest_service import book_id
+from services.lexical_index import LexicalIndex
 
 TitleT = Union[str, List[str]]
 
 class ToolsService:
-    def __init__(self):
-        if not os.path.exists(BOOKS_FILE_JSON):
-            raise FileNotFoundError(f"JSON file not found: {BOOKS_FILE_JSON}")
-        with open(BOOKS_FILE_JSON, "r", encoding="utf-8") as f:
-            raw = json.load(f)
-        if isinstance(raw, dict):
-            self.data: Dict[str, str] = raw
-        elif isinstance(raw, list):
-            mapped: Dict[str, str] = {}
-            for item in raw:
-                if isinstance(item, dict):
-                    t = item.get("title") or item.get("name") or item.get("book") or ""
-                    s = item.get("summary") or item.get("synopsis") or item.get("desc") or ""
-                    if t and s:
-                        mapped[str(t)] = str(s)
-            self.data = mapped
-        else:
-            self.data = {}
-        self._lower_index = {self._norm_key(k).lower(): k for k in self.data.keys()}
+    def __init__(self, catalog: Optional[Catalog] = None,
+                 lexical: Optional[Callable[[], Optional[LexicalIndex]]] = None):
+        # Memory-mapped catalog (services/catalog_store.py) when built and current, else BOOKS_FILE_JSON.
+        # Either way it offers find(): exact title first, then case/quote-insensitive.
+        self.data: Catalog = load_catalog() if catalog is None else catalog
+        self._lexical = lexical  # EmbeddingsService's hybrid index, when it keeps one
+        self._index: Optional[LexicalIndex] = None
+
+    @property
+    def index(self) -> LexicalIndex:
+        """
+        The hybrid retrieval index EmbeddingsService already holds (HYBRID_SEARCH), so the
+        process keeps one copy; while it is not built yet (or failed, or hybrid search is off),
+        a title-only index built on the first fuzzy lookup.
+        Either way documents are keyed by book_id and `titles` maps them back.
+        """
+        shared = self._lexical() if self._lexical is not None else None
+        if shared is not None:
+            return shared
+        if self._index is None:
+            index = LexicalIndex()
+            for k in self.data:
+                index.add(book_id(k), self._norm_key(k))
+            self._index = index
+        return self._index
 
     @staticmethod
     def _norm_key(s: str) -> str:
@@ -43,13 +49,12 @@ class ToolsService:
         if not t:
             return DEFAULT
         t_norm = self._norm_key(t)
-        if t_norm in self.data:
-            return self.data[t_norm]
-        lower = t_norm.lower()
-        if lower in self._lower_index:
-            original_key = self._lower_index[lower]
-            return self.data[original_key]
-        for k in self.data.keys():
-            if lower in self._norm_key(k).lower() or self._norm_key(k).lower() in lower:
-                return self.data[k]
+        match = self.data.find(t_norm)
+        if match is None:
+            index = self.index
+            doc_id = index.lookup_title(t_norm)
+            found = index.titles.get(doc_id) if doc_id is not None else None
+            match = self.data.find(found) if found else None
+        if match is not None:
+            return self.data[match]
         return DEFAULT
@@ -0,0 +1,232 @@
+"""
+Retrieval backends behind EmbeddingsService.
+
+Chroma stays the source of truth (ingestion and re-indexing write there). The NumPy
+backend serves queries from a normalized snapshot of the collection that is written
+to disk once per corpus version and memory-mapped, so top-k is one matrix product
+plus argpartition, with no SQLite/HNSW work or client locking per query.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger("smart_librarian.vectors")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+
+_FP16_BLOCK = 16384
+
+
+class Hit(NamedTuple):
+    id: str
+    document: str
+    metadata: Dict[str, Any]
+    distance: float
+
+
+class VectorBackend:
+    name = "base"
+
+    def query(self, vectors: Sequence[Sequence[float]], top_k: int) -> List[List[Hit]]:
+        raise NotImplementedError
+
+    def refresh(self, corpus_version: str) -> None:
+        """Called after (re-)indexing; backends with their own copy of the data rebuild here."""
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaBackend(VectorBackend):
+    name = "chroma"
+
+    def __init__(self, collection: Any):
+        self.collection = collection
+
+    def query(self, vectors: Sequence[Sequence[float]], top_k: int) -> List[List[Hit]]:
+        res = self.collection.query(query_embeddings=[list(v) for v in vectors], n_results=top_k)
+        out: List[List[Hit]] = []
+        for q in range(len(vectors)):
+            ids = (res.get("ids") or [[]] * len(vectors))[q] or []
+            docs = (res.get("documents") or [[]] * len(vectors))[q] or []
+            metas = (res.get("metadatas") or [[]] * len(vectors))[q] or []
+            dists = (res.get("distances") or [[]] * len(vectors))[q] or []
+            out.append([
+                Hit(str(ids[i]), docs[i], (metas[i] if i < len(metas) else None) or {},
+                    float(dists[i]) if i < len(dists) else 0.0)
+                for i in range(min(len(ids), len(docs)))
+            ])
+        return out
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+class NumpyBackend(VectorBackend):
+    """
+    Snapshot layout in `path`:
+        CURRENT                 name of the live snapshot directory
+        snapshot-<id>/
+            vectors.npy         (N, D) L2-normalized, float32 or float16, loaded with mmap_mode="r"
+            meta.json           {"version", "ids", "documents", "metadatas"}
+    A build writes a new snapshot directory and then swaps CURRENT, so workers building at
+    the same time never share temp files, and a reader always gets vectors and meta from
+    the same build. Distances are cosine distances (1 - cos), matching the ordering of
+    Chroma's L2 on normalized OpenAI embeddings.
+    """
+    name = "numpy"
+    # Superseded snapshots are deleted once this old; a worker that read CURRENT just before
+    # the swap still finds its files (mapped files stay readable after deletion anyway).
+    KEEP_SECONDS = 300.0
+
+    def __init__(self, collection: Any, path: str, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported NumPy index dtype: {dtype}")
+        self.collection = collection
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.version: Optional[str] = None
+        self.matrix: np.ndarray = np.zeros((0, 0), dtype=self.dtype)
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+
+    # -------- Snapshot --------
+    @property
+    def _current_file(self) -> str:
+        return os.path.join(self.path, "CURRENT")
+
+    def _current(self) -> Optional[str]:
+        try:
+            with open(self._current_file, "r", encoding="utf-8") as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return os.path.join(self.path, name) if name else None
+
+    def _load(self) -> bool:
+        snapshot = self._current()
+        if snapshot is None:
+            return False
+        try:
+            with open(os.path.join(snapshot, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.load(os.path.join(snapshot, "vectors.npy"), mmap_mode="r")
+        except FileNotFoundError:
+            return False  # swapped and cleaned up under us; the caller rebuilds
+        if matrix.dtype != self.dtype:
+            return False
+        self.matrix = matrix
+        self.version = meta.get("version")
+        self.ids = meta.get("ids") or []
+        self.documents = meta.get("documents") or []
+        self.metadatas = meta.get("metadatas") or []
+        return True
+
+    def _publish(self, build_dir: str) -> None:
+        """Renames a finished build to a snapshot and points CURRENT at it (one atomic replace)."""
+        name = "snapshot-" + os.path.basename(build_dir)[len(".build-"):]
+        os.rename(build_dir, os.path.join(self.path, name))
+        fd, tmp = tempfile.mkstemp(prefix=".CURRENT-", dir=self.path)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(name)
+            os.replace(tmp, self._current_file)
+        except BaseException:
+            os.remove(tmp)
+            raise
+
+    def _cleanup(self) -> None:
+        current = self._current()
+        cutoff = time.time() - self.KEEP_SECONDS
+        for entry in os.scandir(self.path):
+            stale = entry.name.startswith(("snapshot-", ".build-")) and entry.path != current
+            try:
+                if stale and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except FileNotFoundError:
+                continue  # another worker got there first
+
+    def build(self, corpus_version: str) -> None:
+        got = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = got.get("embeddings")
+        matrix = np.asarray(embeddings if embeddings is not None else [], dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(0, 0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True) if matrix.size else np.ones((0, 1), np.float32)
+        matrix = (matrix / np.maximum(norms, 1e-12)).astype(self.dtype)
+
+        os.makedirs(self.path, exist_ok=True)
+        build_dir = tempfile.mkdtemp(prefix=".build-", dir=self.path)
+        try:
+            np.save(os.path.join(build_dir, "vectors.npy"), matrix)
+            with open(os.path.join(build_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"version": corpus_version, "ids": got.get("ids") or [],
+                           "documents": got.get("documents") or [], "metadatas": got.get("metadatas") or []},
+                          f, ensure_ascii=False)
+            self._publish(build_dir)
+        except BaseException:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise
+        logger.info("NumPy index built: %d x %d %s (version %s).",
+                    matrix.shape[0], matrix.shape[1] if matrix.ndim == 2 else 0, self.dtype, corpus_version)
+        self._load()
+        self._cleanup()
+
+    def refresh(self, corpus_version: str) -> None:
+        if self.version == corpus_version:
+            return
+        if self._load() and self.version == corpus_version:
+            logger.info("NumPy index loaded from %s (%d documents).", self.path, len(self.ids))
+            return
+        self.build(corpus_version)
+
+    # -------- Queries --------
+    def _scores(self, q: np.ndarray) -> np.ndarray:
+        """(Q, N) cosine similarities. float16 storage is upcast block-wise: NumPy has no fp16 BLAS."""
+        if self.matrix.dtype == np.float32:
+            return q @ self.matrix.T
+        n = self.matrix.shape[0]
+        scores = np.empty((q.shape[0], n), dtype=np.float32)
+        for start in range(0, n, _FP16_BLOCK):
+            block = np.asarray(self.matrix[start:start + _FP16_BLOCK], dtype=np.float32)
+            scores[:, start:start + _FP16_BLOCK] = q @ block.T
+        return scores
+
+    def query(self, vectors: Sequence[Sequence[float]], top_k: int) -> List[List[Hit]]:
+        n = self.matrix.shape[0]
+        if not n or not len(vectors):
+            return [[] for _ in vectors]
+        q = np.asarray(vectors, dtype=np.float32)
+        q /= np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        scores = self._scores(q)
+        k = min(top_k, n)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k < n else np.tile(np.arange(n), (len(q), 1))
+        out: List[List[Hit]] = []
+        for row, candidates in enumerate(top):
+            ranked = candidates[np.argsort(-scores[row, candidates])]
+            out.append([
+                Hit(self.ids[i], self.documents[i], self.metadatas[i] or {}, float(1.0 - scores[row, i]))
+                for i in ranked.tolist()
+            ])
+        return out
+
+    def count(self) -> int:
+        return int(self.matrix.shape[0])
+
+
+def make_backend(kind: str, collection: Any, path: str, dtype: str = "float32") -> VectorBackend:
+    if kind == "numpy":
+        return NumpyBackend(collection, path, dtype)
+    if kind == "chroma":
+        return ChromaBackend(collection)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {kind}")
@@ -0,0 +1,115 @@
+# backend/utils/audio_split.py
+"""
+Split a long WAV recording at pauses, so the pieces can be transcribed concurrently.
+
+Only WAV (stdlib `wave`) is supported; compressed uploads (webm/mp3) would need a decoder
+such as ffmpeg, and are transcribed in one piece. Both passes stream the file in blocks,
+so memory stays flat whatever the recording length:
+
+    1. RMS per 20 ms window -> runs of at least 0.3 s below the silence threshold;
+    2. cut near every `target_seconds`, at the pause closest to it (hard cut if there is none),
+       and copy each piece into its own WAV file.
+"""
+from __future__ import annotations
+
+import os
+import wave
+from typing import BinaryIO, List, Union
+
+import numpy as np
+
+WINDOW_SECONDS = 0.02
+MIN_SILENCE_SECONDS = 0.3
+SILENCE_FLOOR = 0.01          # ~ -40 dBFS
+SILENCE_RELATIVE = 0.15       # or this fraction of the median window loudness, if louder
+_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+_BLOCK_FRAMES = 1 << 16
+
+
+def _window_rms(w: wave.Wave_read) -> np.ndarray:
+    width = w.getsampwidth()
+    dtype = _DTYPES[width]
+    channels = w.getnchannels()
+    window = max(1, int(w.getframerate() * WINDOW_SECONDS))
+    full_scale = float(1 << (8 * width - 1))
+    rms: List[float] = []
+    carry = np.empty(0, dtype=np.float32)
+    while True:
+        raw = w.readframes(_BLOCK_FRAMES)
+        if not raw:
+            break
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32)
+        if width == 1:
+            samples -= 128.0  # 8-bit WAV is unsigned
+        samples = np.concatenate([carry, samples / full_scale])
+        per_window = window * channels
+        usable = len(samples) // per_window * per_window
+        if usable:
+            blocks = samples[:usable].reshape(-1, per_window)
+            rms.extend(np.sqrt(np.mean(blocks * blocks, axis=1)).tolist())
+        carry = samples[usable:]
+    return np.asarray(rms, dtype=np.float32)
+
+
+def _pauses(rms: np.ndarray, window_frames: int) -> List[int]:
+    """Frame index of the middle of every long-enough silent run."""
+    if not len(rms):
+        return []
+    threshold = max(SILENCE_FLOOR, SILENCE_RELATIVE * float(np.median(rms)))
+    min_windows = max(1, int(MIN_SILENCE_SECONDS / WINDOW_SECONDS))
+    pauses, start = [], None
+    for i, quiet in enumerate(np.append(rms < threshold, False)):
+        if quiet and start is None:
+            start = i
+        elif not quiet and start is not None:
+            if i - start >= min_windows:
+                pauses.append((start + i) // 2 * window_frames)
+            start = None
+    return pauses
+
+
+def cut_points(total_frames: int, pauses: List[int], target_frames: int) -> List[int]:
+    cuts, pos = [], 0
+    while total_frames - pos > target_frames * 1.5:
+        ideal = pos + target_frames
+        near = [p for p in pauses if pos + target_frames // 2 <= p <= pos + target_frames * 3 // 2]
+        cut = min(near, key=lambda p: abs(p - ideal)) if near else ideal
+        cuts.append(cut)
+        pos = cut
+    return cuts
+
+
+def split_on_silence(source: Union[str, BinaryIO], target_seconds: float, out_dir: str) -> List[str]:
+    """
+    Paths of the pieces, written to `out_dir`. Empty when `source` should be sent whole:
+    short enough already, or not a PCM WAV.
+    """
+    try:
+        with wave.open(source, "rb") as w:
+            if w.getsampwidth() not in _DTYPES or w.getcomptype() != "NONE":
+                return []
+            rate = w.getframerate()
+            total = w.getnframes()
+            target = int(target_seconds * rate)
+            if target <= 0 or total <= target * 1.5:
+                return []
+            pauses = _pauses(_window_rms(w), max(1, int(rate * WINDOW_SECONDS)))
+            params = w.getparams()
+            bounds = [0, *cut_points(total, pauses, target), total]
+            pieces = []
+            w.rewind()
+            for n, (start, end) in enumerate(zip(bounds, bounds[1:])):
+                piece = os.path.join(out_dir, f"piece-{n:03d}.wav")
+                with wave.open(piece, "wb") as out:
+                    out.setparams(params)
+                    left = end - start
+                    while left > 0:
+                        frames = w.readframes(min(left, _BLOCK_FRAMES))
+                        if not frames:
+                            break
+                        out.writeframes(frames)
+                        left -= min(left, _BLOCK_FRAMES)
+                pieces.append(piece)
+            return pieces
+    except (wave.Error, EOFError):
+        return []  # not a WAV after all
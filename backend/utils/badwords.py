@@ -1,55 +1,296 @@
 # backend/utils/badwords.py
+"""
+Profanity filter. One Aho-Corasick pass over the query finds terms from every language
+list at once and returns their spans, which drive both the block decision and the masking.
+
+Lists live in BADWORDS_DIR as `<lang>.txt`: one term per line, `#` starts a comment.
+Terms are matched on casefolded, diacritic-free text with common leetspeak undone, so
+"pulă", "pula" and "pul4" are the same term. `*` stands for word characters:
+"fuck*" also matches "fucking", "*fuck*" matches inside words, "m*ist" is checked
+against the whole word. Edited files are picked up without a restart (checked at most
+every BADWORDS_RELOAD_SECONDS).
+"""
+from __future__ import annotations
+
+import logging
+import os
 import re
-from typing import Dict, Optional, Literal
+import threading
+import time
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from config import BADWORDS_DIR, BADWORDS_RELOAD_SECONDS
+from utils.text import strip_diacritics
+
+logger = logging.getLogger("smart_librarian.badwords")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(name)s:%(message)s")
+
+# Used when BADWORDS_DIR holds no lists, so a checkout without data/ is still filtered.
+DEFAULT_LISTS: Dict[str, List[str]] = {
+    "ro": ["dracu", "naiba", "pula", "pizd*", "fut", "futu", "futut*", "mă-ta", "mă-sa"],
+    "en": ["fuck*", "*fucker*", "shit*", "bitch", "asshole", "dickhead", "bastard"],
+}
+
+# Leetspeak undone only next to a letter, so "1984" and "shit!" keep their digits and "!".
+_LEET = {"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "@": "a", "$": "s", "!": "i"}
+_FOLD: Dict[str, str] = {}
+
+
+def _fold_char(ch: str) -> str:
+    folded = _FOLD.get(ch)
+    if folded is None:
+        folded = (strip_diacritics(ch.casefold()) or ch)[0]
+        if len(_FOLD) < 4096:
+            _FOLD[ch] = folded
+    return folded
+
+
+def fold(text: str) -> str:
+    """Casefold, drop diacritics and undo leetspeak, one output char per input char (spans carry over)."""
+    out = []
+    n = len(text)
+    for i, ch in enumerate(text):
+        leet = _LEET.get(ch)
+        if leet is not None:
+            before = i > 0 and text[i - 1].isalpha()
+            after = i + 1 < n and text[i + 1].isalpha()
+            if (before and after) if ch == "!" else (before or after):
+                out.append(leet)
+                continue
+        out.append(_fold_char(ch))
+    return "".join(out)
+
+
+@dataclass(frozen=True)
+class _Term:
+    term: str                       # as written in the list
+    lang: str
+    keyword: str                    # literal the automaton looks for
+    open_start: bool                # leading '*': may start inside a word
+    open_end: bool                  # trailing '*': may end inside a word
+    word_re: Optional[re.Pattern]   # inner '*': the whole word must match this
+
+    @classmethod
+    def parse(cls, term: str, lang: str) -> Optional["_Term"]:
+        folded = fold(term.strip())
+        core = folded.strip("*")
+        if not core:
+            return None
+        word_re = None
+        keyword = core
+        if "*" in core:
+            pieces = [p for p in core.split("*") if p]
+            keyword = max(pieces, key=len)
+            body = r"\w*".join(re.escape(p) for p in core.split("*"))
+            word_re = re.compile((r"\w*" if folded.startswith("*") else "") + body +
+                                 (r"\w*" if folded.endswith("*") else ""))
+        return cls(term.strip(), lang, keyword, folded.startswith("*"), folded.endswith("*"), word_re)
+
+
+@dataclass(frozen=True)
+class BadWordMatch:
+    start: int
+    end: int
+    term: str
+    lang: str
+
+
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class _Automaton:
+    """Aho-Corasick over the folded keywords of all terms (goto dicts, failure links, merged outputs)."""
+
+    def __init__(self, terms: List[_Term]):
+        self.terms = terms
+        goto: List[Dict[str, int]] = [{}]
+        out: List[List[int]] = [[]]
+        for idx, term in enumerate(terms):
+            node = 0
+            for ch in term.keyword:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                node = nxt
+            out[node].append(idx)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt].extend(out[fail[nxt]])
+        self.goto = goto
+        self.fail = fail
+        self.out: List[Tuple[int, ...]] = [tuple(o) for o in out]
+
+    def _span(self, folded: str, term: _Term, start: int, end: int) -> Optional[Tuple[int, int]]:
+        n = len(folded)
+        word_start, word_end = start, end
+        while word_start > 0 and _is_word(folded[word_start - 1]):
+            word_start -= 1
+        while word_end < n and _is_word(folded[word_end]):
+            word_end += 1
+        if term.word_re is not None:
+            return (word_start, word_end) if term.word_re.fullmatch(folded, word_start, word_end) else None
+        if not term.open_start and word_start != start:
+            return None
+        if not term.open_end and word_end != end:
+            return None
+        return word_start, word_end
+
+    def scan(self, folded: str) -> List[BadWordMatch]:
+        goto, fail, out, terms = self.goto, self.fail, self.out, self.terms
+        hits: List[BadWordMatch] = []
+        node = 0
+        for i, ch in enumerate(folded):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                term = terms[idx]
+                span = self._span(folded, term, i + 1 - len(term.keyword), i + 1)
+                if span:
+                    hits.append(BadWordMatch(span[0], span[1], term.term, term.lang))
+        if len(hits) < 2:
+            return hits
+        # Leftmost-longest, non-overlapping.
+        hits.sort(key=lambda m: (m.start, -m.end))
+        kept = [hits[0]]
+        for m in hits[1:]:
+            if m.start >= kept[-1].end:
+                kept.append(m)
+        return kept
+
+
+def read_list(path: str) -> List[str]:
+    terms = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            term = line.split("#", 1)[0].strip()
+            if term:
+                terms.append(term)
+    return terms
 
-Lang = Literal["ro", "en"]
 
 class BadWordsLoader:
     """
-    Simple bad words loader that keeps regex patterns in memory.
-    Does NOT load from files anymore.
-    Supports wildcard '*' transformed into \w*.
+    Loads every `<lang>.txt` list from `directory` into one automaton and reloads it when a
+    file is added, removed or modified. Matching is language-agnostic: a Romanian term in an
+    otherwise English query is still found.
     """
 
-    def __init__(self):
-        # --- Hardcoded bad words lists (extend as needed) ---
-        bad_words_ro = [
-            "dracu", "naiba", "p*la", "fut*", "m*sa", "m*ta"
-        ]
-        bad_words_en = [
-            "fuck*", "shit*", "bitch", "asshole", "dick", "bastard"
-        ]
+    def __init__(self, directory: str = BADWORDS_DIR, reload_seconds: float = BADWORDS_RELOAD_SECONDS,
+                 lists: Optional[Dict[str, List[str]]] = None):
+        self.directory = directory
+        self.reload_seconds = reload_seconds
+        self._reload_lock = threading.Lock()
+        self._signature: Optional[Tuple] = None
+        self._checked_at = time.monotonic()
+        self._automaton = _Automaton([])
+        self._counts: Dict[str, int] = {}
+        self.reloads = 0
+        if lists is not None:  # fixed lists (benchmarks); nothing to watch on disk
+            self.reload_seconds = 0
+            self.load_lists(lists)
+        else:
+            self.reload(force=True)
 
-        self._patterns: Dict[Lang, Optional[re.Pattern]] = {
-            "ro": self._compile(bad_words_ro),
-            "en": self._compile(bad_words_en),
-        }
+    # -------- Loading --------
+    def _files(self) -> Dict[str, str]:
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            return {}
+        return {name[:-4]: os.path.join(self.directory, name) for name in names if name.endswith(".txt")}
 
     @staticmethod
-    def _compile(words: list[str]) -> Optional[re.Pattern]:
-        cleaned = []
-        for w in words:
-            if not w.strip():
+    def _signature_of(files: Dict[str, str]) -> Tuple:
+        sig = []
+        for lang, path in files.items():
+            try:
+                st = os.stat(path)
+                sig.append((lang, st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
                 continue
-            # support wildcard '*'
-            w = re.escape(w).replace(r"\*", r"\w*")
-            cleaned.append(rf"\b{w}\b")
-        if not cleaned:
-            return None
-        return re.compile("|".join(cleaned), flags=re.IGNORECASE | re.UNICODE)
-
-    def contains(self, text: str, lang: Lang) -> bool:
-        pat = self._patterns.get(lang)
-        return bool(pat and pat.search(text))
-
-    def mask(self, text: str, lang: Lang) -> str:
-        pat = self._patterns.get(lang)
-        if not pat:
-            return text
-        def _mask(m: re.Match) -> str:
-            s = m.group(0)
-            return s[0] + "…"
-        return pat.sub(_mask, text)
+        return tuple(sig)
+
+    def load_lists(self, lists: Dict[str, List[str]]) -> None:
+        """Swap in a new automaton built from {lang: terms}."""
+        terms = [t for lang, words in lists.items() for w in words if (t := _Term.parse(w, lang))]
+        self._automaton = _Automaton(terms)  # single reference swap; scans in flight keep the old one
+        self._counts = {lang: len(words) for lang, words in lists.items()}
+
+    def reload(self, force: bool = False) -> bool:
+        """Rebuild from disk if the lists changed (or `force`); returns whether it rebuilt."""
+        files = self._files()
+        signature = self._signature_of(files)
+        if not force and signature == self._signature:
+            return False
+        try:
+            lists = {lang: read_list(path) for lang, path in files.items()}
+        except OSError as e:
+            logger.error("Could not read bad-word lists from %s, keeping the current ones: %s", self.directory, e)
+            return False
+        if not lists:
+            logger.warning("No bad-word lists in %s; using the built-in defaults.", self.directory)
+            lists = DEFAULT_LISTS
+        started = time.perf_counter()
+        self.load_lists(lists)
+        self._signature = signature
+        self.reloads += 1
+        logger.info("Loaded bad-word lists %s in %.1f ms.", self._counts, (time.perf_counter() - started) * 1000.0)
+        return True
+
+    def _maybe_reload(self) -> None:
+        if self.reload_seconds <= 0 or time.monotonic() - self._checked_at < self.reload_seconds:
+            return
+        if not self._reload_lock.acquire(blocking=False):
+            return  # another request is already checking
+        try:
+            self._checked_at = time.monotonic()
+            self.reload()
+        finally:
+            self._reload_lock.release()
+
+    # -------- Matching --------
+    def find(self, text: str) -> List[BadWordMatch]:
+        """All matches in one pass, leftmost-longest; spans index the NFC form of `text`."""
+        self._maybe_reload()
+        return self._automaton.scan(fold(unicodedata.normalize("NFC", text or "")))
+
+    def contains(self, text: str) -> bool:
+        return bool(self.find(text))
+
+    def mask(self, text: str, matches: Optional[List[BadWordMatch]] = None) -> str:
+        """Keep the first letter of each match and replace the rest with '…'."""
+        text = unicodedata.normalize("NFC", text or "")
+        if matches is None:
+            matches = self.find(text)
+        parts, last = [], 0
+        for m in matches:
+            parts.append(text[last:m.start])
+            parts.append(text[m.start] + "…")
+            last = m.end
+        parts.append(text[last:])
+        return "".join(parts)
+
+    def stats(self) -> Dict[str, object]:
+        return {"terms": dict(self._counts), "keywords": len(self._automaton.terms),
+                "states": len(self._automaton.goto), "reloads": self.reloads}
 
 
 # Global instance
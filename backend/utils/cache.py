@@ -0,0 +1,261 @@
+# backend/utils/cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+
+class Cache:
+    """
+    What services program against: get/set/clear, len() and stats(). get() returns None
+    on a miss, so None itself can't be cached. Implementations below: TTLCache (one
+    process), SqliteCache (one file shared by every worker on the host), TieredCache
+    (the first in front of the second).
+    """
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+class TTLCache(Cache):
+    """
+    Bounded in-process cache with LRU eviction and a per-entry TTL.
+    Thread-safe (sync services run in the threadpool); keeps hit/miss counters.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (self.ttl_seconds and item[0] < now):
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: Any) -> None:
+        expires = time.monotonic() + self.ttl_seconds if self.ttl_seconds else float("inf")
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def sqlite_connect(path: str) -> sqlite3.Connection:
+    """A connection that other processes can share the file with (WAL, 10s busy timeout)."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+@contextmanager
+def write_transaction(conn: sqlite3.Connection) -> Iterator[None]:
+    """One transaction that takes the database write lock up front, so it can't fail half-way on a busy file."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+# Value encodings for SqliteCache: (encode, decode).
+def _encode_vector(value: Any) -> bytes:
+    return array("f", value).tobytes()
+
+
+def _decode_vector(blob: bytes) -> list:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+CODECS: Dict[str, Tuple[Callable[[Any], Any], Callable[[Any], Any]]] = {
+    "json": (lambda v: json.dumps(v, ensure_ascii=False, separators=(",", ":")), json.loads),
+    "vector": (_encode_vector, _decode_vector),  # lists of floats as float32: ~5x smaller than JSON
+}
+
+
+class SqliteCache(TTLCache):
+    """
+    Same contract as TTLCache, persisted to a SQLite file so restarts don't start cold.
+
+    Safe to share between processes: in WAL mode readers never block the writer, and every
+    write (upsert + eviction) is one IMMEDIATE transaction, so no worker sees it half done.
+    LRU order is a last-access column, refreshed at most every `touch_after` seconds per
+    entry so that hits rarely need the write lock. Hit/miss counters are per process.
+    """
+
+    touch_after = 30.0
+
+    def __init__(self, path: str, max_size: int = 1024, ttl_seconds: float = 3600.0, table: str = "cache",
+                 codec: str = "json"):
+        super().__init__(max_size=max_size, ttl_seconds=ttl_seconds)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name: {table}")
+        self._encode, self._decode = CODECS[codec]
+        self.path = path
+        self.table = table
+        self.codec = codec
+        self._conn = sqlite_connect(path)
+        with write_transaction(self._conn):
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed)")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires, accessed FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                if row is not None:
+                    self._conn.execute(f"DELETE FROM {self.table} WHERE key = ? AND expires < ?", (key, now))
+                self.misses += 1
+                return None
+            if now - row[2] > self.touch_after:
+                self._conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return self._decode(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        expires = now + self.ttl_seconds if self.ttl_seconds else float("inf")
+        payload = self._encode(value)
+        with self._lock, write_transaction(self._conn):
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, expires, now),
+            )
+            excess = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0] - self.max_size
+            if excess > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY accessed ASC LIMIT ?)",
+                    (excess,),
+                )
+                self.evictions += excess
+
+    def clear(self) -> None:
+        with self._lock, write_transaction(self._conn):
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        stats = super().stats()
+        stats["backend"] = "sqlite"
+        stats["size"] = len(self)
+        return stats
+
+
+class TieredCache(Cache):
+    """
+    A small per-worker TTLCache in front of a SqliteCache shared by all workers on the host:
+    hot keys are served from process memory, and whatever one worker computes is a hit for
+    the others. Only for values that never change under their key (query embeddings,
+    answers keyed on everything they depend on); clear() can't reach other workers' local
+    tiers, which keep their copies until the local TTL runs out.
+    """
+
+    def __init__(self, local: TTLCache, shared: SqliteCache):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self.shared.set(key, value)
+        self.local.set(key, value)
+
+    def clear(self) -> None:
+        self.shared.clear()
+        self.local.clear()
+
+    def __len__(self) -> int:
+        return len(self.shared)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.shared.stats()
+        hits = self.local.hits + self.shared.hits
+        total = hits + self.shared.misses
+        stats.update({"backend": "tiered", "hits": hits,
+                      "hit_rate": round(hits / total, 4) if total else 0.0, "local": self.local.stats()})
+        return stats
+
+
+def make_cache(max_size: int, ttl_seconds: float, path: Optional[str] = None, table: str = "cache",
+               codec: str = "json", local_size: int = 0) -> Cache:
+    """
+    In-process cache by default; on-disk SQLite when a path is configured, with a
+    `local_size`-entry in-process tier in front of it when that is > 0.
+    """
+    if not path:
+        return TTLCache(max_size=max_size, ttl_seconds=ttl_seconds)
+    shared = SqliteCache(path, max_size=max_size, ttl_seconds=ttl_seconds, table=table, codec=codec)
+    if local_size > 0:
+        return TieredCache(TTLCache(max_size=min(local_size, max_size), ttl_seconds=ttl_seconds), shared)
+    return shared
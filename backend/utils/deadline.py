@@ -0,0 +1,109 @@
+# backend/utils/deadline.py
+"""
+Per-request deadline budget.
+
+The route opens a scope (`with deadline_scope(12.0): ...`) and every stage below it asks
+for what is left instead of using its own fixed timeout:
+
+    resp = await within("intent", client.chat.completions.create(..., timeout=budget(2.0)))
+
+The deadline lives in a ContextVar, so it follows the request into tasks created with
+asyncio.create_task and into run_in_threadpool without being passed around.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, Optional, TypeVar
+
+from utils.metrics import metrics
+
+T = TypeVar("T")
+
+DEADLINE_EXCEEDED = metrics.counter(
+    "smart_librarian_deadline_exceeded_total", "Stages cut short because the request budget ran out.", ["stage"])
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    retryable = False  # no point retrying: there is no budget left
+
+    def __init__(self, stage: str):
+        super().__init__(f"Deadline exceeded during {stage}")
+        self.stage = stage
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+
+_current: "contextvars.ContextVar[Optional[Deadline]]" = contextvars.ContextVar("deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """Set a budget for the enclosed work; a nested scope can only tighten it. None/0 = no deadline."""
+    outer = _current.get()
+    if not seconds or seconds <= 0:
+        yield outer
+        return
+    deadline = Deadline(seconds)
+    if outer is not None and outer.at < deadline.at:
+        deadline = outer
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # closed from another context (e.g. an abandoned streaming generator)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def budget(cap: Optional[float] = None) -> Optional[float]:
+    """Seconds this stage may use: what is left of the request budget, capped by the stage's own limit."""
+    deadline = _current.get()
+    if deadline is None:
+        return cap
+    left = deadline.remaining()
+    return left if cap is None else min(cap, left)
+
+
+def check(stage: str) -> None:
+    """Raise DeadlineExceeded (and count it) if the budget is already spent."""
+    deadline = _current.get()
+    if deadline is not None and deadline.expired():
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+async def within(stage: str, aw: Awaitable[T], cap: Optional[float] = None) -> T:
+    """Await `aw` for at most budget(cap) seconds; raises DeadlineExceeded on expiry."""
+    timeout = budget(cap)
+    if timeout is None:
+        return await aw
+    if timeout <= 0:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+    try:
+        return await asyncio.wait_for(aw, timeout)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, DeadlineExceeded):
+            raise
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage) from None
@@ -0,0 +1,293 @@
+# backend/utils/disk_cache.py
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from utils.cache import sqlite_connect, write_transaction
+
+logger = logging.getLogger("smart_librarian.disk_cache")
+
+
+class FileIndex:
+    """
+    Which entries a DiskCache holds, their sizes and LRU order; in this process's memory.
+    Each worker keeps its own, rebuilt from the directory at startup: files other workers
+    add later are adopted on first lookup, but the size cap is enforced per process.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # filename -> size, LRU order
+        self._size = 0
+
+    def load(self, found: List[Tuple[float, str, int]]) -> None:
+        """(mtime, filename, size) of what is on disk, as scanned at startup."""
+        with self._lock:
+            for _, name, size in sorted(found):
+                self._size += size - self._entries.pop(name, 0)
+                self._entries[name] = size
+
+    def adopt(self, name: str, size: int) -> None:
+        """An entry found on disk but missing from the index (written by another process)."""
+        with self._lock:
+            self._size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+
+    def touch(self, name: str) -> bool:
+        with self._lock:
+            if name not in self._entries:
+                return False
+            self._entries.move_to_end(name)
+            return True
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._size -= self._entries.pop(name, 0)
+
+    def add(self, name: str, size: int, max_bytes: int) -> List[str]:
+        """Records `name`; returns the least recently used entries to delete to get under `max_bytes`."""
+        with self._lock:
+            self._size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            victims = []
+            while self._size > max_bytes and len(self._entries) > 1:
+                victim, victim_size = self._entries.popitem(last=False)
+                self._size -= victim_size
+                victims.append(victim)
+            return victims
+
+    def totals(self) -> Tuple[int, int]:
+        """(entries, bytes)"""
+        with self._lock:
+            return len(self._entries), self._size
+
+
+class SqliteFileIndex(FileIndex):
+    """
+    The same index in a SQLite table shared by every worker on the host (see
+    utils/cache.SqliteCache): one LRU order and one size cap for all of them.
+    """
+
+    touch_after = 30.0
+
+    def __init__(self, path: str, table: str):
+        if not table.isidentifier():
+            raise ValueError(f"Invalid index table name: {table}")
+        self._lock = threading.Lock()
+        self.table = table
+        self._conn = sqlite_connect(path)
+        with write_transaction(self._conn):
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ("
+                               "name TEXT PRIMARY KEY, size INTEGER NOT NULL, accessed REAL NOT NULL)")
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table}(accessed)")
+
+    def load(self, found: List[Tuple[float, str, int]]) -> None:
+        """Reconciles the shared table with the directory: adds new files, drops vanished ones."""
+        on_disk = {name for _, name, _ in found}
+        with self._lock, write_transaction(self._conn):
+            known = {row[0] for row in self._conn.execute(f"SELECT name FROM {self.table}")}
+            self._conn.executemany(f"DELETE FROM {self.table} WHERE name = ?", [(n,) for n in known - on_disk])
+            self._conn.executemany(f"INSERT OR IGNORE INTO {self.table} (name, size, accessed) VALUES (?, ?, ?)",
+                                   [(name, size, mtime) for mtime, name, size in found if name not in known])
+
+    def adopt(self, name: str, size: int) -> None:
+        with self._lock:
+            self._conn.execute(f"INSERT OR IGNORE INTO {self.table} (name, size, accessed) VALUES (?, ?, ?)",
+                               (name, size, time.time()))
+
+    def touch(self, name: str) -> bool:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(f"SELECT accessed FROM {self.table} WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return False
+            if now - row[0] > self.touch_after:
+                self._conn.execute(f"UPDATE {self.table} SET accessed = ? WHERE name = ?", (now, name))
+            return True
+
+    def discard(self, name: str) -> None:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE name = ?", (name,))
+
+    def add(self, name: str, size: int, max_bytes: int) -> List[str]:
+        with self._lock, write_transaction(self._conn):
+            self._conn.execute(f"INSERT OR REPLACE INTO {self.table} (name, size, accessed) VALUES (?, ?, ?)",
+                               (name, size, time.time()))
+            total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+            victims = []
+            if total > max_bytes:
+                for victim, victim_size in self._conn.execute(
+                        f"SELECT name, size FROM {self.table} WHERE name != ? ORDER BY accessed ASC", (name,)):
+                    if total <= max_bytes:
+                        break
+                    victims.append(victim)
+                    total -= victim_size
+                self._conn.executemany(f"DELETE FROM {self.table} WHERE name = ?", [(v,) for v in victims])
+            return victims
+
+    def totals(self) -> Tuple[int, int]:
+        with self._lock:
+            count, size = self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+        return count, size
+
+
+class DiskCache:
+    """
+    Content-addressed file cache with a total size cap and LRU eviction.
+
+    Entries are plain files named <sha256 key>.<ext>, so hits can be served straight from
+    disk (FileResponse: Range requests, sendfile/pathsend where the server supports it).
+    Writers stream into a temp file in the same directory and commit with os.replace,
+    so readers never see a partial entry. The index of entries lives in process memory,
+    or in a SQLite table shared by all workers when `index_path` is given.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, index_path: Optional[str] = None, index_table: str = "files"):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._index = SqliteFileIndex(index_path, index_table) if index_path else FileIndex()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        h = hashlib.sha256()
+        for p in parts:
+            h.update(p.encode("utf-8"))
+            h.update(b"\x1f")
+        return h.hexdigest()
+
+    def _scan(self) -> None:
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path):
+                continue
+            st = os.stat(path)
+            if name.startswith(".tmp-"):
+                # Left behind by a crashed writer; young ones may belong to another worker.
+                if time.time() - st.st_mtime > 3600:
+                    os.remove(path)
+                continue
+            found.append((st.st_mtime, name, st.st_size))
+        self._index.load(found)
+
+    def path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def get(self, key: str, ext: str) -> Optional[str]:
+        name = f"{key}.{ext}"
+        path = os.path.join(self.directory, name)
+        if not self._index.touch(name):
+            try:
+                size = os.path.getsize(path)  # committed by another worker since we scanned
+            except OSError:
+                self.misses += 1
+                return None
+            self._index.adopt(name, size)
+        try:
+            os.utime(path)  # keeps LRU order across restarts
+        except FileNotFoundError:
+            self._index.discard(name)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    @staticmethod
+    def etag(path: str) -> str:
+        """Validator for a cached file: stable across hits, new when the entry is rewritten."""
+        st = os.stat(path)
+        key = os.path.basename(path).split(".", 1)[0]
+        return f'"{key[:16]}-{st.st_ino:x}-{st.st_size:x}"'
+
+    def open_writer(self, key: str, ext: str) -> "CacheWriter":
+        return CacheWriter(self, f"{key}.{ext}")
+
+    def _commit(self, name: str, tmp_path: str) -> None:
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        victims = self._index.add(name, size, self.max_bytes)
+        self.evictions += len(victims)
+        for victim in victims:
+            try:
+                os.remove(os.path.join(self.directory, victim))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, object]:
+        total = self.hits + self.misses
+        entries, size = self._index.totals()
+        return {
+            "index": "sqlite" if isinstance(self._index, SqliteFileIndex) else "memory",
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class CacheWriter:
+    """Temp file that becomes a cache entry on commit() and disappears on abort()."""
+
+    def __init__(self, cache: DiskCache, name: str):
+        self._cache = cache
+        self._name = name
+        fd, self._tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=cache.directory)
+        self._file = os.fdopen(fd, "wb")
+        self._done = False
+        self.started = time.monotonic()
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        self._cache._commit(self._name, self._tmp_path)
+
+    def abort(self) -> None:
+        if self._done:
+            return
+        self._done = True
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+async def tee_to_cache(chunks: AsyncIterator[bytes], writer: Optional[CacheWriter]) -> AsyncIterator[bytes]:
+    """Stream upstream bytes to the client and, in the same pass, into the cache writer.
+
+    The entry is committed only after the upstream stream ends cleanly; an upstream error
+    or a client disconnect (GeneratorExit/CancelledError) discards the partial file.
+    """
+    try:
+        async for chunk in chunks:
+            if writer is not None:
+                try:
+                    writer.write(chunk)
+                except OSError as e:  # disk full etc. must not break the response
+                    logger.warning("Cache write failed: %s", e)
+                    writer.abort()
+                    writer = None
+            yield chunk
+        if writer is not None:
+            writer.commit()
+    finally:
+        if writer is not None:
+            writer.abort()  # no-op after commit
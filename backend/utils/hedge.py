@@ -0,0 +1,127 @@
+# backend/utils/hedge.py
+"""
+Hedged requests: if the first attempt has not answered within the hedge delay (by default
+the observed p95), start a second identical attempt and take whichever succeeds first.
+
+Hedges are capped at `max_ratio` of calls so a slow upstream does not get double traffic,
+and the loser is cancelled as soon as a winner is known.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, TypeVar
+
+from utils.metrics import metrics
+
+T = TypeVar("T")
+
+HEDGES = metrics.counter(
+    "smart_librarian_hedges_total", "Hedged upstream attempts (fired, and which attempt won).", ["operation", "outcome"])
+
+
+class LatencyWindow:
+    """Rolling window of recent latencies, for an adaptive p95 hedge delay."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+
+    def add(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class Hedger:
+    def __init__(self, operation: str, enabled: bool, after_seconds: float = 0.0, max_ratio: float = 0.1,
+                 percentile: float = 95.0):
+        self.operation = operation
+        self.enabled = enabled
+        self.after_seconds = after_seconds  # fixed delay; 0 = adaptive (observed percentile)
+        self.max_ratio = max_ratio
+        self.pct = percentile
+        self.latencies = LatencyWindow()
+        self.calls = 0
+        self.hedged = 0
+        self.wins = 0
+
+    def delay(self) -> Optional[float]:
+        """Hedge delay for the next call, or None when hedging is off / not yet calibrated / over budget."""
+        if not self.enabled:
+            return None
+        if self.hedged + 1 > self.max_ratio * max(1, self.calls):
+            return None
+        if self.after_seconds > 0:
+            return self.after_seconds
+        return self.latencies.percentile(self.pct)
+
+    async def run(self, fn: Callable[[], Awaitable[T]], discard: Optional[Callable[[T], Awaitable[Any]]] = None,
+                  can_hedge: Callable[[], bool] = lambda: True) -> T:
+        """fn() once, plus a second fn() if the first is slower than delay(). `discard` cleans up a
+        result that finished but lost (e.g. closes an open stream)."""
+        self.calls += 1
+        started = time.monotonic()
+        delay = self.delay()
+        first = asyncio.ensure_future(fn())
+        try:
+            if delay is None:
+                result = await first
+                self.latencies.add(time.monotonic() - started)
+                return result
+
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done or not can_hedge():
+                result = await first
+                self.latencies.add(time.monotonic() - started)
+                return result
+        except BaseException:
+            # Caller cancelled (or timed out) before a hedge fired: don't leave the attempt running.
+            self._abandon({first}, discard)
+            raise
+
+        self.hedged += 1
+        HEDGES.inc(operation=self.operation, outcome="fired")
+        second = asyncio.ensure_future(fn())
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [t for t in done if not t.cancelled() and t.exception() is None]
+                for t in done:
+                    if not t.cancelled() and t.exception() is not None:
+                        error = t.exception()
+                if winners:
+                    winner = first if first in winners else winners[0]
+                    for extra in winners:
+                        if extra is not winner and discard is not None:
+                            await discard(extra.result())
+                    won_by = "hedge" if winner is second else "primary"
+                    if won_by == "hedge":
+                        self.wins += 1
+                    HEDGES.inc(operation=self.operation, outcome=f"won_{won_by}")
+                    self.latencies.add(time.monotonic() - started)
+                    return winner.result()
+            assert error is not None
+            raise error
+        finally:
+            self._abandon(pending, discard)
+
+    @staticmethod
+    def _abandon(tasks: Iterable["asyncio.Future[T]"], discard: Optional[Callable[[T], Awaitable[Any]]]) -> None:
+        """Cancels attempts nobody will await; one that already finished (or finishes anyway) is discarded."""
+        for t in tasks:
+            t.cancel()
+            if discard is not None:
+                t.add_done_callback(lambda f: f.cancelled() or f.exception() is not None
+                                    or asyncio.ensure_future(discard(f.result())))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "calls": self.calls, "hedged": self.hedged, "hedge_wins": self.wins,
+                "delay_seconds": self.delay()}
@@ -0,0 +1,73 @@
+# backend/utils/langid.py
+"""
+Romanian/English detection for chat queries.
+
+The app only ever answers in "ro" or "en", so a general-purpose detector is overkill:
+langdetect costs ~0.5s to load its profiles on first use, milliseconds per call
+after that, and is randomised (the same short query can flip between runs). This scores
+Romanian-only letters, stopwords and a handful of word endings instead: deterministic,
+no data files, a few microseconds per query.
+"""
+from __future__ import annotations
+
+import re
+from typing import Literal, Tuple
+
+from utils.text import strip_diacritics
+
+Lang = Literal["ro", "en"]
+
+# ă, î, ș, ț (comma and cedilla forms) do not occur in English; â is rarer but still Romanian here.
+_RO_LETTERS = frozenset("ăâîșțşţ")
+
+# Matched on casefolded, diacritic-free tokens. Words common to both languages
+# ("a", "in", "are", "care", "an") are left out on purpose.
+_RO_WORDS = frozenset("""
+    si sau dar iar ca ce cum cand unde cine de la cu pe din pentru despre prin fara dupa pana intre
+    spre decat nu da eu tu el ea noi voi ei ele mi imi ma te iti ne va le il o un unei unui lui lor al ale
+    cel cea cei cele acest aceasta asta acel aceea este e sunt era fost fi am ai avem aveti au sa vreau vrei
+    vrea poti poate pot imi place plac placut carte carti cartea cartii roman romane romanul autor autorul
+    scriitor gen genul rezumat rezumatul complet recomanda recomandati recomanzi recomandare citesc citi
+    citit ceva foarte mai mult multe bine salut salutare buna ziua seara dimineata multumesc mersi faci
+    rog zi tot toate orice nimic
+""".split())
+_EN_WORDS = frozenset("""
+    the and of to is was were be been being i you he she it we they me my your his her its our their
+    what which who whom how why where when about for with like want would could should can will please
+    book books novel novels read reading recommend something some any that this these those from have has
+    had do does did not no yes hello hi hey thanks thank give tell full summary story stories loved love
+    good nice day there up on at by or but if so just one more most very really need looking after before
+    into over than then them what's i'm don't
+""".split())
+
+# Word endings that lean strongly one way (checked on tokens that are not stopwords).
+_RO_ENDINGS = ("ului", "ilor", "elor", "ul", "tie", "tii", "esc", "este", "eaza", "ata", "ii")
+_EN_ENDINGS = ("ing", "tion", "ness", "ly", "ed", "ful", "ous")
+
+_TOKEN = re.compile(r"[a-z']+")
+
+
+def language_scores(text: str) -> Tuple[float, float]:
+    """(romanian, english) evidence for `text`; see detect_language."""
+    lowered = (text or "").casefold()
+    ro = 3.0 * sum(1 for ch in lowered if ch in _RO_LETTERS)
+    en = 0.0
+    for token in _TOKEN.findall(strip_diacritics(lowered)):
+        if token in _RO_WORDS:
+            ro += 2.0
+        elif token in _EN_WORDS:
+            en += 2.0
+        elif len(token) > 4:
+            if token.endswith(_RO_ENDINGS):
+                ro += 1.0
+            elif token.endswith(_EN_ENDINGS):
+                en += 1.0
+    return ro, en
+
+
+def detect_language(text: str, default: Lang = "en") -> Lang:
+    """"ro" or "en" for a chat query; `default` when there is no evidence either way."""
+    ro, en = language_scores(text)
+    if ro == en:
+        return default
+    return "ro" if ro > en else "en"
@@ -0,0 +1,196 @@
+# backend/utils/metrics.py
+"""
+Dependency-free metrics: counters, histograms and timing spans, rendered in the
+Prometheus text exposition format by /metrics.
+
+    with span("chroma_query"):
+        ...
+
+Every span lands in the `smart_librarian_stage_seconds{stage=...}` histogram and, while a
+request is being served, in that request's span list (sent back as a Server-Timing header).
+"""
+from __future__ import annotations
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.label_names), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.label_names, key)} {v:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, List[float]] = {}  # bucket counts..., sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.label_names)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1  # cumulated at render time
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0.0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative:g}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {series[-1]:g}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {series[-1]:g}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: List[Any] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def collector(self, fn: Callable[[], List[str]]) -> Callable[[], List[str]]:
+        """Register a callback producing extra exposition lines at scrape time (cache stats etc.)."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            try:
+                lines.extend(fn())
+            except Exception:
+                continue  # a broken collector must not take /metrics down
+        return "\n".join(lines) + "\n"
+
+
+metrics = Registry()
+
+STAGE_SECONDS = metrics.histogram(
+    "smart_librarian_stage_seconds", "Time spent in each request stage.", ["stage"])
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "smart_librarian_http_request_seconds", "HTTP request latency until the response headers.",
+    ["method", "route", "status"])
+OPENAI_TOKENS = metrics.counter(
+    "smart_librarian_openai_tokens_total", "Upstream token usage reported by the API.", ["model", "kind"])
+OPENAI_RETRIES = metrics.counter(
+    "smart_librarian_openai_retries_total", "Upstream calls retried after a failure or empty reply.", ["operation"])
+OPENAI_FALLBACKS = metrics.counter(
+    "smart_librarian_openai_fallbacks_total", "Answers replaced by the localized fallback.", ["operation"])
+
+
+# -------- Spans --------
+_request_spans: "contextvars.ContextVar[Optional[List[Tuple[str, float]]]]" = contextvars.ContextVar(
+    "request_spans", default=None)
+
+
+def begin_request() -> Tuple[contextvars.Token, List[Tuple[str, float]]]:
+    """Start collecting spans for the current request; returns (reset token, live span list)."""
+    spans: List[Tuple[str, float]] = []
+    return _request_spans.set(spans), spans
+
+
+def end_request(token: contextvars.Token) -> None:
+    _request_spans.reset(token)
+
+
+def record(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a block (sync or async code alike) into the stage histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started)
+
+
+def server_timing(spans: List[Tuple[str, float]]) -> str:
+    """Server-Timing header value; repeated stages are summed."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+def record_usage(model: str, usage: Any) -> None:
+    """Count prompt/completion tokens from an SDK `usage` object (absent on some streams)."""
+    if usage is None:
+        return
+    prompt = getattr(usage, "prompt_tokens", None) or 0
+    completion = getattr(usage, "completion_tokens", None) or 0
+    if prompt:
+        OPENAI_TOKENS.inc(prompt, model=model, kind="prompt")
+    if completion:
+        OPENAI_TOKENS.inc(completion, model=model, kind="completion")
@@ -0,0 +1,163 @@
+# backend/utils/single_flight.py
+"""
+Single-flight: concurrent identical calls share one upstream request.
+
+`do()` coalesces awaitables (embedding search, intent, completion, image); `stream()`
+fans one upstream stream out to every concurrent subscriber (chat tokens, TTS audio).
+Keys are namespaced, so the chat, audio and image paths share one instance and one set
+of metrics. Coalescing is per process; identical requests on other workers still go
+upstream on their own.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger("smart_librarian.single_flight")
+
+T = TypeVar("T")
+
+
+class _Counters:
+    __slots__ = ("calls", "leaders", "shared")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.leaders = 0
+        self.shared = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "upstream": self.leaders,
+            "coalesced": self.shared,
+            "coalescing_ratio": round(self.shared / self.calls, 4) if self.calls else 0.0,
+        }
+
+
+class _Broadcast:
+    """Buffers one source stream; subscribers replay from the start and then follow live."""
+
+    def __init__(self, source: AsyncIterator[Any]):
+        self.items: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._cond = asyncio.Condition()
+        self._source = source
+        self.task: "asyncio.Task[None]" = asyncio.ensure_future(self._pump())
+
+    async def _pump(self) -> None:
+        try:
+            async for item in self._source:
+                self.items.append(item)
+                async with self._cond:
+                    self._cond.notify_all()
+        except asyncio.CancelledError:
+            self.error = ConnectionAbortedError("upstream stream cancelled")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            aclose = getattr(self._source, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+            async with self._cond:
+                self._cond.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        self.subscribers += 1
+        i = 0
+        try:
+            while True:
+                if i < len(self.items):
+                    yield self.items[i]
+                    i += 1
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                async with self._cond:
+                    await self._cond.wait_for(lambda: i < len(self.items) or self.done)
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # Last listener left: stop paying for a stream nobody reads.
+                self.task.cancel()
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._calls: Dict[Tuple[str, str], "asyncio.Future[Any]"] = {}
+        self._streams: Dict[Tuple[str, str], _Broadcast] = {}
+        self._counters: Dict[str, _Counters] = {}
+
+    def _count(self, namespace: str) -> _Counters:
+        counters = self._counters.get(namespace)
+        if counters is None:
+            counters = self._counters[namespace] = _Counters()
+        return counters
+
+    async def do(self, namespace: str, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once per (namespace, key) at a time; concurrent callers await its result.
+
+        The shared call is shielded, so one caller disconnecting does not cancel it for the rest.
+        """
+        k = (namespace, key)
+        counters = self._count(namespace)
+        counters.calls += 1
+        fut = self._calls.get(k)
+        if fut is None:
+            counters.leaders += 1
+            fut = asyncio.ensure_future(fn())
+            self._calls[k] = fut
+
+            def _done(f: "asyncio.Future[Any]") -> None:
+                if self._calls.get(k) is f:
+                    del self._calls[k]
+                if not f.cancelled():
+                    f.exception()  # retrieved even when every caller went away
+
+            fut.add_done_callback(_done)
+        else:
+            counters.shared += 1
+        return await asyncio.shield(fut)
+
+    def stream(self, namespace: str, key: str, factory: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Subscribe to the in-flight stream for (namespace, key), starting factory() if there is none.
+
+        Late subscribers get the chunks produced so far, then follow live.
+        """
+        k = (namespace, key)
+        counters = self._count(namespace)
+        counters.calls += 1
+        broadcast = self._streams.get(k)
+        if broadcast is None or broadcast.done:
+            counters.leaders += 1
+            broadcast = _Broadcast(factory())
+            self._streams[k] = broadcast
+            broadcast.task.add_done_callback(
+                lambda _t, b=broadcast: self._streams.get(k) is b and self._streams.pop(k, None))
+        else:
+            counters.shared += 1
+        return broadcast.subscribe()
+
+    def stats(self) -> Dict[str, Any]:
+        totals = _Counters()
+        for c in self._counters.values():
+            totals.calls += c.calls
+            totals.leaders += c.leaders
+            totals.shared += c.shared
+        out = totals.as_dict()
+        out["in_flight"] = len(self._calls) + len(self._streams)
+        out["by_namespace"] = {ns: c.as_dict() for ns, c in sorted(self._counters.items())}
+        return out
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,37 @@
+# backend/utils/text.py
+import hashlib
+import re
+import unicodedata
+
+_WS = re.compile(r"\s+")
+_EDGE_PUNCT = re.compile(r"^[\W_]+|[\W_]+$", re.UNICODE)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Canonical form used as a cache key: NFC, casefolded, single spaces,
+    no leading/trailing punctuation ("Recommend a fantasy book!" == "recommend a  fantasy book").
+    """
+    text = unicodedata.normalize("NFC", text or "").casefold()
+    text = _WS.sub(" ", text).strip()
+    return _EDGE_PUNCT.sub("", text)
+
+
+def strip_diacritics(text: str) -> str:
+    """"bună ziua, ce cărți?" -> "buna ziua, ce carti?" (ș/ț with comma or cedilla alike)."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def fingerprint(*parts: str) -> str:
+    """Stable short hash of the given parts (joined with a separator that cannot collide)."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\x1f")
+    return h.hexdigest()[:32]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 chars per token for English/Romanian prose)."""
+    return max(1, (len(text or "") + 3) // 4)
@@ -1,6 +1,6 @@
 import { useState } from "react";
 import ChatWindow from "./components/ChatWindow";
-import { sendMessageToBackend } from "./services/api";
+import { streamMessageFromBackend } from "./services/api";
 import "./styles/main.css";
 
 export default function App() {
@@ -15,14 +15,23 @@ export default function App() {
     const loadingMessage = { sender: "bot", text: "🤖 Bot is typing..." };
     setMessages((prev) => [...prev, loadingMessage]);
 
+    const setBotText = (text) =>
+      setMessages((prev) => [...prev.slice(0, -1), { sender: "bot", text }]);
+
     try {
-      const { recommendation, full_summary } = await sendMessageToBackend(userMessage);
+      let streamed = "";
+      const { recommendation, full_summary } = await streamMessageFromBackend(userMessage, {
+        onToken: (delta) => {
+          streamed += delta;
+          setBotText(streamed);
+        },
+      });
       const fullText = `${recommendation}${full_summary ? `\n\nSummary:\n${full_summary}` : ""}`;
 
-      setMessages((prev) => [...prev.slice(0, -1), { sender: "bot", text: fullText }]);
+      setBotText(fullText);
     } catch (error) {
       console.error("[FRONTEND] Error:", error);
-      setMessages((prev) => [...prev.slice(0, -1), { sender: "bot", text: "❌ Server error. Please try again." }]);
+      setBotText("❌ Server error. Please try again.");
     }
   };
 
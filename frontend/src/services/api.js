@@ -1,11 +1,17 @@
 import axios from 'axios';
 
+// Conversation id handed out by the backend; sent back so follow-ups
+// ("tell me more about the second one") keep their context. The first message
+// asks for one (new_session), otherwise the backend keeps no state.
+let sessionId = null;
+
 export const sendMessageToBackend = async (message) => {
   try {
     const response = await axios.post(
       'http://127.0.0.1:8000/chat',
-      { query: message }
+      { query: message, session_id: sessionId, new_session: sessionId === null }
     );
+    sessionId = response.data.session_id ?? sessionId;
     return response.data;
   } catch (error) {
     if (error.response) {
@@ -19,6 +25,54 @@ export const sendMessageToBackend = async (message) => {
   }
 };
 
+// Streams /chat/stream (Server-Sent Events). Calls onToken(delta) as the model
+// generates and resolves with the final { recommendation, full_summary } frame.
+export async function streamMessageFromBackend(message, { onToken } = {}) {
+  const res = await fetch('http://127.0.0.1:8000/chat/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ query: message, session_id: sessionId, new_session: sessionId === null }),
+  });
+  if (!res.ok || !res.body) {
+    console.error(`[BACKEND ERROR]`, res.status);
+    throw new Error("Chat stream request failed");
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let final = null;
+
+  const handleFrame = (frame) => {
+    let event = "message";
+    const data = [];
+    for (const line of frame.split("\n")) {
+      if (line.startsWith("event:")) event = line.slice(6).trim();
+      else if (line.startsWith("data:")) data.push(line.slice(5).trimStart());
+    }
+    if (!data.length) return;
+    const payload = JSON.parse(data.join("\n"));
+    if (event === "token") onToken?.(payload.delta);
+    else if (event === "done") final = payload;
+    else if (event === "error") throw new Error(payload.detail || "Chat stream failed");
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let idx;
+    while ((idx = buffer.indexOf("\n\n")) !== -1) {
+      handleFrame(buffer.slice(0, idx));
+      buffer = buffer.slice(idx + 2);
+    }
+  }
+  if (buffer.trim()) handleFrame(buffer);
+  if (!final) throw new Error("Chat stream ended without a final frame");
+  sessionId = final.session_id ?? sessionId;
+  return final;
+}
+
 export async function sttUploadAudio(blob, language) {
   const form = new FormData();
   form.append("file", new File([blob], "speech.webm", { type: "audio/webm" }));